@@ -0,0 +1,105 @@
+"""
+Comment write/read latency with the legacy post_o2m_comment join table
+versus the single comments.post_id foreign key.
+
+Both layouts are built side by side in scratch databases and driven with the
+same statements the ORM used to emit, so the numbers only differ by the extra
+table and join.
+
+    python -m benchmarks.comments_fk --posts 200 --comments 20000
+
+Pass --url with an empty scratch database to measure on Postgres instead of
+an in-memory SQLite database; every table in it is dropped first.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, insert, select, text
+
+from src.models.base import Base, Comment, Post, User
+
+legacy_metadata = MetaData()
+post_o2m_comment = Table(
+    "post_o2m_comment",
+    legacy_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("post_id", Integer),
+    Column("comment_id", Integer),
+)
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def report(name, samples):
+    ms = [s * 1000 for s in samples]
+    print(f"{name:<22} n={len(ms):<7} mean={statistics.mean(ms):.3f}ms "
+          f"p50={percentile(ms, 50):.3f}ms p95={percentile(ms, 95):.3f}ms "
+          f"p99={percentile(ms, 99):.3f}ms")
+
+
+def prepare(args, legacy):
+    engine = create_engine(args.url)
+    with engine.begin() as conn:
+        legacy_metadata.drop_all(conn)
+        Base.metadata.drop_all(conn)
+        Base.metadata.create_all(conn)
+        if legacy:
+            legacy_metadata.create_all(conn)
+            conn.execute(text("DROP INDEX ix_comments_post_id_created_at"))
+        user_id = conn.execute(insert(User.__table__).values(
+            username="benchmark", email="benchmark@example.com", password="x")).inserted_primary_key[0]
+        conn.execute(insert(Post.__table__), [
+            {"title": f"post {i}", "description": "", "image": "", "user_id": user_id} for i in range(args.posts)])
+        post_ids = list(conn.execute(select(Post.id)).scalars())
+    return engine, user_id, post_ids
+
+
+def run(args, legacy):
+    engine, user_id, post_ids = prepare(args, legacy)
+    comments = Comment.__table__
+    writes, reads = [], []
+    with engine.connect() as conn:
+        for i in range(args.comments):
+            post_id = random.choice(post_ids)
+            start = time.perf_counter()
+            with conn.begin():
+                comment_id = conn.execute(insert(comments).values(
+                    content=f"comment {i}", user_id=user_id, post_id=post_id)).inserted_primary_key[0]
+                if legacy:
+                    conn.execute(insert(post_o2m_comment).values(
+                        post_id=post_id, comment_id=comment_id))
+            writes.append(time.perf_counter() - start)
+        for _ in range(args.reads):
+            post_id = random.choice(post_ids)
+            if legacy:
+                query = select(comments).join(
+                    post_o2m_comment, post_o2m_comment.c.comment_id == comments.c.id).where(
+                    post_o2m_comment.c.post_id == post_id)
+            else:
+                query = select(comments).where(comments.c.post_id == post_id)
+            start = time.perf_counter()
+            conn.execute(query.limit(20)).all()
+            reads.append(time.perf_counter() - start)
+    engine.dispose()
+    return writes, reads
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="sqlite://")
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--comments", type=int, default=20000)
+    parser.add_argument("--reads", type=int, default=5000)
+    args = parser.parse_args()
+
+    for label, legacy in (("join table (before)", True), ("foreign key (after)", False)):
+        random.seed(0)
+        writes, reads = run(args, legacy)
+        print(label)
+        report("  comment write", writes)
+        report("  comment page read", reads)
@@ -0,0 +1,17 @@
+"""
+End-to-end load test.
+
+Boots the app under gunicorn, as in production, against a scratch Postgres
+database, with local stand-ins for everything else: Redis (an in-process fakeredis server unless
+--redis-url is given), a fake Cloudinary HTTP API and an SMTP sink. The
+database is reset and seeded, then virtual users drive one of the traffic
+scenarios and the run is summarised as throughput and p50/p95/p99 latency
+per request.
+
+    python -m benchmarks.load --postgres-db photoshare_bench --scenario mixed --duration 60 --out before.json
+    python -m benchmarks.load --postgres-db photoshare_bench --scenario mixed --duration 60 --compare before.json
+
+POSTGRES_SERVER/PORT/USER/PASSWORD come from the environment or .env, like
+for the app. Every table of --postgres-db is dropped first, never point it
+at a database you care about.
+"""
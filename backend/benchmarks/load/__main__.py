@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks import load
+from benchmarks.load import report, scenarios
+from benchmarks.load.server import start_app
+from benchmarks.load.stubs import FakeCloudinary, FakeRedis, SMTPSink
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load", description=load.__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--postgres-db", required=True, help="scratch database, all of its tables are dropped")
+    parser.add_argument("--redis-url", help="host:port[:password] of a real Redis, fakeredis otherwise")
+    parser.add_argument("--scenario", choices=sorted(scenarios.MIXES), default="mixed")
+    parser.add_argument("--duration", type=float, default=60, help="seconds of measured traffic")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds of unmeasured traffic first")
+    parser.add_argument("--concurrency", type=int, default=32, help="virtual users")
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn worker processes")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument("--comments", type=int, default=50000)
+    parser.add_argument("--cloudinary-latency", type=float, default=0.05, help="seconds per fake Cloudinary call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="results JSON of an earlier run to diff against")
+    return parser.parse_args()
+
+
+def run_alembic(env, *args):
+    subprocess.run([sys.executable, "-m", "alembic", *args], cwd=BACKEND_DIR, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+
+def reset_database(env, args) -> dict:
+    run_alembic(env, "downgrade", "base")
+    run_alembic(env, "upgrade", "head")
+    # settings are read on import, so the app modules are only imported once env is final
+    os.environ.update(env)
+    from sqlalchemy import create_engine
+    from benchmarks.load.seed import seed
+    from src.core.config import settings
+    engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+    try:
+        return seed(engine, args.users, args.posts, args.tags, args.comments, args.seed)
+    finally:
+        engine.dispose()
+
+
+async def drive(base_url: str, data: dict, args) -> tuple[list, float]:
+    mix = scenarios.MIXES[args.scenario]
+    samples = []
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        users = [scenarios.VirtualUser(client, data, random.Random(args.seed + i), samples)
+                 for i in range(args.concurrency)]
+        await asyncio.gather(*(user.login("warmup login") for user in users))
+
+        async def loop(user, until):
+            while time.monotonic() < until:
+                await scenarios.pick(mix, user.rng)(user)
+
+        await asyncio.gather(*(loop(user, time.monotonic() + args.warmup) for user in users))
+        samples.clear()
+        start = time.monotonic()
+        await asyncio.gather(*(loop(user, start + args.duration) for user in users))
+        return samples, time.monotonic() - start
+
+
+def main():
+    args = parse_args()
+    stubs = [FakeCloudinary(args.cloudinary_latency).start(), SMTPSink().start()]
+    env = {**os.environ, "POSTGRES_DB": args.postgres_db, "ENVIRONMENT": "staging"}
+    if args.redis_url:
+        host, port, *password = args.redis_url.split(":", 2)
+        env.update(REDIS_HOST_=host, REDIS_PORT=port, REDIS_PASSWORD=password[0] if password else "")
+    else:
+        stubs.append(FakeRedis().start())
+    for stub in stubs:
+        env.update(stub.env())
+
+    process = None
+    try:
+        print(f"seeding {args.users} users, {args.posts} posts, {args.tags} tags, {args.comments} comments")
+        data = reset_database(env, args)
+        process, base_url = start_app(env, args.workers)
+        print(f"driving '{args.scenario}' with {args.concurrency} virtual users for {args.duration:g}s")
+        samples, duration = asyncio.run(drive(base_url, data, args))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        for stub in stubs:
+            stub.stop()
+
+    summary = report.summarize(samples, duration)
+    baseline = report.load(args.compare)["summary"] if args.compare else None
+    report.print_summary(summary, baseline)
+    print(f"cloudinary uploads: {stubs[0].uploads}, emails sent: {stubs[1].messages}")
+    if args.out:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                capture_output=True, text=True).stdout.strip()
+        report.save(args.out, {"commit": commit, "args": vars(args), "duration": duration, "summary": summary})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Latency samples to throughput and percentiles, saved as JSON so runs of two
+commits can be compared.
+"""
+import json
+import statistics
+from collections import defaultdict
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def summarize(samples, duration: float) -> dict:
+    """
+    :param samples: list: (request name, status code, seconds) tuples, status 0 for transport errors
+    :param duration: float: Wall clock length of the measured run
+    :return: Per request name and overall count, errors, throughput and latency in ms
+    """
+    groups = defaultdict(list)
+    for name, status, seconds in samples:
+        groups[name].append((status, seconds))
+        groups["TOTAL"].append((status, seconds))
+    summary = {}
+    for name, rows in sorted(groups.items()):
+        ms = [seconds * 1000 for _, seconds in rows]
+        summary[name] = {
+            "count": len(rows),
+            "errors": sum(1 for status, _ in rows if status == 0 or status >= 400),
+            "rps": round(len(rows) / duration, 2),
+            "mean": round(statistics.mean(ms), 2),
+            "p50": round(percentile(ms, 50), 2),
+            "p95": round(percentile(ms, 95), 2),
+            "p99": round(percentile(ms, 99), 2),
+        }
+    return summary
+
+
+def print_summary(summary: dict, baseline: dict = None):
+    print(f"{'request':<28} {'count':>7} {'errors':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, row in summary.items():
+        line = (f"{name:<28} {row['count']:>7} {row['errors']:>7} {row['rps']:>9} "
+                f"{row['p50']:>9} {row['p95']:>9} {row['p99']:>9}")
+        before = (baseline or {}).get(name)
+        if before:
+            deltas = [f"{key} {_delta(before[key], row[key])}" for key in ("rps", "p50", "p95", "p99")]
+            line += "   vs baseline: " + ", ".join(deltas)
+        print(line)
+
+
+def _delta(before, after) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def save(path: str, run: dict):
+    with open(path, "w") as file:
+        json.dump(run, file, indent=2)
+
+
+def load(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
@@ -0,0 +1,111 @@
+"""
+Traffic scenarios. A scenario is one visit of a virtual user, a short
+sequence of requests; a mix picks visits at random by weight.
+"""
+import itertools
+import random
+import time
+
+import httpx
+
+from benchmarks.load.seed import PASSWORD, username
+
+API = "/api/v1"
+
+# smallest valid PNG, the fake Cloudinary never looks at it
+PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082")
+
+_client_ips = itertools.count()
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, data: dict, rng: random.Random, samples: list):
+        self.client = client
+        self.data = data
+        self.rng = rng
+        self.samples = samples
+        self.token = None
+
+    def headers(self) -> dict:
+        # a fresh client address per request keeps the rate limiter (10 requests
+        # a minute per address and route) in the path without throttling the run
+        n = next(_client_ips)
+        headers = {"X-Forwarded-For": f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        return headers
+
+    async def request(self, name: str, method: str, url: str, **kwargs) -> httpx.Response | None:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, API + url, headers=self.headers(), **kwargs)
+        except httpx.HTTPError:
+            self.samples.append((name, 0, time.perf_counter() - start))
+            return None
+        self.samples.append((name, response.status_code, time.perf_counter() - start))
+        return response
+
+    def random_post(self) -> int:
+        return self.rng.choice(self.data["post_ids"])
+
+    def random_username(self) -> str:
+        return username(self.rng.randrange(len(self.data["user_ids"])))
+
+    async def login(self, name: str = "POST /auth/login"):
+        response = await self.request(name, "POST", "/auth/login",
+                                      data={"username": self.random_username(), "password": PASSWORD})
+        if response is not None and response.status_code == 200:
+            self.token = response.json()["access_token"]
+
+
+async def browse_feed(user: VirtualUser):
+    await user.request("GET /posts/", "GET", "/posts/", params={"comments_preview": 3})
+    for _ in range(3):
+        post_id = user.random_post()
+        await user.request("GET /posts/{id}", "GET", f"/posts/{post_id}", params={"comments_preview": 3})
+        await user.request("GET /posts/comments/", "GET", "/posts/comments/", params={"post_id": post_id, "limit": 20})
+
+
+async def upload(user: VirtualUser):
+    tags = ",".join(f"tag{user.rng.randrange(50)}" for _ in range(user.rng.randint(0, 5)))
+    await user.request("POST /posts/", "POST", "/posts/",
+                       params={"title": "benchmark upload", "description": "uploaded by the load test", "tags": tags},
+                       files={"image": ("bench.png", PNG, "image/png")})
+
+
+async def login_storm(user: VirtualUser):
+    await user.login()
+
+
+async def comment_burst(user: VirtualUser):
+    post_id = user.random_post()
+    for i in range(5):
+        await user.request("POST /posts/comments/", "POST", "/posts/comments/",
+                           json={"content": f"burst comment {i}", "post_id": post_id})
+
+
+async def signup(user: VirtualUser):
+    n = user.rng.getrandbits(48)
+    await user.request("POST /auth/signup", "POST", "/auth/signup",
+                       json={"username": f"new{n}", "email": f"new{n}@example.com", "password": PASSWORD})
+
+
+SCENARIOS = {
+    "browse": browse_feed,
+    "upload": upload,
+    "login": login_storm,
+    "comments": comment_burst,
+    "signup": signup,
+}
+
+MIXES = {
+    "mixed": {"browse": 70, "comments": 15, "login": 8, "upload": 5, "signup": 2},
+    **{name: {name: 1} for name in SCENARIOS},
+}
+
+
+def pick(mix: dict, rng: random.Random):
+    names = list(mix)
+    return SCENARIOS[rng.choices(names, [mix[name] for name in names])[0]]
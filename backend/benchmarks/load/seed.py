@@ -0,0 +1,78 @@
+"""
+Bulk seeding of a realistic data set straight through Core inserts.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+from passlib.context import CryptContext
+from sqlalchemy import func, insert, select, update
+
+from src.models.app_setting import ADMIN_BOOTSTRAPPED
+from src.models.base import AppSetting, Comment, Post, Tag, User
+from src.models.helpers import post_m2m_tag
+
+PASSWORD = "benchmark-password"
+CHUNK = 5000
+
+
+def username(i: int) -> str:
+    return f"bench{i}"
+
+
+def _chunks(rows):
+    for start in range(0, len(rows), CHUNK):
+        yield rows[start:start + CHUNK]
+
+
+def _insert(conn, table, rows):
+    for chunk in _chunks(rows):
+        conn.execute(insert(table), chunk)
+
+
+def seed(engine, users: int, posts: int, tags: int, comments: int, seed: int = 0) -> dict:
+    """
+    The seed function fills an empty, migrated database. Every user can log in
+    with PASSWORD, posts and comments are spread over the last 90 days with a
+    long tail of popular posts, the way a real feed looks.
+
+    :return: The ids the scenarios pick from
+    """
+    rng = random.Random(seed)
+    password = CryptContext(schemes=["bcrypt"], deprecated="auto").hash(PASSWORD)
+    now = datetime.now(timezone.utc)
+
+    def moment():
+        return now - timedelta(seconds=rng.randint(0, 90 * 24 * 3600))
+
+    with engine.begin() as conn:
+        _insert(conn, User.__table__, [
+            {"username": username(i), "email": f"{username(i)}@example.com", "password": password,
+             "avatar": f"https://www.gravatar.com/avatar/{i:032x}", "confirmed": True, "active": True, "role": "admin" if i == 0 else "user", "created_at": moment()}
+            for i in range(users)])
+        user_ids = list(conn.execute(select(User.id)).scalars())
+        conn.execute(insert(AppSetting.__table__), [{"key": ADMIN_BOOTSTRAPPED, "value": "true"}])
+
+        _insert(conn, Tag.__table__, [{"name": f"tag{i}"} for i in range(tags)])
+        tag_ids = list(conn.execute(select(Tag.id)).scalars())
+
+        _insert(conn, Post.__table__, [
+            {"title": f"post {i}", "description": f"benchmark post {i}",
+             "image": f"https://res.cloudinary.com/bench/image/upload/v1/photo_share/seed-{i}.png",
+             "image_public_id": f"photo_share/seed-{i}", "user_id": rng.choice(user_ids), "created_at": moment()}
+            for i in range(posts)])
+        post_ids = list(conn.execute(select(Post.id)).scalars())
+
+        _insert(conn, post_m2m_tag, [
+            {"post_id": post_id, "tag_id": tag_id}
+            for post_id in post_ids for tag_id in rng.sample(tag_ids, rng.randint(0, min(5, len(tag_ids))))])
+
+        # a few posts draw most of the comments
+        weights = [1 / (rank + 1) for rank in range(len(post_ids))]
+        _insert(conn, Comment.__table__, [
+            {"content": f"comment {i}", "post_id": post_id, "user_id": rng.choice(user_ids), "created_at": moment()}
+            for i, post_id in enumerate(rng.choices(post_ids, weights, k=comments))])
+
+        counts = select(func.count(Comment.id)).where(Comment.post_id == Post.id).scalar_subquery()
+        conn.execute(update(Post).values(comment_count=counts))
+
+    return {"user_ids": user_ids, "post_ids": post_ids, "tag_ids": tag_ids}
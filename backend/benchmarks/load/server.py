@@ -0,0 +1,37 @@
+"""
+Runs the app the way the Dockerfile does, under gunicorn with gunicorn.conf.py.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.load.stubs import free_port
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+
+def start_app(env, workers: int) -> tuple[subprocess.Popen, str]:
+    port = free_port()
+    env = {**env, "WEB_CONCURRENCY": str(workers),
+           "PROMETHEUS_MULTIPROC_DIR": tempfile.mkdtemp(prefix="photoshare-metrics-")}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{port}",
+         "--log-level", "warning", "--access-logfile", os.devnull, "src.main:app"],
+        cwd=BACKEND_DIR, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {process.returncode}")
+        try:
+            httpx.get(base_url + "/metrics", timeout=1)
+            return process, base_url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("gunicorn did not start within 60 seconds")
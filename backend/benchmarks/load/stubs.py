@@ -0,0 +1,156 @@
+"""
+Local stand-ins for the services the app talks to.
+"""
+import json
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+from fakeredis import TcpFakeServer
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FakeCloudinaryHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.server.latency)
+        if self.path.endswith("/upload"):
+            self.server.uploads += 1
+            public_id = f"photo_share/bench-{self.server.uploads}"
+            self.reply({
+                "public_id": public_id,
+                "version": 1,
+                "format": "png",
+                "resource_type": "image",
+                "url": f"http://res.cloudinary.com/bench/image/upload/v1/{public_id}.png",
+                "secure_url": f"https://res.cloudinary.com/bench/image/upload/v1/{public_id}.png",
+            })
+        else:
+            self.reply({"result": "ok"})
+
+    def do_DELETE(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.server.latency)
+        public_ids = re.findall(r"public_ids(?:%5B%5D|\[\])=([^&]+)", self.path)
+        self.reply({"deleted": {public_id: "deleted" for public_id in public_ids}, "partial": False})
+
+    def reply(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeCloudinary:
+    """
+    Answers the upload, destroy and delete_resources calls of the Cloudinary SDK
+    after `latency` seconds. The app points the SDK at it through
+    CLOUDINARY_UPLOAD_PREFIX, see env().
+    """
+
+    def __init__(self, latency: float = 0.05):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeCloudinaryHandler)
+        self.server.daemon_threads = True
+        self.server.latency = latency
+        self.server.uploads = 0
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def uploads(self) -> int:
+        return self.server.uploads
+
+    def env(self) -> dict:
+        return {
+            "CLOUDINARY_UPLOAD_PREFIX": f"http://127.0.0.1:{self.server.server_address[1]}",
+            "CLOUDINARY_CLOUD_NAME": "bench",
+            "CLOUDINARY_API_KEY": "bench",
+            "CLOUDINARY_API_SECRET": "bench",
+        }
+
+
+class SinkHandler:
+    def __init__(self):
+        self.messages = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages += 1
+        return "250 OK"
+
+
+class SMTPSink:
+    """
+    Accepts any login and swallows every message, only counting them.
+    """
+
+    def __init__(self):
+        self.handler = SinkHandler()
+        self.port = free_port()
+        self.controller = Controller(self.handler, hostname="127.0.0.1", port=self.port, auth_require_tls=False,
+                                     authenticator=lambda *args: AuthResult(success=True))
+
+    def start(self):
+        self.controller.start()
+        return self
+
+    def stop(self):
+        self.controller.stop()
+
+    @property
+    def messages(self) -> int:
+        return self.handler.messages
+
+    def env(self) -> dict:
+        return {
+            "SMTP_HOST": "127.0.0.1",
+            "SMTP_PORT": str(self.port),
+            "SMTP_SSL_TLS": "false",
+            "SMTP_STARTTLS": "false",
+            "SMTP_USER": "bench",
+            "SMTP_PASSWORD": "bench",
+            "EMAILS_FROM_EMAIL": "bench@example.com",
+        }
+
+
+class FakeRedis:
+    """
+    A fakeredis server speaking the Redis protocol over TCP, Lua scripts
+    included so fastapi-limiter works against it.
+    """
+
+    def __init__(self):
+        self.server = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+        self.server.daemon_threads = True
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def env(self) -> dict:
+        return {"REDIS_HOST_": "127.0.0.1", "REDIS_PORT": str(self.server.server_address[1]), "REDIS_PASSWORD": ""}
@@ -0,0 +1,55 @@
+"""
+Micro-benchmarks of single hot paths, run with pytest-benchmark:
+
+    pytest benchmarks/micro --benchmark-storage=file://benchmarks/micro/baselines --benchmark-compare
+
+Saving a new baseline after an intended change:
+
+    pytest benchmarks/micro --benchmark-storage=file://benchmarks/micro/baselines --benchmark-save=baseline
+
+Baselines are pytest-benchmark JSON files under baselines/<machine>/, so a
+regression shows up both in the compare table and as a diff of the file.
+They use an in-memory SQLite database and fakeredis, the numbers measure the
+Python side of each path, not Postgres or network latency.
+"""
+import asyncio
+
+import fakeredis
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from benchmarks.load.seed import seed
+from src.models.base import Base
+from src.core.redis import close_redis, open_redis
+
+
+@pytest.fixture(scope="session")
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    engine.seeded = seed(engine, users=200, posts=1000, tags=50, comments=30000)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine, autoflush=False)()
+    yield session
+    session.close()
+
+
+@pytest.fixture(scope="session")
+def run():
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture
+def fake_redis(run):
+    r = run(open_redis(fakeredis.FakeAsyncRedis()))
+    yield r
+    run(close_redis())
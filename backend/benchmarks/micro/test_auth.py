@@ -0,0 +1,34 @@
+import pytest
+
+from benchmarks.load.seed import username
+from src.services.auth import auth_service
+
+EMAIL = f"{username(1)}@example.com"
+
+
+@pytest.fixture
+def access_token(run):
+    return run(auth_service.create_access_token({"sub": EMAIL}))
+
+
+def test_create_access_token(benchmark, run):
+    assert benchmark(lambda: run(auth_service.create_access_token({"sub": EMAIL})))
+
+
+def test_decode_refresh_token(benchmark, run):
+    token = run(auth_service.create_refresh_token({"sub": EMAIL}))
+    assert benchmark(lambda: run(auth_service.decode_refresh_token(token))) == EMAIL
+
+
+def test_get_current_user_cache_hit(benchmark, run, db, fake_redis, access_token):
+    run(auth_service.get_current_user(access_token, db))
+    user = benchmark(lambda: run(auth_service.get_current_user(access_token, db)))
+    assert user.email == EMAIL
+
+
+def test_get_current_user_cache_miss(benchmark, run, db, fake_redis, access_token):
+    def get_current_user():
+        return run(auth_service.get_current_user(access_token, db))
+
+    user = benchmark.pedantic(get_current_user, setup=lambda: run(fake_redis.flushall()) and None, rounds=200)
+    assert user.email == EMAIL
@@ -0,0 +1,50 @@
+import itertools
+
+import pytest
+from sqlalchemy import func
+
+from src.crud.comments import get_comments
+from src.crud.loaders import LOADERS_KEY
+from src.crud.post import create_qr_code
+from src.crud.tags import create_tag_if_not_exist
+from src.models.base import Comment
+
+new_tag_names = (f"new-tag-{i}" for i in itertools.count())
+
+
+def test_create_tag_if_not_exist_existing(benchmark, run, db):
+    def lookup():
+        # a new request each time, a memoized tag would cost nothing
+        db.info.pop(LOADERS_KEY, None)
+        return run(create_tag_if_not_exist("tag1", db))
+
+    assert benchmark(lookup).name == "tag1"
+
+
+def test_create_tag_if_not_exist_new(benchmark, run, db):
+    assert benchmark(lambda: run(create_tag_if_not_exist(next(new_tag_names), db))).id
+
+
+def test_create_qr_code(benchmark):
+    def create_and_close():
+        create_qr_code("https://res.cloudinary.com/bench/image/upload/v1/photo_share/seed-1.png").close()
+
+    benchmark(create_and_close)
+
+
+@pytest.fixture(scope="module")
+def busiest_post(engine):
+    with engine.connect() as conn:
+        return conn.execute(
+            func.count(Comment.id).select().add_columns(Comment.post_id).group_by(Comment.post_id)
+            .order_by(func.count(Comment.id).desc()).limit(1)).one().post_id
+
+
+@pytest.mark.parametrize("offset", [0, 100, 1000])
+def test_get_comments(benchmark, run, db, busiest_post, offset):
+    def page():
+        db.info.pop(LOADERS_KEY, None)
+        return run(get_comments(busiest_post, 20, offset, db))
+
+    comments = benchmark(page)
+    assert len(comments) == 20
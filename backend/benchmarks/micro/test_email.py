@@ -0,0 +1,76 @@
+"""
+Throughput of confirmation emails against a local aiosmtpd sink: a new
+connection and login per message, as send_email did before the pool, versus
+the Mailer batching a signup wave over its persistent connections.
+"""
+import asyncio
+
+import aiosmtplib
+import pytest
+
+from benchmarks.load.stubs import SMTPSink
+from src.core.config import settings
+from src.services.email import Mailer, confirmation_message
+
+MESSAGES = 100
+
+
+@pytest.fixture(scope="module")
+def sink():
+    sink = SMTPSink().start()
+    yield sink
+    sink.stop()
+
+
+@pytest.fixture
+def smtp_settings(sink, monkeypatch):
+    monkeypatch.setattr(settings, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(settings, "SMTP_PORT", sink.port)
+    monkeypatch.setattr(settings, "SMTP_SSL_TLS", False)
+    monkeypatch.setattr(settings, "SMTP_STARTTLS", False)
+    monkeypatch.setattr(settings, "SMTP_USER", "bench")
+    monkeypatch.setattr(settings, "SMTP_PASSWORD", "bench")
+
+
+def messages():
+    return [confirmation_message(f"user{i}@example.com", f"user{i}", "http://localhost:3000") for i in range(MESSAGES)]
+
+
+def send_rounds(benchmark, run, send_all) -> int:
+    rounds = 0
+
+    def send(batch):
+        nonlocal rounds
+        rounds += 1
+        run(send_all(batch))
+
+    benchmark.pedantic(send, setup=lambda: ((messages(),), {}), rounds=5)
+    return rounds
+
+
+def test_send_connection_per_message(benchmark, run, sink, smtp_settings):
+    async def send_all(batch):
+        for message in batch:
+            client = aiosmtplib.SMTP(hostname=settings.SMTP_HOST, port=settings.SMTP_PORT, use_tls=False)
+            await client.connect()
+            await client.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+            await client.send_message(message)
+            await client.quit()
+
+    before = sink.messages
+    rounds = send_rounds(benchmark, run, send_all)
+    assert sink.messages - before == MESSAGES * rounds
+
+
+def test_send_pooled(benchmark, run, sink, smtp_settings):
+    mailer = Mailer(pool_size=2, queue_size=MESSAGES, batch_size=20)
+    run(mailer.start())
+
+    async def send_all(batch):
+        await asyncio.gather(*(mailer.send(message) for message in batch))
+
+    before = sink.messages
+    rounds = send_rounds(benchmark, run, send_all)
+    run(mailer.close())
+    assert sink.messages - before == MESSAGES * rounds
+    assert mailer.connections_opened == 2
@@ -0,0 +1,81 @@
+"""
+CPU per request of the listing routes with FastAPI's response_model
+validation versus ModelJSONResponse, and of a full post listing versus the
+?fields= subset the mobile grid asks for, and of embedded versus normalized
+authors on a comment thread. The real routers are mounted with the
+database and the current user overridden and the rate limiter on fakeredis.
+"""
+import itertools
+
+import pytest
+from fakeredis import FakeAsyncRedis
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from fastapi_limiter import FastAPILimiter
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+
+from src.api.routes import comments, post
+from src.core.config import settings
+from src.core.db import get_db
+from src.models.base import Comment, User
+from src.services.auth import auth_service
+
+request_ids = itertools.count()
+
+
+async def unique_identifier(request):
+    return str(next(request_ids))
+
+
+@pytest.fixture(scope="module")
+def client(engine):
+    session = sessionmaker(bind=engine, autoflush=False)()
+    user = session.query(User).first()
+    app = FastAPI()
+    app.include_router(comments.router, prefix=settings.API_V1_STR)
+    app.include_router(post.router, prefix=settings.API_V1_STR)
+    app.dependency_overrides[get_db] = lambda: session
+    app.dependency_overrides[auth_service.get_current_user] = lambda: user
+    with TestClient(app) as client:
+        client.portal.call(lambda: FastAPILimiter.init(FakeAsyncRedis(), identifier=unique_identifier))
+        yield client
+    session.close()
+
+
+@pytest.fixture(scope="module")
+def busiest_post(engine):
+    with engine.connect() as conn:
+        return conn.execute(
+            func.count(Comment.id).select().add_columns(Comment.post_id).group_by(Comment.post_id)
+            .order_by(func.count(Comment.id).desc()).limit(1)).one().post_id
+
+
+@pytest.mark.parametrize("fast", [False, True], ids=["response_model", "fast"])
+def test_posts_route(benchmark, client, monkeypatch, fast):
+    monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", fast)
+    response = benchmark(client.get, "/api/v1/posts/", params={"comments_preview": 3})
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("fast", [False, True], ids=["response_model", "fast"])
+def test_comments_route(benchmark, client, busiest_post, monkeypatch, fast):
+    monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", fast)
+    response = benchmark(client.get, "/api/v1/posts/comments/", params={"post_id": busiest_post, "limit": 100})
+    assert len(response.json()) == 100
+
+
+@pytest.mark.parametrize("fields", [None, "id,image,title"], ids=["all", "grid"])
+def test_posts_route_fields(benchmark, client, fields):
+    params = {"fields": fields} if fields else {}
+    response = benchmark(client.get, "/api/v1/posts/", params=params)
+    assert response.status_code == 200
+    benchmark.extra_info["payload_bytes"] = len(response.content)
+
+
+@pytest.mark.parametrize("normalized", [False, True], ids=["embedded", "normalized"])
+def test_comments_route_normalized(benchmark, client, busiest_post, normalized):
+    params = {"post_id": busiest_post, "limit": 100, "normalized": normalized}
+    response = benchmark(client.get, "/api/v1/posts/comments/", params=params)
+    assert response.status_code == 200
+    benchmark.extra_info["payload_bytes"] = len(response.content)
@@ -0,0 +1,30 @@
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+from sqlalchemy.orm import joinedload, selectinload
+
+from src.crud.comments import attach_latest_comments
+from src.models.base import Post
+from src.schemas.posts import PostModelWithImage
+
+posts_adapter = TypeAdapter(List[PostModelWithImage])
+
+
+@pytest.fixture(params=[100, 1000])
+def posts(request, db, run):
+    posts = db.query(Post).options(joinedload(Post.user), selectinload(Post.tags)).limit(request.param).all()
+    return run(attach_latest_comments(posts, 3, db))
+
+
+def test_validate_posts(benchmark, posts):
+    # what FastAPI does with response_model=List[PostModelWithImage]
+    result = benchmark(posts_adapter.validate_python, posts, from_attributes=True)
+    assert len(result) == len(posts)
+
+
+def test_validate_and_serialize_posts(benchmark, posts):
+    def validate_and_dump():
+        return posts_adapter.dump_json(posts_adapter.validate_python(posts, from_attributes=True))
+
+    assert benchmark(validate_and_dump)
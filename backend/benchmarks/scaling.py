@@ -0,0 +1,110 @@
+"""
+Throughput against the number of gunicorn workers. For each worker count the
+app is started with gunicorn.conf.py, fakeredis standing in for Redis and the
+migration check off, and client processes request the home page, which runs
+the whole middleware stack and a template render but needs no database, for a
+fixed time. Requests per second should grow with the workers up to the number
+of cores the server gets.
+
+    python -m benchmarks.scaling --workers 1 2 4 8 --clients 4 --duration 15
+
+The clients run on the same machine and take cores from the server, give them
+about half of them with --clients.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import time
+
+import httpx
+
+from benchmarks.load.server import start_app
+from benchmarks.load.stubs import FakeRedis
+
+PATH = "/"
+
+
+def default_workers() -> list[int]:
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    return counts
+
+
+async def hammer(base_url: str, concurrency: int, warmup: float, duration: float) -> tuple[int, list[float]]:
+    latencies = []
+    dropped = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def loop(until, record):
+            nonlocal dropped
+            while time.monotonic() < until:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(PATH)
+                except (httpx.ReadError, httpx.RemoteProtocolError):
+                    # a worker recycled after max_requests closes its idle keep-alive
+                    # connections, a browser or load balancer retries the request too
+                    dropped += 1
+                    continue
+                response.raise_for_status()
+                if record:
+                    latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(loop(time.monotonic() + warmup, False) for _ in range(concurrency)))
+        await asyncio.gather(*(loop(time.monotonic() + duration, True) for _ in range(concurrency)))
+    return dropped, latencies
+
+
+def client(args) -> tuple[int, list[float]]:
+    return asyncio.run(hammer(*args))
+
+
+def measure(base_url: str, args) -> dict:
+    with multiprocessing.Pool(args.clients) as pool:
+        results = pool.map(client, [(base_url, args.concurrency, args.warmup, args.duration)] * args.clients)
+    latencies = sorted(latency for _, chunk in results for latency in chunk)
+    return {
+        "rps": len(latencies) / args.duration,
+        "dropped": sum(dropped for dropped, _ in results),
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure throughput for several gunicorn worker counts")
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers())
+    parser.add_argument("--clients", type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help="client processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="connections per client process")
+    parser.add_argument("--duration", type=float, default=10, help="seconds measured per worker count")
+    parser.add_argument("--warmup", type=float, default=2)
+    args = parser.parse_args()
+
+    redis = FakeRedis().start()
+    env = {**os.environ, **redis.env(), "CHECK_MIGRATIONS_ON_STARTUP": "false", "ENVIRONMENT": "staging"}
+    env.setdefault("EMAILS_FROM_EMAIL", "bench@example.com")
+    print(f"{os.cpu_count()} cores, {args.clients} client processes x {args.concurrency} connections, GET {PATH}")
+    baseline = None
+    try:
+        for workers in args.workers:
+            process, base_url = start_app(env, workers)
+            try:
+                result = measure(base_url, args)
+            finally:
+                process.terminate()
+                process.wait()
+            baseline = baseline or result["rps"] / workers
+            print(f"workers={workers:<3} {result['rps']:>8.0f} req/s  p50={result['p50']:.1f}ms "
+                  f"p99={result['p99']:.1f}ms  efficiency={result['rps'] / (baseline * workers):.0%}  "
+                  f"retried={result['dropped']}")
+    finally:
+        redis.stop()
+
+
+if __name__ == "__main__":
+    main()
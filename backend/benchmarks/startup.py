@@ -0,0 +1,82 @@
+"""
+Worker boot time: how long `import main` takes, and how long the lifespan and
+the first request take once it is imported. Each run is a fresh Python
+process, the way a new worker starts, with fakeredis standing in for Redis and
+the migration check off so no database is needed.
+
+    python -m benchmarks.startup --runs 20
+    python -m benchmarks.startup --importtime 15
+
+--importtime lists the modules that take longest to import, cumulatively.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+BOOT = """
+import json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+import fakeredis
+from fastapi.testclient import TestClient
+from src.core import redis
+redis.create_redis = fakeredis.FakeAsyncRedis
+booting = time.perf_counter()
+with TestClient(main.app) as client:
+    assert client.get("/health").status_code == 200
+    answered = time.perf_counter()
+print(json.dumps({"import": imported - start, "first_request": answered - booting}))
+"""
+
+
+def environment() -> dict:
+    env = dict(os.environ, CHECK_MIGRATIONS_ON_STARTUP="false")
+    env.setdefault("EMAILS_FROM_EMAIL", "bench@example.com")
+    env["PYTHONPATH"] = os.pathsep.join([str(BACKEND_DIR), str(BACKEND_DIR / "src")])
+    return env
+
+
+def boot() -> dict:
+    result = subprocess.run([sys.executable, "-c", BOOT], cwd=BACKEND_DIR / "src", env=environment(),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(limit: int) -> list[tuple[float, str]]:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=BACKEND_DIR / "src",
+                            env=environment(), capture_output=True, text=True, check=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imports.append((int(cumulative) / 1000, name.strip()))
+    return sorted(imports, reverse=True)[:limit]
+
+
+def report(name: str, samples: list[float]):
+    ms = sorted(s * 1000 for s in samples)
+    print(f"{name:<15} n={len(ms):<4} min={ms[0]:.1f}ms p50={statistics.median(ms):.1f}ms "
+          f"mean={statistics.mean(ms):.1f}ms max={ms[-1]:.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure import time and time to first request")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--importtime", type=int, default=0, metavar="N", help="Show the N slowest imports instead")
+    args = parser.parse_args()
+
+    if args.importtime:
+        for ms, name in slowest_imports(args.importtime):
+            print(f"{ms:>8.1f}ms  {name}")
+    else:
+        runs = [boot() for _ in range(args.runs)]
+        report("import main", [run["import"] for run in runs])
+        report("first request", [run["first_request"] for run in runs])
@@ -0,0 +1,62 @@
+"""
+Production server: gunicorn managing uvicorn workers.
+
+    gunicorn -c gunicorn.conf.py src.main:app
+
+WEB_CONCURRENCY sets the number of worker processes, one per CPU by default.
+The app is imported once in the master before forking (preload_app), so the
+workers share its modules copy-on-write instead of each importing them, and a
+worker that fails to import fails the boot instead of crash-looping. Each
+worker still runs the app's lifespan, so Redis and Cloudinary are set up per
+process after the fork. Workers are recycled after WEB_MAX_REQUESTS requests,
+staggered by up to WEB_MAX_REQUESTS_JITTER so they do not all restart at once.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY") or os.cpu_count() or 1)
+# uvicorn's worker picks uvloop and httptools when they are installed, as with uvicorn[standard]
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+max_requests = int(os.environ.get("WEB_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.environ.get("WEB_MAX_REQUESTS_JITTER", "100"))
+# a worker silent for this long is killed and replaced
+timeout = int(os.environ.get("WEB_TIMEOUT", "30"))
+# on shutdown or recycling, in-flight requests get this long to finish
+graceful_timeout = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("WEB_KEEPALIVE", "5"))
+
+accesslog = "-"
+
+# /metrics aggregates the workers' samples from files in this directory. It is emptied here,
+# before the app is preloaded, so files left by an earlier run are not counted again.
+multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+if multiproc_dir:
+    os.makedirs(multiproc_dir, exist_ok=True)
+    for name in os.listdir(multiproc_dir):
+        if name.endswith(".db"):
+            os.remove(os.path.join(multiproc_dir, name))
+
+
+def when_ready(server):
+    # move the preloaded objects out of the collector's generations, so collections in
+    # the workers do not touch their pages and the copy-on-write sharing survives
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from src.core import tracing
+    from src.core.db import engine
+
+    # connections the master may have opened belong to it, the worker opens its own
+    engine.dispose(close=False)
+    # exporter threads and files do not survive the fork
+    tracing.configure_from_settings()
+
+
+def child_exit(server, worker):
+    if multiproc_dir:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
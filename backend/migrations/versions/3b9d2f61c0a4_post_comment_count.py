@@ -0,0 +1,33 @@
+"""post_comment_count
+
+Revision ID: 3b9d2f61c0a4
+Revises: 76a84a29ff04
+Create Date: 2026-10-19 09:12:40.118254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9d2f61c0a4'
+down_revision: Union[str, None] = '76a84a29ff04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    columns = [c['name'] for c in sa.inspect(op.get_bind()).get_columns('posts')]
+    if 'comment_count' not in columns:
+        op.add_column('posts', sa.Column('comment_count', sa.Integer(),
+                                         server_default='0', nullable=False))
+    op.execute(
+        "UPDATE posts SET comment_count = ("
+        "SELECT COUNT(*) FROM comments WHERE comments.post_id = posts.id)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('posts', 'comment_count')
@@ -0,0 +1,37 @@
+"""app settings with the admin bootstrap marker
+
+Revision ID: 5b8e2c7d9f14
+Revises: 9d3c7e1b4a60
+Create Date: 2026-10-19 23:14:37.902117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e2c7d9f14'
+down_revision: Union[str, None] = '9d3c7e1b4a60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'app_settings',
+        sa.Column('key', sa.String(length=50), nullable=False),
+        sa.Column('value', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('key')
+    )
+    # databases that already have users have had their admin
+    op.execute(
+        "INSERT INTO app_settings (key, value) "
+        "SELECT 'admin_bootstrapped', 'true' WHERE EXISTS (SELECT 1 FROM users)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('app_settings')
@@ -18,13 +18,87 @@ branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
 
+def base_columns():
+    return [
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('created_at', sa.DateTime(timezone=True),
+                  server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True)),
+        sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+    ]
+
+
 def upgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    pass
-    # ### end Alembic commands ###
+    # databases set up before migrations were introduced got this schema from
+    # Base.metadata.create_all(), they only need to be stamped
+    if sa.inspect(op.get_bind()).has_table('users'):
+        return
+    op.create_table(
+        'users',
+        *base_columns(),
+        sa.Column('username', sa.String(50), unique=True),
+        sa.Column('email', sa.String(250), nullable=False, unique=True),
+        sa.Column('password', sa.String(255), nullable=False),
+        sa.Column('avatar', sa.String(255), nullable=True),
+        sa.Column('refresh_token', sa.String(255), nullable=True),
+        sa.Column('confirmed', sa.Boolean()),
+        sa.Column('active', sa.Boolean()),
+        sa.Column('role', sa.String()),
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_table(
+        'tags',
+        *base_columns(),
+        sa.Column('name', sa.String()),
+    )
+    op.create_index('ix_tags_id', 'tags', ['id'])
+    op.create_index('ix_tags_name', 'tags', ['name'], unique=True)
+    op.create_table(
+        'posts',
+        *base_columns(),
+        sa.Column('title', sa.String()),
+        sa.Column('description', sa.String(255)),
+        sa.Column('image', sa.String(255)),
+        sa.Column('image_public_id', sa.String(255)),
+        sa.Column('transformed_image', sa.String(255)),
+        sa.Column('transformed_image_qr', sa.String(255)),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey(
+            'users.id', ondelete='CASCADE')),
+    )
+    op.create_index('ix_posts_id', 'posts', ['id'])
+    op.create_index('ix_posts_title', 'posts', ['title'])
+    op.create_table(
+        'comments',
+        *base_columns(),
+        sa.Column('content', sa.String()),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey(
+            'users.id', ondelete='CASCADE')),
+        sa.Column('post_id', sa.Integer(), sa.ForeignKey(
+            'posts.id', ondelete='CASCADE')),
+    )
+    op.create_index('ix_comments_id', 'comments', ['id'])
+    op.create_table(
+        'post_m2m_tag',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('post_id', sa.Integer(), sa.ForeignKey(
+            'posts.id', ondelete='CASCADE')),
+        sa.Column('tag_id', sa.Integer(), sa.ForeignKey(
+            'tags.id', ondelete='CASCADE')),
+    )
+    op.create_table(
+        'post_o2m_comment',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('post_id', sa.Integer(), sa.ForeignKey(
+            'posts.id', ondelete='CASCADE')),
+        sa.Column('comment_id', sa.Integer(), sa.ForeignKey(
+            'comments.id', ondelete='CASCADE')),
+    )
 
 
 def downgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    pass
-    # ### end Alembic commands ###
+    op.drop_table('post_o2m_comment')
+    op.drop_table('post_m2m_tag')
+    op.drop_table('comments')
+    op.drop_table('posts')
+    op.drop_table('tags')
+    op.drop_table('users')
@@ -0,0 +1,38 @@
+"""outbox
+
+Revision ID: 9d3c7e1b4a60
+Revises: e4a0b6d93f17
+Create Date: 2026-10-19 21:05:12.418530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3c7e1b4a60'
+down_revision: Union[str, None] = 'e4a0b6d93f17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=50), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('last_error', sa.String(length=500), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('available_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_outbox_available_at', 'outbox', ['available_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outbox_available_at', table_name='outbox')
+    op.drop_table('outbox')
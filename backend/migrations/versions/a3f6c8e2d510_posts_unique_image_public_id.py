@@ -0,0 +1,31 @@
+"""unique posts.image_public_id
+
+Revision ID: a3f6c8e2d510
+Revises: 5b8e2c7d9f14
+Create Date: 2026-10-20 09:41:12.518306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f6c8e2d510'
+down_revision: Union[str, None] = '5b8e2c7d9f14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # one post per uploaded image, a direct upload ticket can only be finalized once
+    with op.get_context().autocommit_block():
+        op.create_index('ix_posts_image_public_id', 'posts', ['image_public_id'], unique=True,
+                        if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_posts_image_public_id', table_name='posts', if_exists=True,
+                      postgresql_concurrently=True)
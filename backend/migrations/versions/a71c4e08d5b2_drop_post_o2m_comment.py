@@ -0,0 +1,56 @@
+"""drop_post_o2m_comment
+
+Revision ID: a71c4e08d5b2
+Revises: 3b9d2f61c0a4
+Create Date: 2026-10-19 10:41:05.502113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a71c4e08d5b2'
+down_revision: Union[str, None] = '3b9d2f61c0a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table('post_o2m_comment'):
+        # comments.post_id is the canonical link from now on, copy over any
+        # link that only ever existed in the association table
+        op.execute(
+            "UPDATE comments SET post_id = ("
+            "SELECT MIN(post_o2m_comment.post_id) FROM post_o2m_comment "
+            "WHERE post_o2m_comment.comment_id = comments.id) "
+            "WHERE comments.post_id IS NULL"
+        )
+        op.execute(
+            "UPDATE posts SET comment_count = ("
+            "SELECT COUNT(*) FROM comments WHERE comments.post_id = posts.id)"
+        )
+        op.drop_table('post_o2m_comment')
+    indexes = [i['name'] for i in inspector.get_indexes('comments')]
+    if 'ix_comments_post_id_created_at' not in indexes:
+        op.create_index('ix_comments_post_id_created_at',
+                        'comments', ['post_id', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_comments_post_id_created_at', table_name='comments')
+    op.create_table(
+        'post_o2m_comment',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('post_id', sa.Integer(), sa.ForeignKey(
+            'posts.id', ondelete='CASCADE')),
+        sa.Column('comment_id', sa.Integer(), sa.ForeignKey(
+            'comments.id', ondelete='CASCADE')),
+    )
+    op.execute(
+        "INSERT INTO post_o2m_comment (post_id, comment_id) "
+        "SELECT post_id, id FROM comments WHERE post_id IS NOT NULL"
+    )
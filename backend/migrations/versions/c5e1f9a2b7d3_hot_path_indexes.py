@@ -0,0 +1,49 @@
+"""hot_path_indexes
+
+Revision ID: c5e1f9a2b7d3
+Revises: a71c4e08d5b2
+Create Date: 2026-10-19 12:03:27.640931
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e1f9a2b7d3'
+down_revision: Union[str, None] = 'a71c4e08d5b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_users_email', 'users', ['email'], True),
+    ('ix_users_username', 'users', ['username'], True),
+    ('ix_posts_user_id', 'posts', ['user_id'], False),
+    ('ix_comments_user_id', 'comments', ['user_id'], False),
+    ('ix_post_m2m_tag_post_id_tag_id', 'post_m2m_tag', ['post_id', 'tag_id'], False),
+    ('ix_post_m2m_tag_tag_id', 'post_m2m_tag', ['tag_id'], False),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(name, table, columns, unique=unique, if_not_exists=True,
+                            postgresql_concurrently=True)
+    if op.get_bind().dialect.name == 'postgresql':
+        # the unique indexes above now enforce what the implicit constraints did
+        op.execute('ALTER TABLE users DROP CONSTRAINT IF EXISTS users_email_key')
+        op.execute('ALTER TABLE users DROP CONSTRAINT IF EXISTS users_username_key')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.create_unique_constraint('users_email_key', 'users', ['email'])
+        op.create_unique_constraint('users_username_key', 'users', ['username'])
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True,
+                          postgresql_concurrently=True)
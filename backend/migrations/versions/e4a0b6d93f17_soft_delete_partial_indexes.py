@@ -0,0 +1,49 @@
+"""soft_delete_partial_indexes
+
+Revision ID: e4a0b6d93f17
+Revises: c5e1f9a2b7d3
+Create Date: 2026-10-19 14:27:51.302744
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a0b6d93f17'
+down_revision: Union[str, None] = 'c5e1f9a2b7d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LIVE_ROWS = sa.text('deleted_at IS NULL')
+DELETED_ROWS = sa.text('deleted_at IS NOT NULL')
+
+INDEXES = [
+    ('ix_comments_post_id', 'comments', ['post_id'], None),
+    ('ix_comments_live_post_id_created_at', 'comments', ['post_id', 'created_at'], LIVE_ROWS),
+    ('ix_comments_deleted_at', 'comments', ['deleted_at'], DELETED_ROWS),
+    ('ix_posts_live_user_id', 'posts', ['user_id'], LIVE_ROWS),
+    ('ix_posts_deleted_at', 'posts', ['deleted_at'], DELETED_ROWS),
+    ('ix_users_deleted_at', 'users', ['deleted_at'], DELETED_ROWS),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True,
+                            postgresql_where=where, sqlite_where=where)
+        # superseded by ix_comments_post_id and its live-rows counterpart
+        op.drop_index('ix_comments_post_id_created_at', table_name='comments',
+                      if_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_comments_post_id_created_at', 'comments', ['post_id', 'created_at'],
+                        if_not_exists=True, postgresql_concurrently=True)
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True,
+                          postgresql_concurrently=True)
@@ -0,0 +1,57 @@
+import asyncio
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy.orm import Session
+
+from src.constants.messages import PROFILER_BUSY
+from src.core.config import settings
+from src.core.db import get_db
+from src.core.profiler import ProfilerBusy, SamplingProfiler
+from src.core.security import allowed_operation_admin
+from src.services.outbox import export_stats, outbox_stats
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/profile", dependencies=[Depends(allowed_operation_admin)])
+async def profile_worker(seconds: float = Query(10, gt=0, le=settings.PROFILER_MAX_SECONDS),
+                         interval_ms: float = Query(5, ge=1, le=100),
+                         output: Literal["speedscope", "collapsed"] = "speedscope",
+                         include_idle: bool = False):
+    """
+    Samples every thread of the worker that serves this request for the given number of seconds.
+
+    :param seconds: float: How long to sample for
+    :param interval_ms: float: Time between two samples
+    :param output: str: speedscope JSON or collapsed stacks for flamegraph.pl
+    :param include_idle: bool: Keep samples of threads parked on the event loop or a queue
+    :return: The recorded profile
+    """
+    profiler = SamplingProfiler(interval=interval_ms / 1000, include_idle=include_idle)
+    try:
+        profiler.start()
+    except ProfilerBusy:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=PROFILER_BUSY)
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop()
+    if output == "collapsed":
+        return PlainTextResponse(profiler.to_collapsed())
+    return JSONResponse(profiler.to_speedscope(), headers={"Content-Disposition": 'attachment; filename="profile.speedscope.json"'})
+
+
+@router.get("/outbox", dependencies=[Depends(allowed_operation_admin)])
+async def outbox_depth(db: Session = Depends(get_db)):
+    """
+    Reports the outbox messages waiting for the worker, per kind, the ones that ran out of attempts
+    and the age of the oldest waiting message. The numbers are also exported as Prometheus gauges.
+
+    :param db: Session: Database session
+    :return: The queue depth
+    """
+    stats = outbox_stats(db)
+    export_stats(stats)
+    return stats
@@ -1,16 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Security, BackgroundTasks, Request
+from fastapi import APIRouter, HTTPException, Depends, status, Security, Request
 from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials, HTTPBearer
 from fastapi_limiter.depends import RateLimiter
 from sqlalchemy.orm import Session
-from src.services.email import send_email
+from src.services.outbox import enqueue_confirmation_email
 from src.core.db import get_db
 from src.schemas.users import UserModel, UserResponse
 from src.schemas.token import TokenModel
 from src.schemas.email import RequestEmail
 from src.crud import users as repository_users
 from src.services.auth import auth_service
-from src.models.user import User
-from src.constants.role import UserRole
 from src.core.config import settings
 from src.constants.messages import AUTH_EMAIL_NOT_CONF, AUTH_ALREADY_EXIST, AUTH_INVALID_REF_TOKEN, AUTH_CANT_FIND_USER, AUTH_INVALID_PASSWORD, AUTH_BANNED
 from src.core.security import  allowed_operation_admin
@@ -20,17 +18,16 @@ security = HTTPBearer()
 
 
 @router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED, dependencies=[Depends(RateLimiter(times=10, seconds=60))])
-async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Request, db: Session = Depends(get_db)):
+async def signup(body: UserModel, request: Request, db: Session = Depends(get_db)):
     exist_user = await repository_users.get_user_by_email_or_username(body.email, body.username, db)
     if exist_user:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT,
                             detail=AUTH_ALREADY_EXIST)
-    roles = [UserRole.admin] if not db.query(User).count() else [UserRole.user]
     body.password = auth_service.get_password_hash(body.password)
+    # committed by create_user together with the user
+    enqueue_confirmation_email(db, body.email, body.username, settings.FRONTEND_URL)
     new_user = await repository_users.create_user(body, db)
-    background_tasks.add_task(
-        send_email, new_user.email, new_user.username, settings.FRONTEND_URL)
-    return {"user": new_user, "role": roles, "detail": "User successfully created. Check your email for confirmation."}
+    return {"user": new_user, "role": [new_user.role], "detail": "User successfully created. Check your email for confirmation."}
 
 
 @router.post("/login", response_model=TokenModel, dependencies=[Depends(RateLimiter(times=10, seconds=60))])
@@ -83,15 +80,14 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)):
 
 
 @router.post('/request_email', dependencies=[Depends(RateLimiter(times=10, seconds=60))])
-async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, request: Request,
-                        db: Session = Depends(get_db)):
+async def request_email(body: RequestEmail, request: Request, db: Session = Depends(get_db)):
     user = await repository_users.get_user_by_email(body.email, db)
 
     if user.confirmed:
         return {"message": "Your email is already confirmed"}
     if user:
-        background_tasks.add_task(
-            send_email, user.email, user.username, settings.FRONTEND_URL)
+        enqueue_confirmation_email(db, user.email, user.username, settings.FRONTEND_URL)
+        db.commit()
     return {"message": "Check your email for confirmation."}
 
 
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, status
+from typing import List, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from fastapi_limiter.depends import RateLimiter
 from sqlalchemy.orm import Session
 from src.models.user import User
 from src.services.auth import auth_service
 from src.core.db import get_db
 from src.crud import comments as repository_comments
+from src.crud.users import get_users_by_ids
 from src.schemas import comments as schema_comments
+from src.core.responses import ModelJSONResponse, fast_response, ndjson_response, wants_ndjson
+from src.constants.messages import NORMALIZED_NDJSON
 from src.core.security import allowed_operation_any_user, allowed_operation_admin_moderator
 
 router = APIRouter(prefix='/posts/comments', tags=['comments'])
@@ -28,6 +32,33 @@ async def add_comment(body: schema_comments.CommentModel, current_user: User = D
     return await repository_comments.create_comment(body=body, user=current_user, db=db)
 
 
+@router.get("/", status_code=status.HTTP_200_OK, response_model=Union[List[schema_comments.CommentResponse], schema_comments.CommentsNormalized], dependencies=[Depends(allowed_operation_any_user), Depends(RateLimiter(times=10, seconds=60))])
+async def read_comments(request: Request, post_id: int, limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0), normalized: bool = Query(False, description="Reference authors by user_id and return each of them once in a top level users map"), db: Session = Depends(get_db)):
+    """
+    The read_comments function returns one page of the comment thread of a post.
+        Post listings only carry a comment count and a short preview, the full thread is read from here.
+        With Accept: application/x-ndjson the whole thread is streamed instead, one comment per line.
+        With normalized the comments carry a user_id and every author is returned once in a users map,
+        a stream cannot carry the map, so normalized and NDJSON together are a 400.
+
+    :param post_id: int: Specify the post whose comments are read
+    :param limit: int: Limit the number of comments returned
+    :param offset: int: Skip that many comments before returning the results
+    :param normalized: bool: Return the authors in a users map instead of on every comment
+    :param db: Session: Get a database session from the dependency injection container
+    :return: A list of comment objects
+    """
+    if wants_ndjson(request):
+        if normalized:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=NORMALIZED_NDJSON)
+        return ndjson_response(repository_comments.stream_comments(post_id, db), schema_comments.CommentResponse)
+    comments = await repository_comments.get_comments(post_id=post_id, limit=limit, offset=offset, db=db)
+    if normalized:
+        users = await get_users_by_ids({comment.user_id for comment in comments}, db)
+        return ModelJSONResponse({"comments": comments, "users": users}, schema_comments.CommentsNormalized)
+    return fast_response(comments, List[schema_comments.CommentResponse])
+
+
 @router.get("/{comment_id}", status_code=status.HTTP_200_OK, response_model=schema_comments.CommentResponse, dependencies=[Depends(allowed_operation_any_user), Depends(RateLimiter(times=10, seconds=60))])
 async def read_comment(comment_id: int, db: Session = Depends(get_db)):
     """
@@ -61,7 +92,7 @@ async def update_comment(comment_id: int, body: schema_comments.CommentUpdate, c
     return await repository_comments.update_comment(comment_id=comment_id, user=current_user, body=body, db=db)
 
 
-@router.delete("/{comment_id}", status_code=200, dependencies=[Depends(allowed_operation_admin_moderator), Depends(RateLimiter(times=10, seconds=60))])
+@router.delete("/{comment_id}", status_code=200, response_model=schema_comments.CommentResponse, dependencies=[Depends(allowed_operation_admin_moderator), Depends(RateLimiter(times=10, seconds=60))])
 async def delete_comment(comment_id: int, db: Session = Depends(get_db)):
     """
     The update_comment function updates a comment by deleting it.
@@ -75,4 +106,4 @@ async def delete_comment(comment_id: int, db: Session = Depends(get_db)):
     :param db: Session: Pass the database session to the function
     :return: A dictionary with the deleted comment
     """
-    return await repository_comments.get_comment_by_id(comment_id=comment_id, db=db)
+    return await repository_comments.remove_comment(comment_id=comment_id, db=db)
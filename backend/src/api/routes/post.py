@@ -1,19 +1,52 @@
-from fastapi import APIRouter, File, UploadFile, Depends
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile, Depends, Query, Request, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
 from fastapi_limiter.depends import RateLimiter
-from typing import List
+from typing import Dict, List, Union
 from sqlalchemy.orm import Session
 from src.models.user import User
 from src.core.db import get_db
-from src.schemas.posts import PostCreate, PostUpdate, PostDelete, PostModelWithImage, PostModelCreate, PostTransformImage, PostTransformImageQR
-from src.crud.post import upload_post_with_description, delete_post, update_post_description, get_post_by_id, get_all_posts_list, transform_image, generate_and_get_qr_code
+from src.schemas.posts import PostBatchItem, PostBatchRequest, PostBulkItem, PostCreate, PostFinalizeUpload, PostUploadTicket, PostUpdate, PostDelete, PostModelWithImage, PostNormalized, PostNormalizedResponse, PostsNormalized, PostModelCreate, PostTransformImage, PostTransformImageQR
+from src.crud.post import upload_post_with_description, upload_posts_bulk, create_upload_ticket, finalize_upload, delete_post, update_post_description, get_post_by_id, get_posts_by_ids, get_all_posts_list, referenced_user_ids, stream_posts, transform_image, generate_and_get_qr_code
+from src.crud.comments import attach_latest_comments
+from src.crud.users import get_users_by_ids
+from src.schemas.users import UserDb
 from src.services.auth import auth_service
+from src.constants.messages import NORMALIZED_NDJSON, POST_BULK_MISMATCH, POST_BULK_TOO_MANY, POST_NOT_FOUND
+from src.core.config import settings
+from src.core.responses import ModelJSONResponse, envelope, fast_response, model_subset, ndjson_response, parse_fields, wants_ndjson
 
 router = APIRouter(prefix="/posts", tags=["posts"])
 
+FIELDS_QUERY = Query(None, description=f"Comma separated fields to return, id is always included: {', '.join(PostModelWithImage.model_fields)}, user_id instead of user when normalized")
+NORMALIZED_QUERY = Query(False, description="Reference authors by user_id and return each of them once in a top level users map")
 
-@router.get("/", response_model=List[PostModelWithImage], dependencies=[Depends(RateLimiter(times=10, seconds=30))])
-async def get_all_posts(user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db), is_own: bool = None):
-    return await get_all_posts_list(user, db, is_own) 
+
+@router.get("/", response_model=Union[List[PostModelWithImage], PostsNormalized], dependencies=[Depends(RateLimiter(times=10, seconds=30))])
+async def get_all_posts(request: Request, user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db), is_own: bool = None, comments_preview: int = Query(0, ge=0, le=10), fields: str = FIELDS_QUERY, normalized: bool = NORMALIZED_QUERY):
+    full_model = PostNormalized if normalized else PostModelWithImage
+    fields = parse_fields(fields, full_model, ("id", "user_id") if normalized else ("id",))
+    model = model_subset(full_model, fields) if fields is not None else full_model
+    with_preview = fields is None or "latest_comments" in fields
+    if wants_ndjson(request):
+        # a stream of posts has nowhere to carry the users map
+        if normalized:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=NORMALIZED_NDJSON)
+
+        async def add_preview(batch, session):
+            if with_preview:
+                await attach_latest_comments(batch, comments_preview, session)
+        return ndjson_response(stream_posts(user, db, is_own, add_preview, fields=fields), model)
+    posts = await get_all_posts_list(user, db, is_own, fields)
+    if with_preview:
+        await attach_latest_comments(posts, comments_preview, db, with_user=not normalized)
+    if normalized:
+        users = await get_users_by_ids(referenced_user_ids(posts), db)
+        return ModelJSONResponse({"posts": posts, "users": users},
+                                 envelope("PostsNormalized", posts=List[model], users=Dict[int, UserDb]))
+    if fields is not None:
+        return ModelJSONResponse(posts, List[model])
+    return fast_response(posts, List[PostModelWithImage])
 
 
 @router.post("/", response_model=PostCreate, dependencies=[Depends(RateLimiter(times=10, seconds=60))])
@@ -22,6 +55,40 @@ async def upload_post(user: User = Depends(auth_service.get_current_user), image
     return {"post": post, "detail": "Post successfully created"}
 
 
+@router.post("/batch", response_model=List[PostBatchItem], dependencies=[Depends(RateLimiter(times=10, seconds=30))])
+async def get_posts_batch(body: PostBatchRequest, db: Session = Depends(get_db), comments_preview: int = Query(0, ge=0, le=10)):
+    posts = await get_posts_by_ids(body.ids, db)
+    await attach_latest_comments(list(posts.values()), comments_preview, db)
+    items = [{"id": post_id, "post": posts[post_id]} if post_id in posts else {"id": post_id, "detail": POST_NOT_FOUND}
+             for post_id in body.ids]
+    return fast_response(items, List[PostBatchItem])
+
+
+@router.post("/bulk", response_model=List[PostBulkItem], dependencies=[Depends(RateLimiter(times=2, seconds=60))])
+async def upload_posts(user: User = Depends(auth_service.get_current_user), images: List[UploadFile] = File(...), posts: str = Form(..., description="JSON array with a {title, description, tags} object per image, in the same order"), db: Session = Depends(get_db)):
+    if len(images) > settings.BULK_UPLOAD_MAX_FILES:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=POST_BULK_TOO_MANY.format(settings.BULK_UPLOAD_MAX_FILES))
+    try:
+        bodies = TypeAdapter(List[PostModelCreate]).validate_json(posts)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+    if len(bodies) != len(images):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=POST_BULK_MISMATCH.format(len(bodies), len(images)))
+    results = await upload_posts_bulk(user, images, bodies, db)
+    return fast_response(results, List[PostBulkItem])
+
+
+@router.post("/uploads", response_model=PostUploadTicket, dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+async def request_upload_ticket(user: User = Depends(auth_service.get_current_user)):
+    return create_upload_ticket(user)
+
+
+@router.post("/uploads/finalize", response_model=PostCreate, dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+async def finalize_direct_upload(body: PostFinalizeUpload, user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+    post = await finalize_upload(user, body, db)
+    return {"post": post, "detail": "Post successfully created"}
+
+
 @router.delete("/{post_id}", response_model=PostDelete, dependencies=[Depends(RateLimiter(times=10, seconds=60))])
 async def remove_post(post_id: int, user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
     await delete_post(post_id, user, db)
@@ -34,9 +101,21 @@ async def update_post(post_id: int, description: str, user: User = Depends(auth_
     return {"post": post, "detail": 'Post successfully updated'}
 
 
-@router.get("/{post_id}", response_model=PostModelWithImage, dependencies=[Depends(RateLimiter(times=10, seconds=30))])
-async def get_specific_post(post_id: int, db: Session = Depends(get_db)):
-    return await get_post_by_id(post_id, db)
+@router.get("/{post_id}", response_model=Union[PostModelWithImage, PostNormalizedResponse], dependencies=[Depends(RateLimiter(times=10, seconds=30))])
+async def get_specific_post(post_id: int, db: Session = Depends(get_db), comments_preview: int = Query(0, ge=0, le=10), fields: str = FIELDS_QUERY, normalized: bool = NORMALIZED_QUERY):
+    full_model = PostNormalized if normalized else PostModelWithImage
+    fields = parse_fields(fields, full_model, ("id", "user_id") if normalized else ("id",))
+    model = model_subset(full_model, fields) if fields is not None else full_model
+    post = await get_post_by_id(post_id, db, fields)
+    if fields is None or "latest_comments" in fields:
+        await attach_latest_comments([post], comments_preview, db, with_user=not normalized)
+    if normalized:
+        users = await get_users_by_ids(referenced_user_ids([post]), db)
+        return ModelJSONResponse({"post": post, "users": users},
+                                 envelope("PostNormalizedResponse", post=model, users=Dict[int, UserDb]))
+    if fields is not None:
+        return ModelJSONResponse(post, model)
+    return fast_response(post, PostModelWithImage)
 
 
 @router.post("/{post_id}/transform", response_model=PostTransformImage, dependencies=[Depends(RateLimiter(times=10, seconds=60))])
@@ -37,10 +37,30 @@ AUTH_BANNED = "User is banned"
 # post
 POST_NOT_FOUND = "Post not found!"
 POST_NO_TRANSFORMED_IMAGE = "Post has no transformed image yet, please transform it first"
+POST_UPLOAD_FAILED = "Image could not be uploaded"
+POST_BULK_TOO_MANY = "At most {} images per request"
+POST_BULK_MISMATCH = "Expected one entry in posts per image, got {} for {} images"
+POST_UPLOAD_TICKET_INVALID = "Upload ticket is invalid or expired"
+POST_UPLOAD_SIGNATURE_INVALID = "Upload signature does not match the uploaded image"
+POST_UPLOAD_ALREADY_FINALIZED = "A post was already created for this upload"
 
 # tags
 UNPROCESSABLE_ENTITY = "Tags must be less than 5"
 
+# db
+DB_SCHEMA_NOT_MIGRATED = "Database schema is at revision {} but the code expects {}, run `alembic upgrade head`"
+
+# redis
+REDIS_NOT_OPEN = "Redis is not open, open_redis() runs in the app's lifespan"
+
+# admin
+PROFILER_BUSY = "A profile is already being recorded on this worker"
+
 # common
 BAD_REQUEST = "Cant process request"
-OPERATION_FORBIDDEN = "Operation forbidden"
\ No newline at end of file
+OPERATION_FORBIDDEN = "Operation forbidden"
+UNKNOWN_FIELDS = "Unknown fields: {}. Available fields: {}"
+NORMALIZED_NDJSON = "normalized is not supported with Accept: application/x-ndjson, request JSON instead"
+IDEMPOTENCY_IN_PROGRESS = "A request with this Idempotency-Key is still being processed"
+IDEMPOTENCY_KEY_REUSED = "This Idempotency-Key was already used for a request with a different body"
+IDEMPOTENCY_KEY_TOO_LONG = "Idempotency-Key must be at most 255 characters"
\ No newline at end of file
@@ -26,6 +26,15 @@ class Settings(BaseSettings):
     CLOUDINARY_CLOUD_NAME: str = ''
     CLOUDINARY_API_KEY: str = ''
     CLOUDINARY_API_SECRET: str = ''
+    CLOUDINARY_UPLOAD_PREFIX: str = ''
+    SMTP_SSL_TLS: bool = True
+    SMTP_STARTTLS: bool = False
+    SMTP_POOL_SIZE: int = 2
+    SMTP_QUEUE_SIZE: int = 100
+    SMTP_BATCH_SIZE: int = 20
+    SMTP_MAX_RETRIES: int = 3
+    SMTP_KEEPALIVE_SECONDS: float = 30
+    SMTP_TIMEOUT_SECONDS: float = 10
     ALGORITHM: str = 'HS256'
     FRONTEND_URL: str = 'http://localhost:3000'
     BACKEND_URL: str = 'http://localhost:8000'
@@ -33,6 +42,27 @@ class Settings(BaseSettings):
     REDIS_HOST_: str = 'redis'
     REDIS_PORT: int = 6379
     REDIS_PASSWORD: str = ''
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: float = 5
+    REDIS_SOCKET_TIMEOUT: float = 5
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+    CHECK_MIGRATIONS_ON_STARTUP: bool = True
+    QUERY_REPEAT_WARN_THRESHOLD: int = 10
+    PROFILER_MAX_SECONDS: int = 60
+    TRACING_EXPORT_FILE: str = ''
+    TRACING_OTLP_ENDPOINT: str = ''
+    FAST_JSON_RESPONSES: bool = True
+    STREAM_BATCH_SIZE: int = 500
+    POSTS_BATCH_MAX_IDS: int = 100
+    BULK_UPLOAD_MAX_FILES: int = 20
+    UPLOAD_CONCURRENCY: int = 4
+    UPLOAD_TICKET_TTL_SECONDS: int = 900
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_LOCK_SECONDS: int = 60
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    OUTBOX_RETRY_BASE_SECONDS: float = 30
+    OUTBOX_LEASE_SECONDS: int = 300
 
     @computed_field  # type: ignore[misc]
     @property
@@ -0,0 +1,81 @@
+"""
+Batching loader for lookups by key.
+
+A DataLoader collects the keys asked for with load/load_many during one
+iteration of the event loop and fetches them together with a single call to
+its batch function, typically one `IN (...)` query. Results, including misses,
+are memoized for the lifetime of the loader, so asking again costs nothing:
+
+    users = DataLoader(lambda ids: {user.id: user for user in db.query(User).filter(User.id.in_(ids))})
+    author, reader = await asyncio.gather(users.load(1), users.load(2))  # one query
+
+Batch functions are synchronous, like the rest of the database access.
+"""
+import asyncio
+from typing import Callable, Hashable, Iterable
+
+
+class DataLoader:
+    def __init__(self, batch_load: Callable[[list], dict]):
+        """
+        :param batch_load: Callable: Takes a list of keys and returns a dict of the values found by key
+        """
+        self.batch_load = batch_load
+        self._values = {}
+        self._pending = {}
+        self._queue = []
+
+    def _enqueue(self, key: Hashable) -> asyncio.Future:
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[key] = loop.create_future()
+            if not self._queue:
+                # runs after every task that is ready now had its turn to add keys
+                loop.call_soon(self._dispatch)
+            self._queue.append(key)
+        return future
+
+    def _dispatch(self):
+        keys, self._queue = self._queue, []
+        futures = [self._pending.pop(key) for key in keys]
+        try:
+            values = self.batch_load(keys)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in zip(keys, futures):
+            value = self._values[key] = values.get(key)
+            if not future.done():
+                future.set_result(value)
+
+    async def load(self, key: Hashable):
+        """
+        The load function returns the value for `key`, or None when there is none.
+        """
+        if key in self._values:
+            return self._values[key]
+        return await self._enqueue(key)
+
+    async def load_many(self, keys: Iterable[Hashable]) -> list:
+        """
+        The load_many function returns the values for `keys` in the same order, fetched in one batch.
+        """
+        keys = list(keys)
+        pending = {key: self._enqueue(key) for key in keys if key not in self._values}
+        values = {key: self._values[key] for key in keys if key not in pending}
+        for key, future in pending.items():
+            values[key] = await future
+        return [values[key] for key in keys]
+
+    def prime(self, key: Hashable, value):
+        """
+        The prime function memoizes a value found some other way, such as a row just created.
+        """
+        if key not in self._pending:
+            self._values[key] = value
+
+    def clear(self):
+        self._values.clear()
@@ -1,16 +1,36 @@
 # DB connection will be there
 
+import time
+from pathlib import Path
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from src.core.config import settings
-from src.models.base import Base
+from src.core import query_counter, tracing
+from src.core.metrics import DB_POOL_CHECKOUT_WAIT
+from src.constants.messages import DB_SCHEMA_NOT_MIGRATED
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+
+
+class TimedQueuePool(QueuePool):
+    # how long a request waits for a free connection when the pool is exhausted
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
 
 SQLALCHEMY_DATABASE_URL = str(settings.SQLALCHEMY_DATABASE_URI)
-engine = create_engine(SQLALCHEMY_DATABASE_URL, echo=True)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, echo=True, poolclass=TimedQueuePool)
+query_counter.install(engine)
+tracing.install(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base.metadata.create_all(bind=engine)
 
 def get_db():
     db = SessionLocal()
@@ -18,6 +38,24 @@ def get_db():
         yield db
     finally:
         db.close()
-        
-        
 
+
+def check_schema_is_migrated():
+    """
+    The check_schema_is_migrated function refuses to boot against a database
+    that is not at the latest Alembic revision. The schema is owned by the
+    migrations in ./migrations, run `alembic upgrade head` before starting the app.
+    """
+    # alembic is only needed for this check, keep it out of the import of the app
+    from alembic.config import Config
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "migrations"))
+    heads = set(ScriptDirectory.from_config(config).get_heads())
+    with engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    if current != heads:
+        raise RuntimeError(DB_SCHEMA_NOT_MIGRATED.format(
+            ", ".join(sorted(current)) or "none", ", ".join(sorted(heads))))
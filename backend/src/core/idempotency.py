@@ -0,0 +1,173 @@
+"""
+Idempotency-Key support for non-idempotent writes.
+
+A client that retries a request with the same Idempotency-Key header gets the
+response of the first attempt replayed from Redis instead of running the
+endpoint again, so a retried upload does not create a second post. Only the
+routes given to the middleware are covered. Keys are scoped to the route and
+the caller, the subject of their access token, so a retry after a token
+refresh is still recognised. Reusing a key with a different request body is
+answered with 422 instead of replaying a response to another request.
+
+While the first attempt runs it holds a lock, and duplicates that arrive
+meanwhile wait for its response. The lock expires after IDEMPOTENCY_LOCK_SECONDS
+so a crashed worker cannot hold it forever, and is extended while the request
+runs, so a slow upload keeps it. Responses are kept for IDEMPOTENCY_TTL_SECONDS,
+except server errors, 409 and 429, which the client should be able to retry.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import secrets
+import time
+from contextlib import asynccontextmanager
+from typing import Callable
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from src.core.config import settings
+from src.constants.messages import IDEMPOTENCY_IN_PROGRESS, IDEMPOTENCY_KEY_REUSED, IDEMPOTENCY_KEY_TOO_LONG
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+REPLAYED_HEADER = b"idempotent-replayed"
+MAX_KEY_LENGTH = 255
+NOT_STORED = {409, 429}
+
+# the lock is only extended or released by the request holding it, whose token it stores
+EXTEND_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def bearer_token(headers: Headers) -> str | None:
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    return token if scheme.lower() == "bearer" and token else None
+
+
+class BodyDigest:
+    """
+    Hashes the request body while the app reads it through receive(), or reads
+    the rest of it when the digest is needed, without keeping it in memory.
+    """
+
+    def __init__(self, receive):
+        self._receive = receive
+        self._sha256 = hashlib.sha256()
+        self._complete = False
+
+    async def receive(self):
+        message = await self._receive()
+        if message["type"] == "http.request":
+            self._sha256.update(message.get("body", b""))
+            self._complete = not message.get("more_body", False)
+        else:
+            self._complete = True
+        return message
+
+    async def hexdigest(self) -> str:
+        while not self._complete:
+            await self.receive()
+        return self._sha256.hexdigest()
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app, routes, subject: Callable[[str | None], str | None],
+                 ttl: int = settings.IDEMPOTENCY_TTL_SECONDS, lock_ttl: float = settings.IDEMPOTENCY_LOCK_SECONDS,
+                 poll_interval: float = 0.05):
+        """
+        :param routes: Iterable of (method, path) pairs to cover, e.g. ("POST", "/api/v1/posts/")
+        :param subject: Returns the caller for the bearer token of the request, or None when it has none or it is invalid
+        """
+        self.app = app
+        self.routes = set(routes)
+        self.subject = subject
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.poll_interval = poll_interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in self.routes:
+            return await self.app(scope, receive, send)
+        headers = Headers(scope=scope)
+        key = headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return await self.app(scope, receive, send)
+        if len(key) > MAX_KEY_LENGTH:
+            return await JSONResponse({"detail": IDEMPOTENCY_KEY_TOO_LONG}, 400)(scope, receive, send)
+
+        redis = scope["app"].state.redis
+        caller = self.subject(bearer_token(headers)) or ""
+        digest = hashlib.sha256(f"{scope['method']} {scope['path']} {caller} {key}".encode()).hexdigest()
+        response_key, lock_key = f"idempotency:{digest}", f"idempotency:{digest}:lock"
+        body = BodyDigest(receive)
+        deadline = time.monotonic() + self.lock_ttl
+        while True:
+            stored = await redis.get(response_key)
+            if stored is not None:
+                stored = json.loads(stored)
+                # absent from responses stored before request bodies were hashed
+                request = stored.get("request")
+                if request is not None and request != await body.hexdigest():
+                    return await JSONResponse({"detail": IDEMPOTENCY_KEY_REUSED}, 422)(scope, receive, send)
+                return await self._replay(stored, send)
+            token = secrets.token_hex(16)
+            if await redis.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000)):
+                async with self._holding(redis, lock_key, token):
+                    return await self._run_and_store(scope, body, send, redis, response_key)
+            if time.monotonic() > deadline:
+                return await JSONResponse({"detail": IDEMPOTENCY_IN_PROGRESS}, 409)(scope, receive, send)
+            await asyncio.sleep(self.poll_interval)
+
+    @asynccontextmanager
+    async def _holding(self, redis, lock_key: str, token: str):
+        async def extend():
+            while True:
+                await asyncio.sleep(self.lock_ttl / 3)
+                await redis.eval(EXTEND_LOCK, 1, lock_key, token, int(self.lock_ttl * 1000))
+
+        heartbeat = asyncio.create_task(extend())
+        try:
+            yield
+        finally:
+            heartbeat.cancel()
+            await redis.eval(RELEASE_LOCK, 1, lock_key, token)
+
+    async def _run_and_store(self, scope, body: BodyDigest, send, redis, response_key: str):
+        status = 500
+        headers = []
+        chunks = []
+
+        async def capture(message):
+            nonlocal status, headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = [(name.decode("latin-1"), value.decode("latin-1")) for name, value in message.get("headers", [])
+                           if name.lower() != b"content-length"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, body.receive, capture)
+        if status < 500 and status not in NOT_STORED:
+            stored = {"status": status, "headers": headers, "body": base64.b64encode(b"".join(chunks)).decode(),
+                      "request": await body.hexdigest()}
+            await redis.set(response_key, json.dumps(stored), ex=self.ttl)
+
+    @staticmethod
+    async def _replay(stored: dict, send):
+        body = base64.b64decode(stored["body"])
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in stored["headers"]]
+        headers += [(b"content-length", str(len(body)).encode()), (REPLAYED_HEADER, b"true")]
+        await send({"type": "http.response.start", "status": stored["status"], "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,16 @@
+"""
+Cloudinary client setup, shared by the app and the workers.
+"""
+import cloudinary
+
+from src.core.config import settings
+
+
+def configure_cloudinary():
+    # called from the app's lifespan and the workers' entry points
+    cloudinary.config(
+        cloud_name=settings.CLOUDINARY_CLOUD_NAME,
+        api_key=settings.CLOUDINARY_API_KEY,
+        api_secret=settings.CLOUDINARY_API_SECRET,
+        upload_prefix=settings.CLOUDINARY_UPLOAD_PREFIX or None
+    )
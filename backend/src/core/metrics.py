@@ -0,0 +1,87 @@
+"""
+Prometheus metrics.
+
+PrometheusMiddleware records per-route latency, response size and in-flight
+requests; track_dependency times calls to Redis, Cloudinary and the database
+pool, and traces each call as a span. With several workers set
+PROMETHEUS_MULTIPROC_DIR to an empty directory shared by all of them, /metrics
+then aggregates every worker's samples.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+from src.core.tracing import SPAN_KIND_CLIENT, start_span
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"])
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "HTTP response body size", ["method", "route"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304))
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests being served", multiprocess_mode="livesum")
+DEPENDENCY_LATENCY = Histogram(
+    "dependency_call_duration_seconds", "Latency of calls to external dependencies", ["dependency", "operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a database connection from the pool",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30))
+REDIS_POOL_CHECKOUT_WAIT = Histogram(
+    "redis_pool_checkout_wait_seconds", "Time spent waiting for a Redis connection from the pool",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5))
+REDIS_POOL_IN_USE = Gauge(
+    "redis_pool_connections_in_use", "Redis connections checked out of the pool", multiprocess_mode="livesum")
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+@contextmanager
+def track_dependency(dependency: str, operation: str):
+    start = time.perf_counter()
+    try:
+        with start_span(f"{dependency} {operation}", kind=SPAN_KIND_CLIENT, **{"peer.service": dependency}):
+            yield
+    finally:
+        DEPENDENCY_LATENCY.labels(dependency, operation).observe(time.perf_counter() - start)
+
+
+def render_metrics() -> bytes:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+class PrometheusMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_with_metrics(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # label by route template so /posts/1 and /posts/2 share a series
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            REQUEST_LATENCY.labels(scope["method"], path, status).observe(time.perf_counter() - start)
+            RESPONSE_SIZE.labels(scope["method"], path).observe(size)
@@ -0,0 +1,168 @@
+"""
+Sampling profiler for live workers.
+
+SamplingProfiler runs a background thread that snapshots every Python thread's
+stack with sys._current_frames() at a fixed interval. Nothing is hooked into
+the interpreter, so when no profile is being taken there is no cost at all.
+
+Profiles are exported in the speedscope format (https://www.speedscope.app)
+or as collapsed stacks for flamegraph.pl.
+"""
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import parse_qs
+
+# leaf frames of threads that are parked: idle event loop, idle threadpool workers
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+# one profile per worker at a time, sampling twice would double the overhead and skew both
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks = Counter()
+        self.sample_count = 0
+        self.started_at = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not _profile_lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+        _profile_lock.release()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                if not stack or (not self.include_idle and self._is_idle(stack[0])):
+                    continue
+                stack.append((f"thread {names.get(thread_id, thread_id)}", "", 0))
+                stack.reverse()
+                self.stacks[tuple(stack)] += 1
+            self.sample_count += 1
+
+    @staticmethod
+    def _is_idle(leaf) -> bool:
+        name, filename, _ = leaf
+        return (filename.rsplit("/", 1)[-1], name) in IDLE_FRAMES
+
+    def to_speedscope(self, name: str = "photoshare") -> dict:
+        frames = []
+        index = {}
+        samples = []
+        weights = []
+        for stack, count in self.stacks.most_common():
+            sample = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                sample.append(index[frame])
+            samples.append(sample)
+            weights.append(count * self.interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "photoshare-sampling-profiler",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+    def to_collapsed(self) -> str:
+        lines = []
+        for stack, count in self.stacks.most_common():
+            frames = ";".join(f"{name} ({filename.rsplit('/', 1)[-1]}:{line})" if filename else name
+                              for name, filename, line in stack)
+            lines.append(f"{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class ProfileRequestMiddleware:
+    """
+    Profiles a single request when it is called with ?profile=1 and replies with
+    the speedscope profile instead of the endpoint's response. Only mounted when
+    ENVIRONMENT is not production.
+    """
+
+    def __init__(self, app, interval: float = 0.001):
+        self.app = app
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or b"profile=" not in scope["query_string"]:
+            return await self.app(scope, receive, send)
+        if parse_qs(scope["query_string"].decode()).get("profile") != ["1"]:
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def discard_response(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        try:
+            with SamplingProfiler(interval=self.interval) as profiler:
+                await self.app(scope, receive, discard_response)
+        except ProfilerBusy:
+            return await self.app(scope, receive, send)
+
+        body = json.dumps(profiler.to_speedscope(name=f"{scope['method']} {scope['path']}")).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"x-profiled-status", str(status).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
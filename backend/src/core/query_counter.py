@@ -0,0 +1,146 @@
+"""
+Per-request SQL instrumentation.
+
+Engine events count every statement and its duration into the QueryStats of
+the current request. QueryCounterMiddleware reports them in a Server-Timing
+header and logs a warning when one statement fingerprint runs more often than
+QUERY_REPEAT_WARN_THRESHOLD times in a single request, which is how N+1 lazy
+loads show up. A streamed response sends its headers before the queries that
+produce its body run, so it gets no header and its totals are logged instead.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_current_stats: ContextVar["QueryStats | None"] = ContextVar("query_stats", default=None)
+_observers = []
+
+_PLACEHOLDERS = re.compile(r"\(\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|\$\d+|:\w+))*\s*\)")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """
+    The fingerprint function normalizes a statement so that the same query with
+    other parameters, literals or IN list lengths maps to the same string.
+    """
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    statement = _LITERALS.sub("?", statement)
+    return _PLACEHOLDERS.sub("(...)", statement)
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        self.statements[fingerprint(statement)] += 1
+
+    def merge(self, other: "QueryStats"):
+        self.count += other.count
+        self.duration += other.duration
+        self.statements.update(other.statements)
+
+    def repeated(self, threshold: int):
+        return [(statement, count) for statement, count in self.statements.most_common() if count > threshold]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.duration * 1000:.2f};desc="{self.count} queries"'
+
+    def report(self) -> str:
+        return "\n".join(f"{count:>5} x {statement}" for statement, count in self.statements.most_common())
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        context._query_counter_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    start = getattr(context, "_query_counter_start", None)
+    if stats is not None and start is not None:
+        stats.record(statement, time.perf_counter() - start)
+
+
+def install(engine: Engine):
+    """
+    The install function hooks the counter into the cursor events of an engine.
+    Statements only cost a context variable lookup when no request is tracked.
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def capture_queries():
+    """
+    The capture_queries function collects the statements run by the block,
+    including those of requests served by QueryCounterMiddleware meanwhile
+    (the TestClient runs the app in another thread).
+    """
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    _observers.append(stats.merge)
+    try:
+        yield stats
+    finally:
+        _observers.remove(stats.merge)
+        _current_stats.reset(token)
+
+
+class QueryCounterMiddleware:
+    def __init__(self, app, repeat_threshold: int = settings.QUERY_REPEAT_WARN_THRESHOLD):
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        start = None
+        streamed = False
+
+        async def send_with_timing(message):
+            nonlocal start, streamed
+            if message["type"] == "http.response.start":
+                # held back until the first body message tells whether more will follow
+                start = message
+                return
+            if start is not None:
+                streamed = message.get("more_body", False)
+                if not streamed:
+                    MutableHeaders(scope=start).append("Server-Timing", stats.server_timing())
+                await send(start)
+                start = None
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_stats.reset(token)
+            if streamed:
+                logger.info("%s %s streamed its response with %d queries in %.2f ms",
+                            scope["method"], scope["path"], stats.count, stats.duration * 1000)
+            for statement, count in stats.repeated(self.repeat_threshold):
+                logger.warning("%s %s ran the same statement %d times: %s",
+                               scope["method"], scope["path"], count, statement)
+            for observer in list(_observers):
+                observer(stats)
@@ -0,0 +1,129 @@
+"""
+The app's one Redis client.
+
+Every part of the app, the rate limiter, the user cache and idempotency keys,
+shares a single asyncio client over a bounded connection pool, opened by the
+app's lifespan with open_redis() and closed with close_redis(). Code outside
+a request gets it with redis_client():
+
+    user = await redis_client().get(f"user:{email}")
+
+When all REDIS_MAX_CONNECTIONS connections are busy a command waits up to
+REDIS_POOL_TIMEOUT seconds for one. Connections idle for longer than
+REDIS_HEALTH_CHECK_INTERVAL are pinged before use, so one dropped by Redis or
+a load balancer is replaced instead of failing the command. Every command and
+pipeline is timed with track_dependency, the pool exports its checkout wait
+and connections in use.
+
+pipelined() sends several commands in one round trip:
+
+    async with pipelined() as pipe:
+        pipe.set("a", 1, ex=60)
+        pipe.delete("b")
+    print(pipe.results)
+"""
+import time
+from contextlib import asynccontextmanager
+
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.client import Pipeline
+
+from src.core.config import settings
+from src.constants.messages import REDIS_NOT_OPEN
+from src.core.metrics import REDIS_POOL_CHECKOUT_WAIT, REDIS_POOL_IN_USE, track_dependency
+
+_client = None
+
+
+class InstrumentedConnectionPool(BlockingConnectionPool):
+    async def get_connection(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            connection = await super().get_connection(*args, **kwargs)
+        finally:
+            REDIS_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+        REDIS_POOL_IN_USE.inc()
+        return connection
+
+    async def release(self, connection):
+        REDIS_POOL_IN_USE.dec()
+        await super().release(connection)
+
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        with track_dependency("redis", "pipeline"):
+            return await super().execute(raise_on_error)
+
+
+class InstrumentedRedis(Redis):
+    async def execute_command(self, *args, **options):
+        with track_dependency("redis", str(args[0]).lower()):
+            return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> InstrumentedPipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def create_redis() -> InstrumentedRedis:
+    pool = InstrumentedConnectionPool(
+        host=settings.REDIS_HOST_,
+        port=settings.REDIS_PORT,
+        password=settings.REDIS_PASSWORD or None,
+        db=0,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+    )
+    return InstrumentedRedis(connection_pool=pool)
+
+
+async def open_redis(client: Redis = None) -> Redis:
+    """
+    The open_redis function makes `client`, or a new client from the settings,
+    the one returned by redis_client().
+    """
+    global _client
+    _client = client or create_redis()
+    return _client
+
+
+async def close_redis():
+    """
+    The close_redis function closes the shared client and disconnects every pooled connection.
+    """
+    global _client
+    client, _client = _client, None
+    if client is not None:
+        await client.aclose()
+        await client.connection_pool.disconnect()
+
+
+def redis_client() -> Redis:
+    if _client is None:
+        raise RuntimeError(REDIS_NOT_OPEN)
+    return _client
+
+
+async def ping_redis() -> bool:
+    """
+    The ping_redis function reports whether Redis answers, for health checks.
+    """
+    try:
+        return bool(await redis_client().ping())
+    except Exception:
+        return False
+
+
+@asynccontextmanager
+async def pipelined():
+    """
+    The pipelined function queues the commands issued in the block and sends
+    them in one round trip when it exits, without MULTI/EXEC. The replies are
+    in the pipeline's `results`, in order.
+    """
+    async with redis_client().pipeline(transaction=False) as pipe:
+        yield pipe
+        pipe.results = await pipe.execute()
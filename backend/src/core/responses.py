@@ -0,0 +1,186 @@
+"""
+Fast JSON responses for data read back from the database.
+
+By default FastAPI validates whatever an endpoint returns against the
+response_model, from attributes, turns the result into Python dicts and only
+then encodes them with json.dumps. For ORM rows that were validated when they
+were written that is mostly wasted work, EmailStr alone re-runs the full
+email syntax check for every author on the page.
+
+ModelJSONResponse builds the response models straight from the ORM objects
+without validating them, with a builder compiled once per model, and encodes
+them with pydantic-core's dump_json. Routes opt in by returning it:
+
+    return fast_response(posts, List[PostModelWithImage])
+
+Only use it for trusted data, it does not check types or constraints.
+FAST_JSON_RESPONSES=false falls back to the regular validation everywhere.
+
+ndjson_response streams batches of rows the same way, one JSON document per
+line, for clients that send Accept: application/x-ndjson.
+
+parse_fields and model_subset implement sparse fieldsets, ?fields=id,title:
+the route loads only what the subset model reads and always renders it with
+ModelJSONResponse, unrequested attributes are never touched. envelope wraps
+rows in a top level object, e.g. with a users map for normalized responses.
+"""
+import types
+import typing
+from functools import lru_cache
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, TypeAdapter, create_model
+from pydantic_core import PydanticUndefined
+from starlette.background import BackgroundTask
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+
+from src.core.config import settings
+from src.constants.messages import UNKNOWN_FIELDS
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _identity(value):
+    return value
+
+
+@lru_cache(maxsize=None)
+def response_adapter(model) -> TypeAdapter:
+    return TypeAdapter(model)
+
+
+@lru_cache(maxsize=None)
+def builder(model):
+    """
+    The builder function compiles a function turning an object or a dict into
+    `model` without validation. Nested models, lists, dicts and optionals of models
+    are built recursively, any other value is kept as is.
+    """
+    origin = typing.get_origin(model)
+    if origin is list:
+        build_item = builder(typing.get_args(model)[0])
+        if build_item is _identity:
+            return _identity
+        return lambda values: [build_item(value) for value in values]
+    if origin is dict:
+        build_item = builder(typing.get_args(model)[1])
+        if build_item is _identity:
+            return _identity
+        return lambda values: {key: build_item(value) for key, value in values.items()}
+    if origin is typing.Union or origin is types.UnionType:
+        options = [option for option in typing.get_args(model) if option is not type(None)]
+        build_option = builder(options[0]) if len(options) == 1 else _identity
+        if build_option is _identity:
+            return _identity
+        return lambda value: None if value is None else build_option(value)
+    if not (isinstance(model, type) and issubclass(model, BaseModel)):
+        return _identity
+
+    fields = []
+    for name, field in model.model_fields.items():
+        default = PydanticUndefined if field.default_factory else field.default
+        fields.append((name, builder(field.annotation), default, field.default_factory))
+    names = frozenset(name for name, *_ in fields)
+
+    def build(source):
+        read = source.get if isinstance(source, dict) else lambda name, default: getattr(source, name, default)
+        values = {}
+        for name, build_value, default, default_factory in fields:
+            value = read(name, default)
+            if value is PydanticUndefined:
+                value = default_factory() if default_factory else None
+            values[name] = build_value(value)
+        instance = model.__new__(model)
+        # the attributes BaseModel.model_construct sets, minus its per-field bookkeeping
+        object.__setattr__(instance, "__dict__", values)
+        object.__setattr__(instance, "__pydantic_fields_set__", set(names))
+        object.__setattr__(instance, "__pydantic_extra__", None)
+        object.__setattr__(instance, "__pydantic_private__", None)
+        return instance
+
+    return build
+
+
+class ModelJSONResponse(Response):
+    media_type = "application/json"
+
+    def __init__(self, content, model, status_code: int = 200, headers: dict = None,
+                 background: BackgroundTask = None):
+        self.model = model
+        super().__init__(content, status_code, headers, None, background)
+
+    def render(self, content) -> bytes:
+        return response_adapter(self.model).dump_json(builder(self.model)(content))
+
+
+def fast_response(content, model, status_code: int = 200):
+    """
+    The fast_response function returns `content` as a ModelJSONResponse, or as is
+    for FastAPI to validate against the route's response_model when
+    FAST_JSON_RESPONSES is off.
+    """
+    if not settings.FAST_JSON_RESPONSES:
+        return content
+    return ModelJSONResponse(content, model, status_code=status_code)
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def ndjson_response(batches, model) -> StreamingResponse:
+    """
+    The ndjson_response function streams an async iterator of lists of rows as
+    newline delimited JSON, encoding each batch as it arrives.
+    """
+    build = builder(model)
+    dump_json = response_adapter(model).dump_json
+
+    async def lines():
+        async for batch in batches:
+            yield b"".join(dump_json(build(row)) + b"\n" for row in batch)
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
+
+
+def parse_fields(fields: str | None, model, always: tuple = ("id",)) -> frozenset | None:
+    """
+    The parse_fields function turns a comma separated ?fields= value into the set
+    of top level fields of `model` to return, None when all of them are wanted.
+
+    :param fields: str | None: The query parameter
+    :param model: The full response model
+    :param always: tuple: Fields included whether they are asked for or not
+    :return: The field names, or None
+    """
+    if fields is None:
+        return None
+    requested = frozenset(name.strip() for name in fields.split(",") if name.strip())
+    unknown = requested - model.model_fields.keys()
+    if unknown or not requested:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=UNKNOWN_FIELDS.format(
+            ", ".join(sorted(unknown)), ", ".join(model.model_fields)))
+    return requested | frozenset(always)
+
+
+@lru_cache(maxsize=256)
+def model_subset(model, fields: frozenset):
+    """
+    The model_subset function creates, once per set of fields, a model with only
+    those fields of `model`, in the same order and with the same definitions.
+    """
+    return create_model(f"{model.__name__}Fields", **{
+        name: (field.annotation, field) for name, field in model.model_fields.items() if name in fields})
+
+
+@lru_cache(maxsize=256)
+def envelope(name: str, **fields):
+    """
+    The envelope function creates, once per name and fields, a model whose required
+    fields are the given annotations:
+
+        envelope("PostsNormalized", posts=List[PostNormalized], users=Dict[int, UserDb])
+    """
+    return create_model(name, **{key: (annotation, ...) for key, annotation in fields.items()})
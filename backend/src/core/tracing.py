@@ -0,0 +1,308 @@
+"""
+Lightweight request tracing.
+
+TracingMiddleware opens a root span per request, continuing the caller's trace
+when a W3C traceparent header is sent, and returns the trace id in the
+traceparent and X-Trace-Id response headers. Child spans are opened with
+start_span/traced, and for every SQL statement via the engine events that
+install() registers. Log records carry the current trace id as %(trace_id)s.
+
+Finished traces are exported as OTLP/JSON: appended to TRACING_EXPORT_FILE
+(one trace per line, the layout of the OpenTelemetry collector file exporter)
+and/or posted to an OTLP/HTTP collector at TRACING_OTLP_ENDPOINT. Without an
+exporter only the root span is kept, so logs and headers still get a trace id.
+"""
+import functools
+import inspect
+import json
+import logging
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import Headers, MutableHeaders
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "photoshare-backend"
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+STATUS_ERROR = 2
+
+_current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+_exporters = []
+
+
+class Span:
+    __slots__ = ("trace", "trace_id", "span_id", "parent_id", "name", "kind", "attributes", "start", "end", "error")
+
+    def __init__(self, name: str, parent: "Span | None" = None, trace_id: str = None, parent_id: str = None,
+                 kind: int = SPAN_KIND_INTERNAL, attributes: dict = None):
+        self.trace = parent.trace if parent is not None else []
+        self.trace_id = parent.trace_id if parent is not None else trace_id or f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent is not None else parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.start = time.time_ns()
+        self.end = None
+        self.error = None
+        self.trace.append(self)
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def finish(self, error: BaseException = None):
+        self.end = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.error:
+            span["status"] = {"code": STATUS_ERROR, "message": self.error}
+        return span
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp_request(spans) -> dict:
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": __name__}, "spans": [span.to_otlp() for span in spans if span.end]}],
+    }]}
+
+
+class FileSpanExporter:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        line = json.dumps(to_otlp_request(spans), separators=(",", ":"))
+        with self._lock, open(self.path, "a") as file:
+            file.write(line + "\n")
+
+
+class OTLPHttpSpanExporter:
+    """
+    Posts traces to an OTLP/HTTP collector from a background thread so a slow
+    or missing collector never delays a response. Traces are dropped when the
+    queue is full.
+    """
+
+    def __init__(self, endpoint: str, max_queue: int = 1000, timeout: float = 5):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        threading.Thread(target=self._run, name="otlp-exporter", daemon=True).start()
+
+    def export(self, spans):
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            pass
+
+    def _run(self):
+        while True:
+            body = json.dumps(to_otlp_request(self._queue.get())).encode()
+            request = urllib.request.Request(self.endpoint, data=body, headers={"Content-Type": "application/json"})
+            try:
+                urllib.request.urlopen(request, timeout=self.timeout).close()
+            except OSError as e:
+                logger.warning("Could not export trace to %s: %s", self.endpoint, e)
+
+
+def configure(*exporters):
+    _exporters[:] = exporters
+
+
+def configure_from_settings():
+    exporters = []
+    if settings.TRACING_EXPORT_FILE:
+        exporters.append(FileSpanExporter(settings.TRACING_EXPORT_FILE))
+    if settings.TRACING_OTLP_ENDPOINT:
+        exporters.append(OTLPHttpSpanExporter(settings.TRACING_OTLP_ENDPOINT))
+    configure(*exporters)
+
+
+def current_trace_id() -> str | None:
+    span = _current_span.get()
+    return span.trace_id if span is not None else None
+
+
+@contextmanager
+def start_span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes):
+    """
+    The start_span function opens a child of the current span for the duration of the block.
+    Outside a traced request, or when nothing is exported, it does nothing and yields None.
+    """
+    parent = _current_span.get()
+    if parent is None or not _exporters:
+        yield None
+        return
+    span = Span(name, parent, kind=kind, attributes=attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.finish(e)
+        raise
+    else:
+        span.finish()
+    finally:
+        _current_span.reset(token)
+
+
+def traced(name: str):
+    """
+    The traced decorator wraps every call of a function, sync or async, in a span.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with start_span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with start_span(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = _current_span.get()
+    if parent is not None and _exporters:
+        context._tracing_span = Span("db.query", parent, kind=SPAN_KIND_CLIENT, attributes={
+            "db.system": conn.dialect.name, "db.statement": statement[:2000]})
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    span = getattr(context, "_tracing_span", None)
+    if span is not None:
+        span.set_attribute("db.rows", cursor.rowcount)
+        span.finish()
+
+
+def _handle_error(exception_context):
+    span = getattr(exception_context.execution_context, "_tracing_span", None)
+    if span is not None:
+        span.finish(exception_context.original_exception)
+
+
+def install(engine: Engine):
+    """
+    The install function opens a span for every statement the engine runs inside a traced request.
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def install_log_record_factory():
+    """
+    The install_log_record_factory function adds the trace_id attribute to every log record,
+    "-" outside a traced request.
+    """
+    factory = logging.getLogRecordFactory()
+    if getattr(factory, "_adds_trace_id", False):
+        return
+
+    def record_factory(*args, **kwargs):
+        record = factory(*args, **kwargs)
+        record.trace_id = current_trace_id() or "-"
+        return record
+
+    record_factory._adds_trace_id = True
+    logging.setLogRecordFactory(record_factory)
+
+
+def parse_traceparent(value: str | None):
+    # 00-<32 hex trace id>-<16 hex parent id>-<flags>
+    parts = (value or "").split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or parts[1] == "0" * 32:
+        return None, None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None, None
+    return parts[1], parts[2]
+
+
+class TracingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        trace_id, parent_id = parse_traceparent(Headers(scope=scope).get("traceparent"))
+        span = Span(f"{scope['method']} {scope['path']}", trace_id=trace_id, parent_id=parent_id,
+                    kind=SPAN_KIND_SERVER, attributes={"http.method": scope["method"], "http.target": scope["path"]})
+        token = _current_span.set(span)
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+                headers = MutableHeaders(scope=message)
+                headers.append("traceparent", span.traceparent)
+                headers.append("X-Trace-Id", span.trace_id)
+            await send(message)
+
+        error = None
+        try:
+            await self.app(scope, receive, send_with_trace)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current_span.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                span.name = f"{scope['method']} {route.path}"
+                span.set_attribute("http.route", route.path)
+            span.finish(error)
+            for exporter in _exporters:
+                try:
+                    exporter.export(span.trace)
+                except Exception as e:
+                    logger.warning("Could not export trace %s: %s", span.trace_id, e)
@@ -7,6 +7,7 @@ from sqlalchemy.orm import Session
 
 from src.models.user import User
 from src.core.config import settings
+from src.core.metrics import track_dependency
 from src.crud.users import update_avatar as update_ava
 from src.constants.messages import BAD_REQUEST
 
@@ -17,11 +18,13 @@ async def update_avatar(file: File, current_user: User, db: Session):
             cloud_name=settings.CLOUDINARY_CLOUD_NAME,
             api_key=settings.CLOUDINARY_API_KEY,
             api_secret=settings.CLOUDINARY_API_SECRET,
+            upload_prefix=settings.CLOUDINARY_UPLOAD_PREFIX or None,
             secure=True
         )
 
-        r = cloudinary.uploader.upload(
-            file.file, public_id=f'photo_share/{current_user.username}', overwrite=True)
+        with track_dependency("cloudinary", "upload"):
+            r = cloudinary.uploader.upload(
+                file.file, public_id=f'photo_share/{current_user.username}', overwrite=True)
         src_url = cloudinary.CloudinaryImage(f'photo_share/{current_user.username}')\
             .build_url(width=250, height=250, crop='fill', version=r.get('version'))
     except Exception as e:
@@ -1,13 +1,16 @@
 from typing import List
 from fastapi import HTTPException, status
-from sqlalchemy import and_
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session, joinedload
 
 from src.models.comment import Comment
+from src.models.post import Post
 from src.models.user import User
 from src.schemas.comments import CommentModel, CommentUpdate
+from src.core.config import settings
 from src.constants.messages import BAD_REQUEST, COMMENT_NOT_FOUND
 from src.crud.post import get_post_by_id
+from src.crud.loaders import loaders
 
 
 async def get_comments(
@@ -26,12 +29,62 @@ async def get_comments(
     try:
         comments = db.query(Comment).filter(
             Comment.post_id == post_id).limit(limit).offset(offset).all()
+        # loads the authors in one query, comment.user then finds them in the identity map
+        await loaders(db).users_by_id.load_many({comment.user_id for comment in comments})
         return comments
     except Exception as err:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=BAD_REQUEST)
 
 
+async def attach_latest_comments(posts: List[Post], limit: int, db: Session, with_user: bool = True) -> List[Post]:
+    """
+    The attach_latest_comments function sets a latest_comments preview on every post.
+    The newest comments of all posts are fetched in one windowed query, so the cost
+    does not grow with the number of posts on the page.
+
+    :param posts: List[Post]: Posts to attach the preview to
+    :param limit: int: Number of latest comments to keep per post
+    :param db: Session: Pass the database session to the function
+    :param with_user: bool: Join the authors of the comments, off when only their user_id is returned
+    :return: The same list of posts
+    """
+    previews = {post.id: [] for post in posts}
+    if limit > 0 and previews:
+        ranked = select(
+            Comment.id,
+            func.row_number().over(
+                partition_by=Comment.post_id,
+                order_by=(Comment.created_at.desc(), Comment.id.desc())
+            ).label("position")
+        ).where(Comment.post_id.in_(previews.keys())).subquery()
+        comments = db.query(Comment).join(ranked, Comment.id == ranked.c.id).filter(
+            ranked.c.position <= limit).options(*([joinedload(Comment.user)] if with_user else [])).order_by(
+            Comment.post_id, ranked.c.position).all()
+        for comment in comments:
+            previews[comment.post_id].append(comment)
+    for post in posts:
+        post.latest_comments = previews[post.id]
+    return posts
+
+
+async def stream_comments(post_id: int, db: Session, batch_size: int = settings.STREAM_BATCH_SIZE):
+    """
+    The stream_comments function yields the whole comment thread of a post, oldest first,
+    in batches read from a server-side cursor, see stream_posts.
+
+    :param post_id: int: The post whose comments are streamed
+    :param db: Session: The request session, only used for its engine
+    :param batch_size: int: Rows fetched from the cursor at a time
+    :return: An async iterator of lists of comments
+    """
+    with Session(bind=db.get_bind()) as session:
+        query = select(Comment).options(joinedload(Comment.user)).filter(Comment.post_id == post_id).order_by(
+            Comment.created_at, Comment.id)
+        for batch in session.execute(query.execution_options(yield_per=batch_size)).scalars().partitions():
+            yield batch
+
+
 async def get_comment_by_id(comment_id: int, db: Session) -> Comment | None:
     """
     The get_comment_by_id function returns a comment by its id.
@@ -62,6 +115,8 @@ async def create_comment(body: CommentModel, user: User, db: Session) -> Comment
     try:
         comment = Comment(user=user, post=post, content=body.content)
         db.add(comment)
+        db.query(Post).filter(Post.id == post.id).update(
+            {Post.comment_count: Post.comment_count + 1}, synchronize_session=False)
         db.commit()
         db.refresh(comment)
         return comment
@@ -109,15 +164,17 @@ async def remove_comment(
     :param db: Session: Access the database
     :return: A comment object or none
     """
-    comment = db.query(Comment).filter(Comment.id == comment_id).first()
+    comment = db.query(Comment).options(joinedload(Comment.user)).filter(
+        Comment.id == comment_id).first()
     if not comment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=COMMENT_NOT_FOUND)
     try:
-        db.delete(comment)
+        comment.deleted_at = func.now()
+        db.query(Post).filter(Post.id == comment.post_id).update(
+            {Post.comment_count: Post.comment_count - 1}, synchronize_session=False)
         db.commit()
         return comment
     except Exception as err:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=BAD_REQUEST)
-    
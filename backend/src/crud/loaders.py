@@ -0,0 +1,72 @@
+"""
+Request scoped DataLoaders for users and tags.
+
+loaders(db) returns the loaders of a session, created on first use and kept in
+session.info, so every CRUD function handed the request's session shares them.
+They are dropped when the session commits or rolls back, as the rows may have
+changed. Loading users also puts them in the session's identity map, where
+lazy many-to-one access like comment.user finds them without a query.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src.core.dataloader import DataLoader
+from src.models.tag import Tag
+from src.models.user import User
+
+LOADERS_KEY = "loaders"
+
+
+def _matches(column, keys: list):
+    # a lone key is by far the most common batch, = is cheaper to render and run than IN
+    return column == keys[0] if len(keys) == 1 else column.in_(keys)
+
+
+class Loaders:
+    def __init__(self, db: Session):
+        self.db = db
+        self.users_by_id = DataLoader(lambda keys: self._load_users(User.id, keys))
+        self.users_by_email = DataLoader(lambda keys: self._load_users(User.email, keys))
+        self.users_by_username = DataLoader(lambda keys: self._load_users(User.username, keys))
+        self.tags_by_id = DataLoader(lambda keys: self._load_tags(Tag.id, keys))
+        self.tags_by_name = DataLoader(lambda keys: self._load_tags(Tag.name, keys))
+
+    def _load_users(self, column, keys: list) -> dict:
+        users = self.db.query(User).filter(_matches(column, keys)).all()
+        for user in users:
+            self.prime_user(user)
+        return {getattr(user, column.key): user for user in users}
+
+    def _load_tags(self, column, keys: list) -> dict:
+        tags = self.db.query(Tag).filter(_matches(column, keys)).all()
+        for tag in tags:
+            self.prime_tag(tag)
+        return {getattr(tag, column.key): tag for tag in tags}
+
+    def prime_user(self, user: User):
+        self.users_by_id.prime(user.id, user)
+        self.users_by_email.prime(user.email, user)
+        self.users_by_username.prime(user.username, user)
+
+    def prime_tag(self, tag: Tag):
+        self.tags_by_id.prime(tag.id, tag)
+        self.tags_by_name.prime(tag.name, tag)
+
+
+def loaders(db: Session) -> Loaders:
+    """
+    The loaders function returns the DataLoaders of the session, creating them on first use.
+
+    :param db: Session: The request's database session
+    :return: The session's Loaders
+    """
+    session_loaders = db.info.get(LOADERS_KEY)
+    if session_loaders is None:
+        session_loaders = db.info[LOADERS_KEY] = Loaders(db)
+    return session_loaders
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _drop_loaders(session: Session):
+    session.info.pop(LOADERS_KEY, None)
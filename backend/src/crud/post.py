@@ -1,59 +1,212 @@
+import asyncio
+import logging
+import time
 import uuid
 import cloudinary
 import cloudinary.uploader
+import cloudinary.utils
 from tempfile import NamedTemporaryFile
-from qrcode import QRCode
 from fastapi import File, HTTPException, status
-from sqlalchemy.orm import Session
-from src.models.base import Post, User
-from src.models.tag  import Tag
-from src.schemas.posts import PostModelCreate
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, load_only, raiseload, selectinload
+from src.models.base import Comment, Post, User
+from src.schemas.posts import PostFinalizeUpload, PostModelCreate
 from src.core.config import settings
-from src.crud.tags import create_tag_if_not_exist
-from src.constants.messages import UNPROCESSABLE_ENTITY, BAD_REQUEST, POST_NOT_FOUND, OPERATION_FORBIDDEN, POST_NO_TRANSFORMED_IMAGE
+from src.core.metrics import track_dependency
+from src.core.tracing import start_span, traced
+from src.crud.tags import create_tag_if_not_exist, get_or_create_tags
+from src.services.outbox import destroy_images, enqueue_image_deletion
+from src.services.auth import auth_service
+from src.crud.loaders import loaders
+from src.constants.messages import UNPROCESSABLE_ENTITY, BAD_REQUEST, POST_NOT_FOUND, OPERATION_FORBIDDEN, POST_NO_TRANSFORMED_IMAGE, POST_UPLOAD_FAILED, POST_UPLOAD_TICKET_INVALID, POST_UPLOAD_SIGNATURE_INVALID, POST_UPLOAD_ALREADY_FINALIZED
 
-cloudinary.config(
-    cloud_name=settings.CLOUDINARY_CLOUD_NAME,
-    api_key=settings.CLOUDINARY_API_KEY,
-    api_secret=settings.CLOUDINARY_API_SECRET
-)
+logger = logging.getLogger(__name__)
 
 
+@traced("crud.upload_post_with_description")
 async def upload_post_with_description(user: User, image: File, body: PostModelCreate,  db: Session):
     if len(body.tags) > 5:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=UNPROCESSABLE_ENTITY)
     try:
         tags = body.tags[0].split(",") if len(body.tags) > 0 else []
-        tags_ids = []
-        for tag in tags:
-            t = create_tag_if_not_exist(tag, db)
-            tags_ids.append(t.id)
-        tags_from_db = db.query(Tag).filter(Tag.id.in_(tags_ids)).all()
+        with start_span("post.upsert_tags", tags=len(tags)):
+            # the lookups of all names are coalesced into one query by the tags_by_name loader
+            tags_from_db = await asyncio.gather(*(create_tag_if_not_exist(tag, db) for tag in dict.fromkeys(tags)))
         public_id = f"photo_share/{uuid.uuid4()}"
-        upload_result = cloudinary.uploader.upload(
-            image.file, public_id=public_id)
+        with track_dependency("cloudinary", "upload"):
+            upload_result = cloudinary.uploader.upload(
+                image.file, public_id=public_id)
         res_url = cloudinary.CloudinaryImage(public_id).build_url(
             version=upload_result.get("version")
         )
         post = Post(title=body.title, description=body.description,
-                    image=res_url, user_id=user.id, tags=tags_from_db, image_public_id=public_id)
+                    image=res_url, user_id=user.id, tags=list(tags_from_db), image_public_id=public_id)
         db.add(post)
-        db.commit()
-        db.refresh(post)
+        with start_span("db.commit"):
+            db.commit()
+        with start_span("db.refresh"):
+            db.refresh(post)
         return post
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=BAD_REQUEST)
 
 
+def store_image(image: File) -> tuple[str, str]:
+    public_id = f"photo_share/{uuid.uuid4()}"
+    with track_dependency("cloudinary", "upload"):
+        upload_result = cloudinary.uploader.upload(image.file, public_id=public_id)
+    return public_id, cloudinary.CloudinaryImage(public_id).build_url(version=upload_result.get("version"))
+
+
+@traced("crud.upload_posts_bulk")
+async def upload_posts_bulk(user: User, images: list, bodies: list[PostModelCreate], db: Session) -> list[dict]:
+    """
+    The upload_posts_bulk function creates one post per image. The images are sent to
+    Cloudinary concurrently, at most UPLOAD_CONCURRENCY at a time, then every post and new
+    tag is written in a single transaction. An image that fails its checks or its upload
+    is reported in its entry and does not stop the others.
+
+    :param user: User: The author of the posts
+    :param images: list: The uploaded files
+    :param bodies: list[PostModelCreate]: Title, description and tags of each image, in the same order
+    :param db: Session: Pass the database session to the function
+    :return: A list with a dict per image: its index and either the post or a detail
+    """
+    results = [{"index": index} for index in range(len(images))]
+    semaphore = asyncio.Semaphore(settings.UPLOAD_CONCURRENCY)
+
+    async def upload(index: int, image: File, body: PostModelCreate):
+        if len(body.tags) > 5:
+            results[index]["detail"] = UNPROCESSABLE_ENTITY
+            return None
+        async with semaphore:
+            try:
+                return await asyncio.to_thread(store_image, image)
+            except Exception as e:
+                results[index]["detail"] = POST_UPLOAD_FAILED
+                return None
+
+    stored = await asyncio.gather(*(upload(index, image, body) for index, (image, body) in enumerate(zip(images, bodies))))
+    uploaded = [(index, body, image) for index, (body, image) in enumerate(zip(bodies, stored)) if image is not None]
+    if not uploaded:
+        return results
+
+    try:
+        with start_span("post.upsert_tags"):
+            tags = await get_or_create_tags([tag for _, body, _ in uploaded for tag in body.tags], db)
+        posts = {}
+        for index, body, (public_id, url) in uploaded:
+            posts[index] = Post(title=body.title, description=body.description, image=url, user_id=user.id,
+                                tags=[tags[tag] for tag in dict.fromkeys(body.tags)], image_public_id=public_id)
+        db.add_all(posts.values())
+        db.flush()
+        post_ids = {index: post.id for index, post in posts.items()}
+        with start_span("db.commit"):
+            db.commit()
+    except Exception as e:
+        public_ids = [public_id for _, _, (public_id, _) in uploaded]
+        try:
+            db.rollback()
+            enqueue_image_deletion(db, public_ids)
+            db.commit()
+        except Exception:
+            # the database itself failed, so the outbox is out of reach too
+            logger.exception("Could not enqueue the deletion of %d uploaded images, deleting them now", len(public_ids))
+            await asyncio.to_thread(destroy_images, public_ids)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=BAD_REQUEST)
+
+    created = await get_posts_by_ids(post_ids.values(), db)
+    for index, post_id in post_ids.items():
+        results[index]["post"] = created[post_id]
+    return results
+
+
+def create_upload_ticket(user: User) -> dict:
+    """
+    The create_upload_ticket function lets a client upload an image straight to Cloudinary
+    instead of through the API. It signs the upload parameters with CLOUDINARY_API_SECRET,
+    locally, and returns them with a ticket that finalize_upload exchanges for the post.
+
+    :param user: User: The user that will own the post
+    :return: The upload url and form fields, and the ticket
+    """
+    public_id = f"photo_share/{uuid.uuid4()}"
+    timestamp = int(time.time())
+    signature = cloudinary.utils.api_sign_request(
+        {"public_id": public_id, "timestamp": timestamp}, settings.CLOUDINARY_API_SECRET)
+    ticket, expires_at = auth_service.create_upload_ticket(user.email, public_id, settings.UPLOAD_TICKET_TTL_SECONDS)
+    return {
+        "upload_url": cloudinary.utils.cloudinary_api_url("upload"),
+        "api_key": settings.CLOUDINARY_API_KEY,
+        "public_id": public_id,
+        "timestamp": timestamp,
+        "signature": signature,
+        "ticket": ticket,
+        "expires_at": expires_at,
+    }
+
+
+def is_finalized(public_id: str, db: Session) -> bool:
+    return db.query(Post.id).filter(Post.image_public_id == public_id).execution_options(include_deleted=True).first() is not None
+
+
+@traced("crud.finalize_upload")
+async def finalize_upload(user: User, body: PostFinalizeUpload, db: Session) -> Post:
+    """
+    The finalize_upload function creates the post for an image uploaded with a ticket from
+    create_upload_ticket. The version and signature of Cloudinary's upload response prove the
+    image was stored under the ticket's public id, they are checked locally without an API call.
+
+    :param user: User: The user finalizing, must be the one the ticket was issued to
+    :param body: PostFinalizeUpload: The ticket, the upload response and the post's details
+    :param db: Session: Pass the database session to the function
+    :return: The new post
+    """
+    ticket = auth_service.decode_upload_ticket(body.ticket)
+    if ticket is None or ticket["sub"] != user.email:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail=POST_UPLOAD_TICKET_INVALID)
+    public_id = ticket["public_id"]
+    if not cloudinary.utils.verify_api_response_signature(public_id, body.version, body.signature):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=POST_UPLOAD_SIGNATURE_INVALID)
+    if len(body.tags) > 5:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=UNPROCESSABLE_ENTITY)
+    # a fast path only, concurrent finalizes of the same ticket are settled by the unique index below
+    if is_finalized(public_id, db):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=POST_UPLOAD_ALREADY_FINALIZED)
+
+    tags = await get_or_create_tags(body.tags, db)
+    post = Post(title=body.title, description=body.description,
+                image=cloudinary.CloudinaryImage(public_id).build_url(version=body.version),
+                user_id=user.id, tags=list(tags.values()), image_public_id=public_id)
+    db.add(post)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        if not is_finalized(public_id, db):
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=POST_UPLOAD_ALREADY_FINALIZED)
+    db.refresh(post)
+    return post
+
+
 async def delete_post(post_id: int, user: User, db: Session):
     post = await get_post_by_id(post_id, db)
     check_permission(user.role, post.user_id, user.id)
     try:
-        if post.image_public_id:
-            cloudinary.uploader.destroy(post.image_public_id)
-        db.delete(post)
+        # the image is removed from Cloudinary once the purger hard deletes the post
+        post.deleted_at = func.now()
+        db.query(Comment).filter(Comment.post_id == post.id, Comment.deleted_at.is_(None)).update(
+            {Comment.deleted_at: func.now()}, synchronize_session=False)
         db.commit()
         return post
     except Exception as e:
@@ -74,8 +227,8 @@ async def update_post_description(post_id: int, description: str, user: User, db
             status_code=status.HTTP_400_BAD_REQUEST, detail=BAD_REQUEST)
 
 
-async def get_post_by_id(post_id: int, db: Session):
-    post = db.query(Post).filter(
+async def get_post_by_id(post_id: int, db: Session, fields: frozenset = None):
+    post = db.query(Post).options(*post_load_options(fields)).filter(
         Post.id == post_id).first()
     if not post:
         raise HTTPException(
@@ -83,6 +236,19 @@ async def get_post_by_id(post_id: int, db: Session):
     return post
 
 
+async def get_posts_by_ids(post_ids, db: Session) -> dict[int, Post]:
+    """
+    The get_posts_by_ids function loads a set of posts with their authors and tags in one query.
+
+    :param post_ids: Iterable of post ids, duplicates are fine
+    :param db: Session: Pass the database session to the function
+    :return: A dict of the posts found by id
+    """
+    posts = db.query(Post).options(joinedload(Post.user), joinedload(Post.tags)).filter(
+        Post.id.in_(set(post_ids))).all()
+    return {post.id: post for post in posts}
+
+
 async def get_posts_list(db: Session):
     try:
         return db.query(Post).all()
@@ -91,19 +257,81 @@ async def get_posts_list(db: Session):
             status_code=status.HTTP_400_BAD_REQUEST, detail=BAD_REQUEST)
 
 
-async def get_all_posts_list(user: User, db: Session, is_own: bool = None):
+def post_load_options(fields: frozenset = None) -> list:
+    """
+    The post_load_options function returns the loader options for a sparse fieldset:
+    only the requested columns are selected, the author is joined and the tags are
+    fetched in a second query only when asked for. Every other column or relationship
+    raises instead of lazy loading, so an unrequested field can never cost a query.
+    Without a fieldset the tags of all posts are fetched in one second query, the
+    authors are left to the users_by_id loader.
+
+    :param fields: frozenset: Field names of PostModelWithImage, None for all of them
+    :return: A list of loader options
+    """
+    if fields is None:
+        return [selectinload(Post.tags)]
+    columns = [getattr(Post, name) for name in fields if name in Post.__table__.columns]
+    options = [load_only(Post.id, *columns, raiseload=True)]
+    if "user" in fields:
+        options.append(joinedload(Post.user))
+    if "tags" in fields:
+        options.append(selectinload(Post.tags))
+    options.append(raiseload("*"))
+    return options
+
+
+def referenced_user_ids(posts: list) -> set:
+    """
+    The referenced_user_ids function returns the ids of the authors of the posts and of
+    their latest_comments previews, without loading any of them.
+    """
+    user_ids = {post.user_id for post in posts}
+    user_ids.update(comment.user_id for post in posts for comment in getattr(post, "latest_comments", ()))
+    return user_ids
+
+
+async def get_all_posts_list(user: User, db: Session, is_own: bool = None, fields: frozenset = None):
+    query = db.query(Post).options(*post_load_options(fields))
     if is_own:
-        try:
-            return db.query(Post).filter(user.id == Post.user_id).all()
-        except Exception as e:
-            raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail=BAD_REQUEST)
-    else:
-        try:
-            return db.query(Post).all()
-        except Exception as e:
-            raise HTTPException(
+        query = query.filter(user.id == Post.user_id)
+    try:
+        posts = query.all()
+    except Exception as e:
+        raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=BAD_REQUEST)
+    if fields is None:
+        # loads the authors in one query, post.user then finds them in the identity map
+        await loaders(db).users_by_id.load_many({post.user_id for post in posts})
+    return posts
+
+
+async def stream_posts(user: User, db: Session, is_own: bool = None, prepare_batch=None,
+                       batch_size: int = settings.STREAM_BATCH_SIZE, fields: frozenset = None):
+    """
+    The stream_posts function yields all posts in batches read from a server-side cursor.
+    It runs in its own session, which outlives the request scoped one while the response
+    is streamed. The identity map only keeps weak references to unchanged rows, so each
+    batch is freed once it has been sent and memory stays bounded however many posts there are.
+
+    :param user: User: The user asking, for is_own
+    :param db: Session: The request session, only used for its engine
+    :param is_own: bool: Only stream the posts of the user
+    :param prepare_batch: Coroutine function called with each batch and the session before it is yielded
+    :param batch_size: int: Rows fetched from the cursor at a time
+    :param fields: frozenset: Only load these fields, see post_load_options
+    :return: An async iterator of lists of posts
+    """
+    options = post_load_options(fields) if fields is not None else [joinedload(Post.user), selectinload(Post.tags)]
+    with Session(bind=db.get_bind()) as session:
+        query = select(Post).options(*options).order_by(Post.id)
+        if is_own:
+            query = query.filter(Post.user_id == user.id)
+        result = session.execute(query.execution_options(yield_per=batch_size))
+        for batch in result.scalars().partitions():
+            if prepare_batch is not None:
+                await prepare_batch(batch, session)
+            yield batch
 
 
 async def transform_image(post_id: int, user: User, db: Session, gravity: str | None = None, height: int | None = None, width: int | None = None, radius: str | None = None):
@@ -126,6 +354,9 @@ async def transform_image(post_id: int, user: User, db: Session, gravity: str |
 
 
 def create_qr_code(url: str):
+    # qrcode pulls in PIL, only import it in the rare request that draws a code
+    from qrcode import QRCode
+
     try:
         qr = QRCode(version=3, box_size=20, border=10)
         qr_data = url
@@ -148,8 +379,9 @@ async def generate_and_get_qr_code(post_id: int, user: User, db: Session):
             status_code=status.HTTP_400_BAD_REQUEST, detail=POST_NO_TRANSFORMED_IMAGE)
     qr_temp_file = create_qr_code(post.transformed_image)
     try:
-        upload_result = cloudinary.uploader.upload(
-            qr_temp_file.file, public_id=post.image_public_id + "_qr")
+        with track_dependency("cloudinary", "upload"):
+            upload_result = cloudinary.uploader.upload(
+                qr_temp_file.file, public_id=post.image_public_id + "_qr")
         upload_result_url = cloudinary.CloudinaryImage(
             post.image_public_id + "_qr").build_url(version=upload_result.get("version"))
         post.transformed_image_qr = upload_result_url
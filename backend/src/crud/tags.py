@@ -1,12 +1,33 @@
 from sqlalchemy.orm import Session
 from src.models.base import Tag
+from src.crud.loaders import loaders
 
-def create_tag_if_not_exist(tag_name: str, db: Session):
-    tag = db.query(Tag).filter(Tag.name == tag_name).first()
+async def create_tag_if_not_exist(tag_name: str, db: Session):
+    tag = await loaders(db).tags_by_name.load(tag_name)
     if not tag:
         tag = Tag(name=tag_name)
         db.add(tag)
         db.commit()
         db.refresh(tag)
+        loaders(db).prime_tag(tag)
         return tag
     return tag
+
+
+async def get_or_create_tags(tag_names, db: Session) -> dict[str, Tag]:
+    """
+    The get_or_create_tags function looks up all tag names in one query and adds the
+    missing tags to the session, without committing, so they are written in the
+    caller's transaction.
+
+    :param tag_names: Iterable of tag names, duplicates are fine
+    :param db: Session: Pass the database session to the function
+    :return: A dict of tags by name
+    """
+    tag_names = list(dict.fromkeys(tag_names))
+    tags = dict(zip(tag_names, await loaders(db).tags_by_name.load_many(tag_names)))
+    for name, tag in tags.items():
+        if tag is None:
+            tags[name] = Tag(name=name)
+            db.add(tags[name])
+    return tags
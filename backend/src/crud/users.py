@@ -1,8 +1,8 @@
-import redis
 import pickle
 from libgravatar import Gravatar
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, func, select
+from sqlalchemy.dialects import postgresql, sqlite
 from fastapi import HTTPException, status, Depends
 from jose import JWTError, jwt
 
@@ -10,22 +10,25 @@ from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 
 from src.models.user import User
+from src.models.post import Post
+from src.models.comment import Comment
+from src.models.app_setting import ADMIN_BOOTSTRAPPED, AppSetting
 from src.constants.role import UserRole
 from src.schemas.users import UserModel, UserUpdate
 from src.core.config import settings
 from src.core.db import get_db
+from src.core.redis import redis_client
+from src.crud.loaders import loaders
 from src.constants.messages import AUTH_CANT_FIND_USER, OPERATION_FORBIDDEN
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-r = redis.Redis(host=settings.REDIS_HOST_,
-                port=settings.REDIS_PORT, password=settings.REDIS_PASSWORD, db=0)
 
 
 async def get_user_by_email(email: str, db: Session) -> User:
-    user = db.query(User).filter(User.email == email).first()
+    user = await loaders(db).users_by_email.load(email)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=AUTH_CANT_FIND_USER)
@@ -33,19 +36,53 @@ async def get_user_by_email(email: str, db: Session) -> User:
 
 
 async def get_user_by_username(username: str, db: Session) -> User:
-    user = db.query(User).filter(User.username == username).first()
+    user = await loaders(db).users_by_username.load(username)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=AUTH_CANT_FIND_USER)
     return user
 
 
+async def get_users_by_ids(user_ids, db: Session) -> dict[int, User]:
+    """
+    The get_users_by_ids function loads a set of users in one query, or none at all
+    for the ones already loaded during the request.
+
+    :param user_ids: Iterable of user ids, duplicates are fine
+    :param db: Session: Pass the database session to the function
+    :return: A dict of users by id
+    """
+    user_ids = set(user_ids)
+    users = await loaders(db).users_by_id.load_many(user_ids)
+    return {user.id: user for user in users if user is not None}
+
+
 async def get_user_by_email_or_username(email: str, username: str, db: Session) -> User:
+    # soft deleted accounts still hold on to their email and username
     user = db.query(User).filter(
-        or_(User.email == email, User.username == username)).first()
+        or_(User.email == email, User.username == username)).execution_options(include_deleted=True).first()
     return user
 
 
+INSERT_IF_MISSING = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def claim_admin_bootstrap(db: Session) -> bool:
+    """
+    The claim_admin_bootstrap function decides whether the user being created is the
+    first one, who becomes the admin. It inserts the admin_bootstrapped marker unless
+    it exists, a primary key lookup instead of counting the users. The marker is
+    committed with the new user; a concurrent signup waits on the key until then
+    and sees it taken, so only one admin is ever created.
+
+    :param db: Session: The session that will create the user
+    :return: True when this transaction created the marker
+    """
+    insert = INSERT_IF_MISSING[db.get_bind().dialect.name](AppSetting)
+    result = db.execute(insert.values(key=ADMIN_BOOTSTRAPPED, value="true").on_conflict_do_nothing())
+    return result.rowcount == 1
+
+
 async def create_user(body: UserModel, db: Session) -> User:
     avatar = None
     try:
@@ -53,12 +90,8 @@ async def create_user(body: UserModel, db: Session) -> User:
         avatar = g.get_image()
     except Exception as e:
         print(e)
-    new_user = User(**body.model_dump(), avatar=avatar)
-    if not db.query(User).count():
-        roles = [UserRole.admin]
-    else:
-        roles = [UserRole.user]
-    new_user = User(**body.model_dump(), avatar=avatar, role=roles[0])
+    role = UserRole.admin if claim_admin_bootstrap(db) else UserRole.user
+    new_user = User(**body.model_dump(), avatar=avatar, role=role)
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
@@ -81,18 +114,32 @@ async def update_avatar(email: str, url: str, db: Session) -> User:
     user.avatar = url
     db.commit()
     db.refresh(user)
-    r.set(f"user:{email}", pickle.dumps(user))
+    await redis_client().set(f"user:{email}", pickle.dumps(user))
     return user
 
 
 async def delete_user(user_id: int, db: Session, current_user: User) -> User:
-    user = db.query(User).filter(and_(or_(User.id == user_id, current_user.id == User.id),
+    user = db.query(User).filter(and_(User.id == user_id,
                                       or_(current_user.role == 'admin', current_user.role == 'moderator'))).first()
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=AUTH_CANT_FIND_USER)
-    db.delete(user)
+    user_posts = select(Post.id).where(Post.user_id == user.id)
+    commented_posts = select(Comment.post_id).where(
+        Comment.user_id == user.id, Comment.deleted_at.is_(None)).distinct()
+    affected_posts = [post_id for (post_id,) in db.execute(commented_posts)]
+    user.deleted_at = func.now()
+    db.query(Comment).filter(or_(Comment.user_id == user.id, Comment.post_id.in_(user_posts)),
+                             Comment.deleted_at.is_(None)).update(
+        {Comment.deleted_at: func.now()}, synchronize_session=False)
+    db.query(Post).filter(Post.user_id == user.id, Post.deleted_at.is_(None)).update(
+        {Post.deleted_at: func.now()}, synchronize_session=False)
+    live_comments = select(func.count(Comment.id)).where(
+        Comment.post_id == Post.id, Comment.deleted_at.is_(None)).scalar_subquery()
+    db.query(Post).filter(Post.id.in_(affected_posts)).update(
+        {Post.comment_count: live_comments}, synchronize_session=False)
     db.commit()
+    await redis_client().delete(f"user:{user.email}")
     return user
 
 
@@ -120,7 +167,7 @@ async def update_role(user_id: int, role: str, db: Session, current_user: User)
         and_(User.id == user_id, current_user.role == 'admin')).first()
     if user:
         user.role = role
-        r.set(f"user:{current_user.email}", pickle.dumps(user))
+        await redis_client().set(f"user:{current_user.email}", pickle.dumps(user))
     db.commit()
     return user
 
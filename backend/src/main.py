@@ -1,10 +1,21 @@
-import redis.asyncio as redis
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, status
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from src.api.main import api_router
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.templating import Jinja2Templates
 from src.core.config import settings
+from src.core.db import check_schema_is_migrated
+from src.core.query_counter import QueryCounterMiddleware
+from src.core.metrics import PrometheusMiddleware, METRICS_CONTENT_TYPE, render_metrics
+from src.core.profiler import ProfileRequestMiddleware
+from src.core.idempotency import IdempotencyMiddleware
+from src.core import tracing
+from src.core.redis import close_redis, open_redis, ping_redis
+from src.core.media import configure_cloudinary
+from src.services.auth import auth_service
 from pathlib import Path
 from fastapi_limiter import FastAPILimiter
 
@@ -15,17 +26,40 @@ origins = [
     "http://localhost:3000",
 ]
 
-app = FastAPI()
+tracing.install_log_record_factory()
+tracing.configure_from_settings()
+logging.basicConfig(format="%(asctime)s %(levelname)s [trace=%(trace_id)s] %(name)s: %(message)s")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.CHECK_MIGRATIONS_ON_STARTUP:
+        check_schema_is_migrated()
+    configure_cloudinary()
+    app.state.redis = await open_redis()
+    await FastAPILimiter.init(app.state.redis)
+    try:
+        yield
+    finally:
+        await close_redis()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
-@app.on_event("startup")
-async def startup():
-    r = await redis.Redis(host=settings.REDIS_HOST_, port=settings.REDIS_PORT, password=settings.REDIS_PASSWORD, db=0, encoding="utf-8",
-                          decode_responses=True)
-    await FastAPILimiter.init(r)
+app.add_middleware(IdempotencyMiddleware, routes=[
+    ("POST", f"{settings.API_V1_STR}/posts/"),
+    ("POST", f"{settings.API_V1_STR}/posts/bulk"),
+    ("POST", f"{settings.API_V1_STR}/posts/comments/"),
+    ("POST", f"{settings.API_V1_STR}/auth/signup"),
+], subject=auth_service.access_token_subject)
+
+app.add_middleware(QueryCounterMiddleware)
 
+if settings.ENVIRONMENT != "production":
+    app.add_middleware(ProfileRequestMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -35,9 +69,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(PrometheusMiddleware)
+
+app.add_middleware(tracing.TracingMiddleware)
+
 templates = Jinja2Templates(directory=str(Path(BASE_DIR, 'templates')))
 
 
 @app.get("/", response_class=HTMLResponse)
 def read_root(request: Request):
     return templates.TemplateResponse(request=request, name="home.html", context={"FRONTEND_URL": settings.FRONTEND_URL, "BACKEND_URL": settings.BACKEND_URL, "ADMINER_URL": settings.ADMINER_URL})
+
+
+@app.get("/health", include_in_schema=False)
+async def health():
+    redis_ok = await ping_redis()
+    return JSONResponse({"redis": "ok" if redis_ok else "unavailable"},
+                        status_code=status.HTTP_200_OK if redis_ok else status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
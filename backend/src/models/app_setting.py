@@ -0,0 +1,13 @@
+from sqlalchemy import Column, DateTime, String, func
+from src.models.base_model import Base
+
+# set once the first user signed up and became the admin
+ADMIN_BOOTSTRAPPED = "admin_bootstrapped"
+
+
+class AppSetting(Base):
+    # one row per key, written once and never soft deleted
+    __tablename__ = "app_settings"
+    key = Column(String(50), primary_key=True)
+    value = Column(String(255))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -2,5 +2,7 @@ from src.models.user import User
 from src.models.base_model import Base
 from src.models.post import Post
 from src.models.comment import Comment
-from src.models.helpers import post_m2m_tag, post_o2m_comment
-from src.models.tag import Tag
\ No newline at end of file
+from src.models.helpers import post_m2m_tag
+from src.models.tag import Tag
+from src.models.outbox import OutboxMessage
+from src.models.app_setting import AppSetting
\ No newline at end of file
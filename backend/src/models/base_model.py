@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, func
+from sqlalchemy import Column, Integer, event, func, text
 from sqlalchemy.sql.sqltypes import DateTime
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import DeclarativeBase, ORMExecuteState, Session, with_loader_criteria
 from sqlalchemy.sql.schema import MetaData
 
 metadata = MetaData()
 
+# predicates for the partial indexes of soft deletable tables
+LIVE_ROWS = text("deleted_at IS NULL")
+DELETED_ROWS = text("deleted_at IS NOT NULL")
+
 
 class Base(DeclarativeBase):
     metadata = metadata
@@ -16,3 +20,27 @@ class BaseModel(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     deleted_at = Column(DateTime(timezone=True), nullable=True)
+
+
+def _is_live(cls):
+    # a module level function rather than a lambda: the option is kept on loaded
+    # instances, which have to stay picklable for the user cache in Auth.get_current_user
+    return cls.deleted_at.is_(None)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _exclude_soft_deleted(execute_state: ORMExecuteState):
+    """
+    Every ORM select, including relationship loads, only sees live rows.
+    Run a query with .execution_options(include_deleted=True) to see soft deleted rows too.
+    """
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.is_relationship_load
+        and not execute_state.execution_options.get("include_deleted", False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(
+                BaseModel, _is_live, include_aliases=True)
+        )
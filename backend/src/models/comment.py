@@ -1,13 +1,19 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
-from src.models.base_model import BaseModel
+from src.models.base_model import BaseModel, LIVE_ROWS, DELETED_ROWS
 
 class Comment(BaseModel):
     __tablename__ = "comments"
+    __table_args__ = (
+        Index("ix_comments_live_post_id_created_at", "post_id", "created_at",
+              postgresql_where=LIVE_ROWS, sqlite_where=LIVE_ROWS),
+        Index("ix_comments_deleted_at", "deleted_at",
+              postgresql_where=DELETED_ROWS, sqlite_where=DELETED_ROWS),
+    )
     content = Column(String)
     user_id = Column(Integer, ForeignKey(
-        'users.id', ondelete='CASCADE'), default=None)
+        'users.id', ondelete='CASCADE'), default=None, index=True)
     post_id = Column(Integer, ForeignKey(
-        'posts.id', ondelete='CASCADE'), default=None)
+        'posts.id', ondelete='CASCADE'), default=None, index=True)
     user = relationship("User", back_populates="comments",)
     post = relationship("Post", back_populates="comments",)
\ No newline at end of file
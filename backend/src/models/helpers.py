@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, Table
+from sqlalchemy import Column, Integer, ForeignKey, Table, Index
 from src.models.base_model import Base
 
 post_m2m_tag = Table(
@@ -7,13 +7,6 @@ post_m2m_tag = Table(
     Column("id", Integer, primary_key=True),
     Column("post_id", Integer, ForeignKey("posts.id", ondelete="CASCADE")),
     Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE")),
+    Index("ix_post_m2m_tag_post_id_tag_id", "post_id", "tag_id"),
+    Index("ix_post_m2m_tag_tag_id", "tag_id"),
 )
-
-post_o2m_comment = Table(
-    "post_o2m_comment",
-    Base.metadata,
-    Column("id", Integer, primary_key=True),
-    Column("post_id", Integer, ForeignKey("posts.id", ondelete="CASCADE")),
-    Column("comment_id", Integer, ForeignKey(
-        "comments.id", ondelete="CASCADE")),
-)
\ No newline at end of file
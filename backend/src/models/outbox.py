@@ -0,0 +1,18 @@
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, String, func
+from src.models.base_model import Base
+
+
+class OutboxMessage(Base):
+    # side effects outside the database, written in the transaction that causes them
+    # and delivered at least once by src.services.outbox
+    __tablename__ = "outbox"
+    __table_args__ = (
+        Index("ix_outbox_available_at", "available_at"),
+    )
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    payload = Column(JSON, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    last_error = Column(String(500))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    available_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
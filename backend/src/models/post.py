@@ -1,20 +1,29 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
-from src.models.base_model import BaseModel
-from src.models.helpers import post_m2m_tag, post_o2m_comment
+from src.models.base_model import BaseModel, LIVE_ROWS, DELETED_ROWS
+from src.models.helpers import post_m2m_tag
 
 
 class Post(BaseModel):
     __tablename__ = "posts"
+    __table_args__ = (
+        Index("ix_posts_live_user_id", "user_id",
+              postgresql_where=LIVE_ROWS, sqlite_where=LIVE_ROWS),
+        Index("ix_posts_deleted_at", "deleted_at",
+              postgresql_where=DELETED_ROWS, sqlite_where=DELETED_ROWS),
+        Index("ix_posts_image_public_id", "image_public_id", unique=True),
+    )
     title = Column(String, index=True)
     description = Column(String(255))
     image = Column(String(255))
     image_public_id = Column(String(255))
     transformed_image = Column(String(255), default=None)
     transformed_image_qr = Column(String(255), default=None)
+    comment_count = Column(Integer, nullable=False,
+                           default=0, server_default="0")
     user_id = Column(Integer, ForeignKey(
-        'users.id', ondelete='CASCADE'), default=None)
+        'users.id', ondelete='CASCADE'), default=None, index=True)
     user = relationship("User", back_populates="posts")
     tags = relationship("Tag", secondary=post_m2m_tag, back_populates="posts")
     comments = relationship(
-        "Comment", secondary=post_o2m_comment, back_populates="post")
+        "Comment", back_populates="post", passive_deletes=True)
@@ -1,12 +1,16 @@
-from sqlalchemy import Column, String, Boolean
+from sqlalchemy import Column, String, Boolean, Index
 from sqlalchemy.orm import relationship
-from src.models.base_model import BaseModel
+from src.models.base_model import BaseModel, DELETED_ROWS
 
 
 class User(BaseModel):
     __tablename__ = "users"
-    username = Column(String(50), unique=True)
-    email = Column(String(250), nullable=False, unique=True)
+    __table_args__ = (
+        Index("ix_users_deleted_at", "deleted_at",
+              postgresql_where=DELETED_ROWS, sqlite_where=DELETED_ROWS),
+    )
+    username = Column(String(50), unique=True, index=True)
+    email = Column(String(250), nullable=False, unique=True, index=True)
     password = Column(String(255), nullable=False)
     avatar = Column(String(255), nullable=True)
     refresh_token = Column(String(255), nullable=True)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel, Field
 from src.schemas.users import UserDb
 
@@ -21,6 +21,23 @@ class CommentResponse(BaseModel):
         from_attributes = True
 
 
+class CommentNormalized(BaseModel):
+    id: int
+    content: str
+    post_id: int
+    created_at: datetime
+    updated_at: Optional[datetime]
+    user_id: int
+
+    class Config:
+        from_attributes = True
+
+
+class CommentsNormalized(BaseModel):
+    comments: List[CommentNormalized]
+    users: Dict[int, UserDb]
+
+
 class CommentUpdate(BaseModel):
     new_comment: str = Field(max_length=100)
 
@@ -1,10 +1,11 @@
 
-from typing import List
+from typing import Dict, List
 from pydantic import BaseModel, Field
 from datetime import datetime
 from src.schemas.tags import TagResponse
 from src.schemas.users import UserDb
-from src.schemas.comments import CommentResponse
+from src.core.config import settings
+from src.schemas.comments import CommentNormalized, CommentResponse
 
 
 class PostModel(BaseModel):
@@ -22,11 +23,66 @@ class PostModelWithImage(PostModel):
     image: str = Field(min_length=1, max_length=255)
     user: UserDb
     tags: List[TagResponse]
-    comments: List[CommentResponse]
+    comment_count: int = 0
+    latest_comments: List[CommentResponse] = []
     transformed_image: str | None = None
     transformed_image_qr: str | None = None
 
 
+class PostNormalized(PostModel):
+    id: int
+    created_at: datetime
+    image: str = Field(min_length=1, max_length=255)
+    user_id: int
+    tags: List[TagResponse]
+    comment_count: int = 0
+    latest_comments: List[CommentNormalized] = []
+    transformed_image: str | None = None
+    transformed_image_qr: str | None = None
+
+
+class PostsNormalized(BaseModel):
+    posts: List[PostNormalized]
+    users: Dict[int, UserDb]
+
+
+class PostNormalizedResponse(BaseModel):
+    post: PostNormalized
+    users: Dict[int, UserDb]
+
+
+class PostBatchRequest(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=settings.POSTS_BATCH_MAX_IDS)
+
+
+class PostBatchItem(BaseModel):
+    id: int
+    post: PostModelWithImage | None = None
+    detail: str | None = None
+
+
+class PostBulkItem(BaseModel):
+    index: int
+    post: PostModelWithImage | None = None
+    detail: str | None = None
+
+
+class PostUploadTicket(BaseModel):
+    upload_url: str
+    api_key: str
+    public_id: str
+    timestamp: int
+    signature: str
+    ticket: str
+    expires_at: datetime
+
+
+class PostFinalizeUpload(PostModelCreate):
+    ticket: str
+    version: int
+    signature: str
+
+
 class PostCreate(BaseModel):
     post: PostModelWithImage
     detail: str = "Post successfully created"
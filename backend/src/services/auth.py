@@ -1,4 +1,3 @@
-import redis
 import pickle
 from typing import Optional
 from jose import JWTError, jwt
@@ -9,6 +8,8 @@ from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from src.core.config import settings
 from src.core.db import get_db
+from src.core.redis import redis_client
+from src.core.tracing import start_span
 from src.crud import users as repository_users
 
 
@@ -18,8 +19,6 @@ class Auth:
     ALGORITHM = settings.ALGORITHM
     oauth2_scheme = OAuth2PasswordBearer(
         tokenUrl=f'{settings.API_V1_STR}/auth/login')
-    r = redis.Redis(host=settings.REDIS_HOST_,
-                    port=settings.REDIS_PORT, password=settings.REDIS_PASSWORD, db=0)
 
     def verify_password(self, plain_password, hashed_password):
         return self.pwd_context.verify(plain_password, hashed_password)
@@ -84,17 +83,47 @@ class Auth:
                 raise credentials_exception
         except JWTError as e:
             raise credentials_exception
-        user = self.r.get(f"user:{email}")
-        if user is None:
-            user = await repository_users.get_user_by_email(email, db)
+        with start_span("auth.get_current_user") as span:
+            user = await redis_client().get(f"user:{email}")
+            if span is not None:
+                span.set_attribute("cache.hit", user is not None)
             if user is None:
-                raise credentials_exception
-            self.r.set(f"user:{email}", pickle.dumps(user))
-            self.r.expire(f"user:{email}", 900)
-        else:
-            user = pickle.loads(user)
+                user = await repository_users.get_user_by_email(email, db)
+                if user is None:
+                    raise credentials_exception
+                await redis_client().set(f"user:{email}", pickle.dumps(user), ex=900)
+            else:
+                user = pickle.loads(user)
         return user
 
+    def access_token_subject(self, token: str | None) -> str | None:
+        # the email an access token was issued to, without the database lookup of get_current_user
+        if token is None:
+            return None
+        try:
+            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+        except JWTError:
+            return None
+        if payload.get("scope") != "access_token":
+            return None
+        return payload.get("sub")
+
+    def create_upload_ticket(self, email: str, public_id: str, expires_delta: float):
+        # binds a signed direct upload to the user it was issued to
+        expire = datetime.utcnow() + timedelta(seconds=expires_delta)
+        to_encode = {"sub": email, "public_id": public_id, "iat": datetime.utcnow(), "exp": expire,
+                     "scope": "upload_ticket"}
+        return jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM), expire
+
+    def decode_upload_ticket(self, ticket: str):
+        try:
+            payload = jwt.decode(ticket, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+        except JWTError:
+            return None
+        if payload.get("scope") != "upload_ticket":
+            return None
+        return payload
+
     def create_email_token(self, data: dict):
         to_encode = data.copy()
         expire = datetime.utcnow() + timedelta(days=7)
@@ -1,40 +1,190 @@
+"""
+Email delivery over a small pool of persistent SMTP connections.
+
+Opening a connection costs a TCP and TLS handshake plus a login, more than
+sending a message over it. The Mailer keeps SMTP_POOL_SIZE connections open
+and feeds them from a bounded queue: every connection takes up to
+SMTP_BATCH_SIZE queued messages at a time and sends them back to back. Idle
+connections are kept alive with NOOP every SMTP_KEEPALIVE_SECONDS, dropped
+connections are reopened, and temporary failures are retried up to
+SMTP_MAX_RETRIES times. A full queue makes send() wait, which slows the caller
+down instead of piling up messages in memory.
+
+Templates are compiled once, when the mailer starts.
+"""
+import asyncio
+import logging
+from email.message import EmailMessage
+from email.utils import formataddr
 from pathlib import Path
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
+import aiosmtplib
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
 from pydantic import EmailStr
 from src.core.config import settings
+from src.core.metrics import track_dependency
+from src.core.tracing import traced
 from src.services.auth import auth_service
 
+logger = logging.getLogger(__name__)
 
+TEMPLATE_FOLDER = Path(__file__).parent / 'templates'
+FROM_NAME = "Your Contacts Systems"
+RETRY_DELAY = 0.5
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.SMTP_USER,
-    MAIL_PASSWORD=settings.SMTP_PASSWORD,
-    MAIL_FROM=settings.EMAILS_FROM_EMAIL,
-    MAIL_PORT=settings.SMTP_PORT,
-    MAIL_SERVER=settings.SMTP_HOST,
-    MAIL_FROM_NAME="Your Contacts Systems",
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=False,
-    TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
-)
+templates = Environment(loader=FileSystemLoader(TEMPLATE_FOLDER), autoescape=select_autoescape())
 
 
+def is_permanent(error: Exception) -> bool:
+    # 5xx replies such as an unknown recipient fail the same way on every attempt
+    return isinstance(error, aiosmtplib.SMTPResponseException) and 500 <= error.code < 600
 
-async def send_email(email: EmailStr, username: str, host: str):
-    try:
-        token_verification = auth_service.create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Confirm your email ",
-            recipients=[email],
-            template_body={"host": host, "username": username, "token": token_verification},
-            subtype=MessageType.html
+
+class Mailer:
+    def __init__(self, pool_size: int = settings.SMTP_POOL_SIZE, queue_size: int = settings.SMTP_QUEUE_SIZE,
+                 batch_size: int = settings.SMTP_BATCH_SIZE, max_retries: int = settings.SMTP_MAX_RETRIES,
+                 keepalive: float = settings.SMTP_KEEPALIVE_SECONDS):
+        self.pool_size = pool_size
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.keepalive = keepalive
+        self.connections_opened = 0
+        self._templates = {}
+        self._queue = None
+        self._workers = []
+        self._loop = None
+
+    async def start(self):
+        """
+        The start function compiles the templates and opens the connection pool, connections
+        themselves are opened by the first message each of them sends.
+        """
+        loop = asyncio.get_running_loop()
+        if self._workers and self._loop is loop:
+            return
+        self._loop = loop
+        self._templates = {name: templates.get_template(name) for name in templates.list_templates()}
+        self._queue = asyncio.Queue(self.queue_size)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.pool_size)]
+
+    async def close(self):
+        """
+        The close function waits for the queued messages to be sent and closes the connections.
+        """
+        if not self._workers or self._loop is not asyncio.get_running_loop():
+            return
+        await self._queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def template(self, name: str) -> Template:
+        return self._templates.get(name) or templates.get_template(name)
+
+    async def send(self, message: EmailMessage):
+        """
+        The send function queues a message and waits until it is accepted by the SMTP server.
+        It raises the last error when the message could not be delivered.
+        """
+        await self.start()
+        delivered = asyncio.get_running_loop().create_future()
+        await self._queue.put((message, delivered))
+        await delivered
+
+    async def _work(self):
+        client = None
+        try:
+            while True:
+                try:
+                    first = await asyncio.wait_for(self._queue.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    client = await self._keep_alive(client)
+                    continue
+                batch = [first]
+                while len(batch) < self.batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                try:
+                    for message, delivered in batch:
+                        client = await self._deliver(client, message, delivered)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+        finally:
+            if client is not None:
+                await self._disconnect(client)
+
+    async def _deliver(self, client, message: EmailMessage, delivered: asyncio.Future):
+        for attempt in range(self.max_retries + 1):
+            try:
+                if client is None:
+                    client = await self._connect()
+                with track_dependency("smtp", "send_message"):
+                    await client.send_message(message)
+                if not delivered.done():
+                    delivered.set_result(None)
+                return client
+            except Exception as e:
+                if is_permanent(e) or attempt == self.max_retries:
+                    if not delivered.done():
+                        delivered.set_exception(e)
+                    return client
+                logger.warning("Sending email to %s failed, attempt %d: %s", message["To"], attempt + 1, e)
+                if client is not None:
+                    await self._disconnect(client)
+                    client = None
+                await asyncio.sleep(RETRY_DELAY * 2 ** attempt)
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(
+            hostname=settings.SMTP_HOST,
+            port=settings.SMTP_PORT,
+            use_tls=settings.SMTP_SSL_TLS,
+            start_tls=settings.SMTP_STARTTLS,
+            validate_certs=False,
+            timeout=settings.SMTP_TIMEOUT_SECONDS,
         )
+        with track_dependency("smtp", "connect"):
+            await client.connect()
+            if settings.SMTP_USER:
+                await client.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        self.connections_opened += 1
+        return client
+
+    async def _keep_alive(self, client):
+        if client is None:
+            return None
+        try:
+            await client.noop()
+            return client
+        except Exception:
+            await self._disconnect(client)
+            return None
+
+    @staticmethod
+    async def _disconnect(client: aiosmtplib.SMTP):
+        try:
+            await client.quit()
+        except Exception:
+            client.close()
+
+
+mailer = Mailer()
 
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_template.html")
-    except ConnectionErrors as err:
-        print(err)
\ No newline at end of file
+
+def confirmation_message(email: str, username: str, host: str) -> EmailMessage:
+    token_verification = auth_service.create_email_token({"sub": email})
+    message = EmailMessage()
+    message["From"] = formataddr((FROM_NAME, settings.EMAILS_FROM_EMAIL))
+    message["To"] = email
+    message["Subject"] = "Confirm your email "
+    message.set_content(mailer.template("email_template.html").render(
+        host=host, username=username, token=token_verification), subtype="html")
+    return message
+
+
+@traced("email.send")
+async def send_email(email: EmailStr, username: str, host: str):
+    # errors propagate, the outbox worker retries the message later
+    await mailer.send(confirmation_message(email, username, host))
@@ -0,0 +1,244 @@
+"""
+Transactional outbox for side effects outside the database.
+
+Code that deletes Cloudinary images or sends email does not call the remote
+service itself. It adds a message with enqueue() in the same transaction as the
+rows it changes, so the message exists exactly when the change was committed,
+and the request never waits on Cloudinary or SMTP. A worker drains the table:
+
+    python -m src.services.outbox --batch-size 100 --metrics-port 9101
+
+Each batch claims due messages with FOR UPDATE SKIP LOCKED, so several workers
+can run side by side, and leases them for OUTBOX_LEASE_SECONDS. Image deletions
+of all claimed messages are merged into delete_resources calls of up to 100
+public ids. Delivered messages are deleted, failed ones are retried with
+exponential backoff until OUTBOX_MAX_ATTEMPTS, then kept as dead for
+inspection. A worker dying mid-batch only delays its messages until the lease
+runs out, delivery is at least once.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+import cloudinary
+import cloudinary.api
+from prometheus_client import Gauge, start_http_server
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from src.core.config import settings
+from src.core.metrics import track_dependency
+from src.models.outbox import OutboxMessage
+from src.services.email import mailer, send_email
+
+logger = logging.getLogger(__name__)
+
+CLOUDINARY_DELETE = "cloudinary.delete"
+CONFIRMATION_EMAIL = "email.confirmation"
+
+# Cloudinary accepts up to 100 public ids per delete_resources call
+CLOUDINARY_BATCH = 100
+MAX_RETRY_DELAY = timedelta(hours=1)
+
+OUTBOX_DEPTH = Gauge("outbox_depth", "Outbox messages waiting for delivery", ["kind"], multiprocess_mode="max")
+OUTBOX_DEAD = Gauge("outbox_dead", "Outbox messages that ran out of attempts", multiprocess_mode="max")
+OUTBOX_OLDEST_AGE = Gauge(
+    "outbox_oldest_age_seconds", "Age of the oldest outbox message waiting for delivery", multiprocess_mode="max")
+
+
+def enqueue(db: Session, kind: str, payload: dict) -> OutboxMessage:
+    """
+    The enqueue function adds a message to the outbox without committing, the
+    caller's commit publishes it together with the change it belongs to.
+
+    :param db: Session: The session of the transaction causing the side effect
+    :param kind: str: CLOUDINARY_DELETE or CONFIRMATION_EMAIL
+    :param payload: dict: JSON serializable arguments of the handler
+    :return: The message
+    """
+    message = OutboxMessage(kind=kind, payload=payload)
+    db.add(message)
+    return message
+
+
+def enqueue_image_deletion(db: Session, public_ids: list[str]):
+    if public_ids:
+        enqueue(db, CLOUDINARY_DELETE, {"public_ids": list(public_ids)})
+
+
+def enqueue_confirmation_email(db: Session, email: str, username: str, host: str):
+    enqueue(db, CONFIRMATION_EMAIL, {"email": email, "username": username, "host": host})
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return min(timedelta(seconds=settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1)), MAX_RETRY_DELAY)
+
+
+class ClaimedMessage(NamedTuple):
+    # plain values rather than ORM rows, which the commit of the lease would expire
+    # and then refresh one SELECT at a time
+    id: int
+    kind: str
+    payload: dict
+    attempts: int
+
+
+def delete_images(messages: list[ClaimedMessage]) -> dict[int, str]:
+    """
+    The delete_images function deletes the images of every message with as few
+    delete_resources calls as possible. Images that are already gone count as deleted.
+
+    :return: The error per id of the messages that could not be delivered
+    """
+    owners = {}
+    for message in messages:
+        for public_id in message.payload["public_ids"]:
+            owners.setdefault(public_id, set()).add(message.id)
+    public_ids = list(owners)
+    errors = {}
+    for start in range(0, len(public_ids), CLOUDINARY_BATCH):
+        chunk = public_ids[start:start + CLOUDINARY_BATCH]
+        try:
+            with track_dependency("cloudinary", "delete_resources"):
+                cloudinary.api.delete_resources(chunk)
+        except Exception as e:
+            for public_id in chunk:
+                for message_id in owners[public_id]:
+                    errors[message_id] = repr(e)
+    return errors
+
+
+def destroy_images(public_ids: list[str]):
+    """
+    The destroy_images function deletes images right away, for when their deletion
+    could not be enqueued. It is best effort, failures are only logged.
+    """
+    for start in range(0, len(public_ids), CLOUDINARY_BATCH):
+        chunk = public_ids[start:start + CLOUDINARY_BATCH]
+        try:
+            with track_dependency("cloudinary", "delete_resources"):
+                cloudinary.api.delete_resources(chunk)
+        except Exception as e:
+            logger.warning("Could not delete %d images from Cloudinary: %s", len(chunk), e)
+
+
+async def send_emails(messages: list[ClaimedMessage]) -> dict[int, str]:
+    results = await asyncio.gather(*(send_email(**message.payload) for message in messages), return_exceptions=True)
+    return {message.id: repr(result) for message, result in zip(messages, results) if isinstance(result, Exception)}
+
+
+def claim_batch(db: Session, batch_size: int) -> list[ClaimedMessage]:
+    now = datetime.now(timezone.utc)
+    messages = [ClaimedMessage(*row) for row in db.execute(
+        select(OutboxMessage.id, OutboxMessage.kind, OutboxMessage.payload, OutboxMessage.attempts)
+        .where(OutboxMessage.available_at <= now, OutboxMessage.attempts < settings.OUTBOX_MAX_ATTEMPTS)
+        .order_by(OutboxMessage.id).limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )]
+    if messages:
+        db.execute(update(OutboxMessage)
+                   .where(OutboxMessage.id.in_([message.id for message in messages]))
+                   .values(available_at=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)))
+    db.commit()
+    return messages
+
+
+async def drain_batch(db: Session, batch_size: int = settings.OUTBOX_BATCH_SIZE) -> int:
+    """
+    The drain_batch function delivers up to batch_size due messages.
+
+    :param db: Session: The worker's database session
+    :param batch_size: int: Maximum number of messages claimed at once
+    :return: Number of messages claimed
+    """
+    messages = claim_batch(db, batch_size)
+    if not messages:
+        return 0
+    errors = {}
+    deletions = [message for message in messages if message.kind == CLOUDINARY_DELETE]
+    emails = [message for message in messages if message.kind == CONFIRMATION_EMAIL]
+    if deletions:
+        errors.update(await asyncio.to_thread(delete_images, deletions))
+    if emails:
+        errors.update(await send_emails(emails))
+    for message in messages:
+        if message.kind not in (CLOUDINARY_DELETE, CONFIRMATION_EMAIL):
+            errors[message.id] = f"Unknown kind {message.kind}"
+
+    delivered = [message.id for message in messages if message.id not in errors]
+    if delivered:
+        db.execute(delete(OutboxMessage).where(OutboxMessage.id.in_(delivered)))
+    now = datetime.now(timezone.utc)
+    retries = []
+    for message in messages:
+        if message.id in errors:
+            attempts = message.attempts + 1
+            retries.append({"id": message.id, "attempts": attempts, "last_error": errors[message.id][:500],
+                            "available_at": now + retry_delay(attempts)})
+            logger.warning("Outbox message %d (%s) failed, attempt %d: %s",
+                           message.id, message.kind, attempts, errors[message.id])
+    if retries:
+        # one executemany, by primary key
+        db.execute(update(OutboxMessage), retries)
+    db.commit()
+    return len(messages)
+
+
+def outbox_stats(db: Session) -> dict:
+    """
+    The outbox_stats function reports the queue depth: messages waiting per kind,
+    dead messages and the age of the oldest waiting message.
+    """
+    live = OutboxMessage.attempts < settings.OUTBOX_MAX_ATTEMPTS
+    pending = dict(db.execute(
+        select(OutboxMessage.kind, func.count()).where(live).group_by(OutboxMessage.kind)).all())
+    dead = db.execute(select(func.count()).select_from(OutboxMessage).where(~live)).scalar()
+    oldest = db.execute(select(func.min(OutboxMessage.created_at)).where(live)).scalar()
+    oldest_age = 0.0
+    if oldest is not None:
+        if oldest.tzinfo is None:
+            oldest = oldest.replace(tzinfo=timezone.utc)
+        oldest_age = max((datetime.now(timezone.utc) - oldest).total_seconds(), 0.0)
+    return {"pending": pending, "dead": dead, "oldest_age_seconds": oldest_age}
+
+
+def export_stats(stats: dict):
+    for kind in (CLOUDINARY_DELETE, CONFIRMATION_EMAIL):
+        OUTBOX_DEPTH.labels(kind).set(stats["pending"].get(kind, 0))
+    OUTBOX_DEAD.set(stats["dead"])
+    OUTBOX_OLDEST_AGE.set(stats["oldest_age_seconds"])
+
+
+async def run_worker(session_factory, batch_size: int, interval: float, once: bool = False):
+    await mailer.start()
+    try:
+        while True:
+            with session_factory() as db:
+                while await drain_batch(db, batch_size) == batch_size:
+                    pass
+                export_stats(outbox_stats(db))
+            if once:
+                return
+            await asyncio.sleep(interval)
+    finally:
+        await mailer.close()
+
+
+if __name__ == "__main__":
+    from src.core.db import SessionLocal
+    from src.core.media import configure_cloudinary
+
+    parser = argparse.ArgumentParser(description="Deliver outbox messages")
+    parser.add_argument("--batch-size", type=int, default=settings.OUTBOX_BATCH_SIZE)
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds to sleep once the outbox is empty")
+    parser.add_argument("--once", action="store_true", help="Drain what is due and exit")
+    parser.add_argument("--metrics-port", type=int, default=0, help="Serve the queue depth gauges for Prometheus")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    configure_cloudinary()
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+    asyncio.run(run_worker(SessionLocal, args.batch_size, args.interval, args.once))
@@ -0,0 +1,82 @@
+"""
+Hard deletes soft deleted rows in small batches.
+
+Deleting a user or a post only sets deleted_at, so requests never pay for the
+cascade through posts, comments, tags and Cloudinary. This job removes the rows
+once they are older than the retention period, one short transaction per batch,
+and queues the deletion of their images in the outbox of the same transaction.
+Run it off-peak, for example from cron:
+
+    python -m src.services.purger --retention-days 7 --batch-size 500
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from src.models.base import Comment, Post, User
+from src.services.outbox import enqueue_image_deletion
+
+logger = logging.getLogger(__name__)
+
+
+def purge_batch(model, cutoff: datetime, batch_size: int, db: Session) -> int:
+    ids = db.execute(
+        select(model.id).where(model.deleted_at < cutoff).order_by(model.id).limit(batch_size),
+        execution_options={"include_deleted": True},
+    ).scalars().all()
+    if not ids:
+        return 0
+    public_ids = []
+    if model is Post:
+        public_ids = [public_id for public_id in db.execute(
+            select(Post.image_public_id).where(Post.id.in_(ids), Post.image_public_id.is_not(None)),
+            execution_options={"include_deleted": True},
+        ).scalars()]
+    db.execute(delete(model).where(model.id.in_(ids)))
+    enqueue_image_deletion(db, public_ids)
+    db.commit()
+    return len(ids)
+
+
+def purge_deleted_rows(db: Session, retention: timedelta, batch_size: int = 500, pause: float = 0.0) -> dict:
+    """
+    The purge_deleted_rows function hard deletes every row that was soft deleted
+    before now - retention. Children go first so the ON DELETE CASCADE of a
+    parent never has to walk a large set of rows inside one transaction.
+
+    :param db: Session: Pass the database session to the function
+    :param retention: timedelta: How long soft deleted rows are kept
+    :param batch_size: int: Number of rows deleted per transaction
+    :param pause: float: Seconds to sleep between batches to spread the load
+    :return: Number of purged rows per table
+    """
+    cutoff = datetime.now(timezone.utc) - retention
+    purged = {}
+    for model in (Comment, Post, User):
+        purged[model.__tablename__] = 0
+        while True:
+            count = purge_batch(model, cutoff, batch_size, db)
+            purged[model.__tablename__] += count
+            if count < batch_size:
+                break
+            time.sleep(pause)
+    return purged
+
+
+if __name__ == "__main__":
+    from src.core.db import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Hard delete soft deleted rows in batches")
+    parser.add_argument("--retention-days", type=float, default=7)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.5)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as db:
+        result = purge_deleted_rows(db, timedelta(days=args.retention_days), args.batch_size, args.pause)
+    logger.info("Purged %s", result)
@@ -1,6 +1,7 @@
 import pytest
 import sys
 import os
+from contextlib import contextmanager
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -8,8 +9,9 @@ from dotenv import load_dotenv
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 load_dotenv()
 from main import app
-from src.models.base import Base
+from src.models.base import Base, User
 from src.core.db import get_db
+from src.core import query_counter, tracing
 
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -17,6 +19,8 @@ SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
+query_counter.install(engine)
+tracing.install(engine)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
@@ -52,3 +56,38 @@ def client(session):
 @pytest.fixture(scope="module")
 def user():
     return {"username": "deadpool", "email": "deadpool@example.com", "password": "123456789"}
+
+
+@pytest.fixture
+def make_user(session):
+    """
+    Adds and commits a user whose email and other required fields follow from the username:
+
+        author = make_user("author")
+        admin = make_user("boss", role="admin")
+    """
+    def _make_user(username: str, **fields) -> User:
+        user = User(username=username, email=f"{username}@example.com", password="secret",
+                    avatar="https://example.com/a.png", **fields)
+        session.add(user)
+        session.commit()
+        return user
+
+    return _make_user
+
+
+@pytest.fixture
+def assert_max_queries():
+    """
+    Fails the test when the block runs more SQL statements than allowed:
+
+        with assert_max_queries(3):
+            client.get("/api/v1/posts/")
+    """
+    @contextmanager
+    def _assert_max_queries(limit: int):
+        with query_counter.capture_queries() as stats:
+            yield stats
+        assert stats.count <= limit, f"{stats.count} queries, expected at most {limit}:\n{stats.report()}"
+
+    return _assert_max_queries
@@ -0,0 +1,37 @@
+import asyncio
+import threading
+
+from src.crud.users import create_user
+from src.models.base import AppSetting
+from src.schemas.users import UserModel
+from src.tests.conftest import TestingSessionLocal
+
+
+def signup(i: int) -> str:
+    with TestingSessionLocal() as db:
+        user = asyncio.run(create_user(UserModel(username=f"first{i}", email=f"first{i}@example.com", password="secret"), db))
+        return user.role
+
+
+def test_only_one_of_parallel_signups_becomes_admin(session):
+    roles = []
+    start = threading.Barrier(8)
+
+    def run(i):
+        start.wait()
+        roles.append(signup(i))
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(roles) == ["admin"] + ["user"] * 7
+    assert session.query(AppSetting).count() == 1
+
+
+def test_signup_does_not_count_users(session, assert_max_queries):
+    with assert_max_queries(3) as stats:
+        assert signup(8) == "user"
+    assert not any("count(" in statement.lower() for statement in stats.statements)
@@ -0,0 +1,87 @@
+import asyncio
+import io
+import threading
+import time
+
+import cloudinary
+import cloudinary.uploader
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from starlette.datastructures import UploadFile
+
+from src.constants.messages import POST_UPLOAD_FAILED, UNPROCESSABLE_ENTITY
+from src.core.config import settings
+from src.crud import post as crud_post
+from src.crud.post import upload_posts_bulk
+from src.models.base import OutboxMessage, Post, Tag
+from src.schemas.posts import PostModelCreate
+from src.tests.conftest import TestingSessionLocal
+
+
+def test_uploads_concurrently_and_commits_once(session, make_user, monkeypatch):
+    user = make_user("album")
+    running, peak = 0, 0
+    lock = threading.Lock()
+
+    def upload(file, public_id):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        if file.read() == b"broken":
+            raise IOError("upload failed")
+        return {"version": 1}
+
+    monkeypatch.setattr(cloudinary.uploader, "upload", upload)
+    monkeypatch.setattr(cloudinary.config(), "cloud_name", "photoshare")
+    monkeypatch.setattr(settings, "UPLOAD_CONCURRENCY", 3)
+    commits = []
+
+    def count_commit(db):
+        commits.append(db)
+
+    event.listen(session, "after_commit", count_commit)
+
+    images = [UploadFile(io.BytesIO(b"broken" if i == 2 else b"image"), filename=f"{i}.png") for i in range(6)]
+    bodies = [PostModelCreate(title=f"album {i}", description="bulk", tags=["album", f"photo{i % 2}"]) for i in range(6)]
+    bodies[4] = PostModelCreate(title="album 4", description="bulk", tags=[f"t{i}" for i in range(6)])
+    results = asyncio.run(upload_posts_bulk(user, images, bodies, session))
+    event.remove(session, "after_commit", count_commit)
+
+    assert peak == 3
+    assert len(commits) == 1
+    assert [result["index"] for result in results] == list(range(6))
+    assert results[2]["detail"] == POST_UPLOAD_FAILED and "post" not in results[2]
+    assert results[4]["detail"] == UNPROCESSABLE_ENTITY
+    created = [result["post"] for result in results if "post" in result]
+    assert [post.title for post in created] == ["album 0", "album 1", "album 3", "album 5"]
+    assert sorted(tag.name for tag in created[1].tags) == ["album", "photo1"]
+    assert session.query(Tag).filter(Tag.name == "album").count() == 1
+    assert session.query(Post).filter(Post.user_id == user.id).count() == 4
+
+
+def test_images_are_deleted_when_the_database_is_gone(session, make_user, monkeypatch):
+    user = make_user("offline")
+    monkeypatch.setattr(cloudinary.uploader, "upload", lambda file, public_id: {"version": 1})
+    monkeypatch.setattr(cloudinary.config(), "cloud_name", "photoshare")
+    destroyed = []
+    monkeypatch.setattr(crud_post, "destroy_images", destroyed.extend)
+
+    def lost_connection():
+        raise OperationalError("COMMIT", {}, Exception("server closed the connection unexpectedly"))
+
+    images = [UploadFile(io.BytesIO(b"image"), filename=f"{i}.png") for i in range(2)]
+    bodies = [PostModelCreate(title=f"offline {i}", description="bulk", tags=[]) for i in range(2)]
+    with TestingSessionLocal() as db:
+        monkeypatch.setattr(db, "commit", lost_connection)
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(upload_posts_bulk(user, images, bodies, db))
+
+    assert error.value.status_code == 400
+    assert len(destroyed) == 2 and all(public_id.startswith("photo_share/") for public_id in destroyed)
+    assert session.query(OutboxMessage).count() == 0
@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+from starlette.requests import Request
+
+from src.api.routes.post import get_all_posts
+from src.core import query_counter
+from src.core.dataloader import DataLoader
+from src.crud.loaders import LOADERS_KEY
+from src.crud.tags import create_tag_if_not_exist
+from src.crud.users import get_user_by_email, get_users_by_ids
+from src.models.base import Post, Tag, User
+
+REQUEST = Request({"type": "http", "headers": []})
+
+
+def test_coalesces_and_memoizes():
+    batches = []
+
+    def batch_load(keys):
+        batches.append(keys)
+        return {key: key * 10 for key in keys if key != 3}
+
+    async def run():
+        loader = DataLoader(batch_load)
+        first = await asyncio.gather(loader.load(1), loader.load(2), loader.load(1), loader.load(3))
+        second = await loader.load_many([2, 4, 1])
+        return first, second
+
+    assert asyncio.run(run()) == ([10, 20, 10, None], [20, 40, 10])
+    assert batches == [[1, 2, 3], [4]]
+
+
+def test_batch_errors_reach_every_caller():
+    def batch_load(keys):
+        raise ValueError("boom")
+
+    async def run():
+        loader = DataLoader(batch_load)
+        return await asyncio.gather(loader.load(1), loader.load(2), return_exceptions=True)
+
+    assert [type(error) for error in asyncio.run(run())] == [ValueError, ValueError]
+
+
+def test_users_loaded_once_per_request(session, make_user):
+    for i in range(3):
+        make_user(f"loader{i}")
+    ids = [id for (id,) in session.query(User.id).filter(User.username.like("loader%"))]
+
+    async def run():
+        users = await get_users_by_ids(ids, session)
+        # already loaded by id, the email lookup is answered from memory
+        user = await get_user_by_email("loader1@example.com", session)
+        return users, user
+
+    with query_counter.capture_queries() as stats:
+        users, user = asyncio.run(run())
+    assert stats.count == 1
+    assert sorted(users) == sorted(ids) and user.username == "loader1"
+
+    session.commit()
+    assert LOADERS_KEY not in session.info
+
+
+def test_tags_looked_up_in_one_query(session):
+    session.add(Tag(name="existing"))
+    session.commit()
+
+    async def run():
+        return await asyncio.gather(*(create_tag_if_not_exist(name, session) for name in ["existing", "new1", "new2"]))
+
+    with query_counter.capture_queries() as stats:
+        tags = asyncio.run(run())
+    assert [tag.name for tag in tags] == ["existing", "new1", "new2"]
+    assert [count for statement, count in stats.statements.items() if "FROM tags WHERE tags.name IN" in statement] == [1]
+
+
+def test_post_listing_query_count_does_not_grow_with_posts(session, make_user):
+    author = make_user("lister")
+    tag = Tag(name="listed")
+    session.add(tag)
+    session.commit()
+    author_id, tag_id = author.id, tag.id
+
+    def listing_queries(total: int) -> int:
+        tag = session.get(Tag, tag_id)
+        existing = session.query(Post).filter(Post.user_id == author_id).count()
+        session.add_all([Post(title=f"listed {i}", description="", image="https://example.com/p.png",
+                              user_id=author_id, tags=[tag]) for i in range(existing, total)])
+        session.commit()
+        session.expunge_all()
+        author = session.get(User, author_id)
+        with query_counter.capture_queries() as stats:
+            response = asyncio.run(get_all_posts(REQUEST, author, session, is_own=True, comments_preview=3,
+                                                 fields=None, normalized=False))
+        assert len(json.loads(response.body)) == total
+        return stats.count
+
+    assert listing_queries(3) == listing_queries(30)
@@ -0,0 +1,88 @@
+import asyncio
+import hashlib
+
+import cloudinary
+import pytest
+from fastapi import HTTPException
+
+from src.core.config import settings
+from src.crud import post as crud_post
+from src.crud.post import create_upload_ticket, finalize_upload
+from src.models.base import Post, User
+from src.schemas.posts import PostFinalizeUpload
+from src.services.auth import auth_service
+
+SECRET = "direct-upload-secret"
+
+
+def cloudinary_signature(params: dict) -> str:
+    # what Cloudinary computes: the sorted parameters, then the secret, hashed with SHA-1
+    to_sign = "&".join(f"{key}={value}" for key, value in sorted(params.items()))
+    return hashlib.sha1((to_sign + SECRET).encode()).hexdigest()
+
+
+@pytest.fixture
+def cloudinary_account(monkeypatch):
+    monkeypatch.setattr(settings, "CLOUDINARY_API_SECRET", SECRET)
+    monkeypatch.setattr(settings, "CLOUDINARY_API_KEY", "direct-upload-key")
+    monkeypatch.setattr(cloudinary.config(), "api_secret", SECRET)
+    monkeypatch.setattr(cloudinary.config(), "cloud_name", "photoshare")
+
+
+def test_ticket_signs_the_upload(cloudinary_account):
+    user = User(email="direct@example.com")
+    ticket = create_upload_ticket(user)
+    assert ticket["upload_url"] == "https://api.cloudinary.com/v1_1/photoshare/image/upload"
+    assert ticket["signature"] == cloudinary_signature({"public_id": ticket["public_id"], "timestamp": ticket["timestamp"]})
+
+
+def finalize_body(user: User, tags=("direct",)) -> PostFinalizeUpload:
+    ticket = create_upload_ticket(user)
+    uploaded = {"version": 1712345678}
+    uploaded["signature"] = cloudinary_signature({"public_id": ticket["public_id"], "version": uploaded["version"]})
+    return PostFinalizeUpload(title="direct", description="uploaded by the client", tags=list(tags),
+                              ticket=ticket["ticket"], **uploaded)
+
+
+def test_finalize_creates_the_post_once(session, make_user, cloudinary_account):
+    user = make_user("direct")
+    body = finalize_body(user)
+    public_id = auth_service.decode_upload_ticket(body.ticket)["public_id"]
+
+    post = asyncio.run(finalize_upload(user, body, session))
+    assert post.image_public_id == public_id
+    assert post.image.endswith(f"/v{body.version}/{public_id}")
+    assert [tag.name for tag in post.tags] == ["direct"]
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(finalize_upload(user, body, session))
+    assert error.value.status_code == 409
+
+
+def test_concurrent_finalizes_create_one_post(session, make_user, cloudinary_account, monkeypatch):
+    user = make_user("direct_race")
+    body = finalize_body(user, tags=())
+    asyncio.run(finalize_upload(user, body, session))
+
+    # the second finalize passed the fast path before the first one committed
+    checks = iter([False])
+    is_finalized = crud_post.is_finalized
+    monkeypatch.setattr(crud_post, "is_finalized", lambda public_id, db: next(checks, None) or is_finalized(public_id, db))
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(finalize_upload(user, body, session))
+    assert error.value.status_code == 409
+    assert session.query(Post).filter(Post.user_id == user.id).count() == 1
+
+
+def test_finalize_rejects_forged_uploads(session, make_user, cloudinary_account):
+    user = make_user("forger")
+    ticket = create_upload_ticket(user)
+    forged = PostFinalizeUpload(title="direct", description="forged", ticket=ticket["ticket"], version=1, signature="0" * 40)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(finalize_upload(user, forged, session))
+    assert error.value.status_code == 422
+
+    other = User(email="someone-else@example.com")
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(finalize_upload(other, forged, session))
+    assert error.value.status_code == 403
@@ -0,0 +1,85 @@
+import asyncio
+import socket
+
+import aiosmtplib
+import pytest
+
+from src.core.config import settings
+from src.services import email
+from src.services.email import Mailer, confirmation_message
+
+controller = pytest.importorskip("aiosmtpd.controller")
+
+
+class Handler:
+    def __init__(self):
+        self.received = []
+        self.failures = {}
+
+    async def handle_DATA(self, server, session, envelope):
+        recipient = envelope.rcpt_tos[0]
+        if self.failures.get(recipient):
+            code = self.failures[recipient].pop(0)
+            return f"{code} rejected"
+        self.received.append(recipient)
+        return "250 OK"
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    handler = Handler()
+    server = controller.Controller(handler, hostname="127.0.0.1", port=port)
+    server.start()
+    monkeypatch.setattr(settings, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(settings, "SMTP_PORT", port)
+    monkeypatch.setattr(settings, "SMTP_SSL_TLS", False)
+    monkeypatch.setattr(settings, "SMTP_STARTTLS", False)
+    monkeypatch.setattr(settings, "SMTP_USER", "")
+    monkeypatch.setattr(settings, "EMAILS_FROM_EMAIL", "info@example.com")
+    monkeypatch.setattr(email, "RETRY_DELAY", 0)
+    yield handler
+    server.stop()
+
+
+def test_messages_share_pooled_connections(sink):
+    mailer = Mailer(pool_size=2, queue_size=10, batch_size=5)
+
+    async def send_all():
+        await mailer.start()
+        await asyncio.gather(*(mailer.send(confirmation_message(f"user{i}@example.com", f"user{i}", "http://localhost:3000"))
+                               for i in range(40)))
+        await mailer.close()
+
+    asyncio.run(send_all())
+    assert sorted(sink.received) == sorted(f"user{i}@example.com" for i in range(40))
+    assert mailer.connections_opened == 2
+
+
+def test_retries_temporary_failures_only(sink):
+    sink.failures = {"flaky@example.com": [451, 421], "gone@example.com": [550]}
+    mailer = Mailer(pool_size=1, max_retries=3)
+
+    async def send(address):
+        try:
+            await mailer.send(confirmation_message(address, "user", "http://localhost:3000"))
+        finally:
+            await mailer.close()
+
+    asyncio.run(send("flaky@example.com"))
+    assert sink.received == ["flaky@example.com"]
+    with pytest.raises(aiosmtplib.SMTPResponseException) as error:
+        asyncio.run(send("gone@example.com"))
+    assert error.value.code == 550
+    assert sink.failures["gone@example.com"] == []
+
+
+def test_confirmation_message_renders_precompiled_template(monkeypatch):
+    monkeypatch.setattr(settings, "EMAILS_FROM_EMAIL", "info@example.com")
+    message = confirmation_message("reader@example.com", "<reader>", "http://localhost:3000")
+    body = message.get_content()
+    assert message["To"] == "reader@example.com"
+    assert "&lt;reader&gt;" in body
+    assert "http://localhost:3000/confirm-email?token=" in body
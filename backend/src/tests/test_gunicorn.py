@@ -0,0 +1,39 @@
+import os
+from pathlib import Path
+
+import pytest
+
+gunicorn_config = pytest.importorskip("gunicorn.config")
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+
+def load(monkeypatch, **env) -> "gunicorn_config.Config":
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    config = gunicorn_config.Config()
+    namespace = {}
+    exec(compile((BACKEND_DIR / "gunicorn.conf.py").read_text(), "gunicorn.conf.py", "exec"), namespace)
+    for key, value in namespace.items():
+        if key in config.settings:
+            config.set(key, value)
+    return config
+
+
+def test_preloads_uvicorn_workers_and_recycles_them(monkeypatch, tmp_path):
+    stale = tmp_path / "counter_123.db"
+    stale.write_bytes(b"")
+    config = load(monkeypatch, WEB_CONCURRENCY="3", PORT="9000", PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+
+    assert config.workers == 3
+    assert config.bind == ["0.0.0.0:9000"]
+    assert config.worker_class_str == "uvicorn.workers.UvicornWorker"
+    assert config.preload_app
+    assert config.max_requests == 1000 and config.max_requests_jitter == 100
+    assert config.graceful_timeout == 30
+    assert not stale.exists()
+
+
+def test_defaults_to_one_worker_per_cpu(monkeypatch):
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    assert load(monkeypatch).workers == (os.cpu_count() or 1)
@@ -0,0 +1,133 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from src.core.idempotency import IdempotencyMiddleware
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def token_subject(token):
+    # test tokens are "<user>-<n>", a refreshed token keeps the user
+    return token.split("-")[0] if token else None
+
+
+def make_app(lock_ttl: float = 60, duration: float = 0.05):
+    app = FastAPI()
+    app.state.redis = fakeredis.FakeAsyncRedis()
+    app.state.calls = 0
+
+    @app.post("/posts/")
+    async def create_post(request: Request):
+        app.state.calls += 1
+        await request.body()
+        await asyncio.sleep(duration)
+        return {"id": app.state.calls}
+
+    @app.post("/fail")
+    async def fail():
+        app.state.calls += 1
+        return json.loads("not json")
+
+    app.add_middleware(IdempotencyMiddleware, routes=[("POST", "/posts/"), ("POST", "/fail")],
+                       subject=token_subject, lock_ttl=lock_ttl, poll_interval=0.01)
+    return app
+
+
+async def request(app, key: str, body: bytes = b"", delay: float = 0):
+    await asyncio.sleep(delay)
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/posts/", "raw_path": b"/posts/", "query_string": b"",
+             "headers": [(b"idempotency-key", key.encode())], "app": app, "http_version": "1.1",
+             "scheme": "http", "server": ("test", 80), "client": ("test", 1), "root_path": ""}
+    await app(scope, receive, send)
+    status = next(message["status"] for message in messages if message["type"] == "http.response.start")
+    return status, json.loads(b"".join(message.get("body", b"") for message in messages if message["type"] == "http.response.body"))
+
+
+def test_retry_is_replayed():
+    app = make_app()
+    client = TestClient(app, raise_server_exceptions=False)
+
+    first = client.post("/posts/", headers={"Idempotency-Key": "abc", "Authorization": "Bearer alice-1"})
+    retry = client.post("/posts/", headers={"Idempotency-Key": "abc", "Authorization": "Bearer alice-1"})
+    refreshed = client.post("/posts/", headers={"Idempotency-Key": "abc", "Authorization": "Bearer alice-2"})
+    other_user = client.post("/posts/", headers={"Idempotency-Key": "abc", "Authorization": "Bearer bob-1"})
+    without_key = client.post("/posts/")
+
+    assert first.json() == retry.json() == refreshed.json() == {"id": 1}
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    assert other_user.json() == {"id": 2} and without_key.json() == {"id": 3}
+    assert app.state.calls == 3
+
+
+def test_key_reused_with_another_body_is_rejected():
+    app = make_app()
+    client = TestClient(app, raise_server_exceptions=False)
+
+    assert client.post("/posts/", headers={"Idempotency-Key": "abc"}, content=b'{"title": "a"}').status_code == 200
+    assert client.post("/posts/", headers={"Idempotency-Key": "abc"}, content=b'{"title": "b"}').status_code == 422
+    assert client.post("/posts/", headers={"Idempotency-Key": "abc"}, content=b'{"title": "a"}').status_code == 200
+    assert app.state.calls == 1
+
+
+def test_concurrent_duplicates_are_coalesced():
+    app = make_app()
+
+    async def run():
+        return await asyncio.gather(*(request(app, "same") for _ in range(5)))
+
+    assert asyncio.run(run()) == [(200, {"id": 1})] * 5
+    assert app.state.calls == 1
+
+
+def test_lock_is_extended_while_the_request_runs():
+    app = make_app(lock_ttl=0.2, duration=0.6)
+
+    async def run():
+        # the retry arrives after the lock's initial ttl, while the first attempt still runs
+        return await asyncio.gather(request(app, "slow"), request(app, "slow", delay=0.3))
+
+    first, retry = asyncio.run(run())
+    assert first == (200, {"id": 1})
+    assert retry[0] == 409
+    assert app.state.calls == 1
+
+
+def test_lock_taken_over_by_another_request_is_not_released():
+    app = make_app(lock_ttl=60, duration=0.2)
+    redis = app.state.redis
+
+    async def run():
+        async def take_over():
+            # as if the lock had expired and another worker had taken it
+            await asyncio.sleep(0.1)
+            [lock_key] = await redis.keys("idempotency:*:lock")
+            await redis.set(lock_key, "other")
+            return lock_key
+
+        _, lock_key = await asyncio.gather(request(app, "stolen"), take_over())
+        return await redis.get(lock_key)
+
+    assert asyncio.run(run()) == b"other"
+
+
+def test_server_errors_are_not_stored():
+    app = make_app()
+    client = TestClient(app, raise_server_exceptions=False)
+
+    assert client.post("/fail", headers={"Idempotency-Key": "boom"}).status_code == 500
+    assert client.post("/fail", headers={"Idempotency-Key": "boom"}).status_code == 500
+    assert app.state.calls == 2
+    assert not asyncio.run(app.state.redis.keys("idempotency:*"))
@@ -0,0 +1,28 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.core.metrics import PrometheusMiddleware, render_metrics, track_dependency
+
+
+def test_middleware_labels_by_route_template():
+    app = FastAPI()
+    app.add_middleware(PrometheusMiddleware)
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        return {"id": item_id}
+
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+
+    output = render_metrics().decode()
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"} 2.0' in output
+    assert "/items/1" not in output
+
+
+def test_track_dependency():
+    with track_dependency("cloudinary", "upload"):
+        pass
+
+    assert 'dependency_call_duration_seconds_count{dependency="cloudinary",operation="upload"}' in render_metrics().decode()
@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from src.api.routes.comments import read_comments
+from src.api.routes.post import get_all_posts, get_specific_post
+from src.core import query_counter
+from src.models.base import Comment, Post, User
+
+REQUEST = Request({"type": "http", "headers": []})
+
+
+def test_posts_reference_each_user_once(session, make_user):
+    author, reader = make_user("normal_author"), make_user("normal_reader")
+    posts = [Post(title=f"normal {i}", description="normalized", image="https://example.com/i.png", user=author) for i in range(3)]
+    session.add_all(posts)
+    session.flush()
+    session.add_all([Comment(content=f"comment {i}", post_id=post.id, user=user)
+                     for post in posts for i, user in enumerate([author, reader, author])])
+    session.commit()
+    session.expunge_all()
+    author = session.query(User).filter(User.username == "normal_author").one()
+
+    with query_counter.capture_queries() as stats:
+        response = asyncio.run(get_all_posts(REQUEST, author, session, is_own=True, comments_preview=3,
+                                             fields="title,latest_comments", normalized=True))
+    # posts, comment previews, users
+    assert stats.count == 3
+    body = json.loads(response.body)
+    assert sorted(body["users"]) == sorted(str(user.id) for user in session.query(User).filter(User.username.like("normal_%")))
+    assert body["users"][str(author.id)]["username"] == "normal_author"
+    assert {post["user_id"] for post in body["posts"]} == {author.id}
+    assert len(body["posts"]) == 3 and len(body["posts"][0]["latest_comments"]) == 3
+    assert "user" not in body["posts"][0]["latest_comments"][0]
+
+
+def test_post_and_comments_normalized(session):
+    post = session.query(Post).filter(Post.title == "normal 0").one()
+
+    body = json.loads(asyncio.run(get_specific_post(post.id, session, comments_preview=0, fields=None, normalized=True)).body)
+    assert body["post"]["user_id"] == post.user_id
+    assert list(body["users"]) == [str(post.user_id)]
+
+    body = json.loads(asyncio.run(read_comments(REQUEST, post.id, limit=20, offset=0, normalized=True, db=session)).body)
+    assert len(body["comments"]) == 3 and len(body["users"]) == 2
+
+
+def test_normalized_cannot_be_streamed(session):
+    request = Request({"type": "http", "headers": [(b"accept", b"application/x-ndjson")]})
+    author = session.query(User).filter(User.username == "normal_author").one()
+    post = session.query(Post).filter(Post.title == "normal 0").one()
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(get_all_posts(request, author, session, is_own=True, comments_preview=3, fields=None, normalized=True))
+    assert error.value.status_code == 400
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(read_comments(request, post.id, limit=20, offset=0, normalized=True, db=session))
+    assert error.value.status_code == 400
@@ -0,0 +1,99 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import cloudinary.api
+
+from src.core.config import settings
+from src.models.base import OutboxMessage, Post, User
+from src.services import outbox
+from src.services.purger import purge_deleted_rows
+
+
+def test_message_is_written_with_the_transaction(session, make_user):
+    session.query(OutboxMessage).delete()
+    session.commit()
+    outbox.enqueue_image_deletion(session, ["photo_share/rolled-back"])
+    session.rollback()
+    assert session.query(OutboxMessage).count() == 0
+
+    user = make_user("outbox")
+    outbox.enqueue_confirmation_email(session, user.email, user.username, "http://localhost:3000")
+    session.commit()
+    assert [message.kind for message in session.query(OutboxMessage)] == [outbox.CONFIRMATION_EMAIL]
+
+
+def test_purge_queues_image_deletions(session):
+    session.query(OutboxMessage).delete()
+    user = session.query(User).filter(User.username == "outbox").one()
+    old = datetime.now(timezone.utc) - timedelta(days=30)
+    session.add_all([Post(title=f"gone {i}", description="", image="https://example.com/p.png", user_id=user.id,
+                          image_public_id=f"photo_share/gone{i}", deleted_at=old) for i in range(3)])
+    session.commit()
+
+    purge_deleted_rows(session, timedelta(days=7))
+
+    message = session.query(OutboxMessage).one()
+    assert message.kind == outbox.CLOUDINARY_DELETE
+    assert sorted(message.payload["public_ids"]) == ["photo_share/gone0", "photo_share/gone1", "photo_share/gone2"]
+
+
+def test_drain_merges_deletions_and_retries_failures(session, monkeypatch):
+    session.query(OutboxMessage).delete()
+    for start in range(0, 150, 50):
+        outbox.enqueue_image_deletion(session, [f"photo_share/{i}" for i in range(start, start + 50)])
+    for username in ("ok", "down"):
+        outbox.enqueue_confirmation_email(session, f"{username}@example.com", username, "http://localhost:3000")
+    session.commit()
+    calls = []
+
+    def delete_resources(public_ids):
+        calls.append(len(public_ids))
+        return {"deleted": {public_id: "deleted" for public_id in public_ids}}
+
+    async def send_email(email, username, host):
+        if username == "down":
+            raise ConnectionError("smtp down")
+
+    monkeypatch.setattr(cloudinary.api, "delete_resources", delete_resources)
+    monkeypatch.setattr(outbox, "send_email", send_email)
+
+    assert asyncio.run(outbox.drain_batch(session, batch_size=10)) == 5
+    assert calls == [100, 50]
+    failed = session.query(OutboxMessage).one()
+    assert failed.payload["username"] == "down"
+    assert failed.attempts == 1 and "smtp down" in failed.last_error
+    assert asyncio.run(outbox.drain_batch(session, batch_size=10)) == 0
+
+    stats = outbox.outbox_stats(session)
+    assert stats["pending"] == {outbox.CONFIRMATION_EMAIL: 1}
+    assert stats["dead"] == 0
+
+    failed.attempts = settings.OUTBOX_MAX_ATTEMPTS
+    session.commit()
+    stats = outbox.outbox_stats(session)
+    assert stats["pending"] == {} and stats["dead"] == 1
+
+
+def test_drain_cost_does_not_grow_with_the_batch(session, monkeypatch, assert_max_queries):
+    session.query(OutboxMessage).delete()
+    session.commit()
+    monkeypatch.setattr(cloudinary.api, "delete_resources", lambda public_ids: {"deleted": {}})
+
+    async def send_email(email, username, host):
+        if username == "down":
+            raise ConnectionError("smtp down")
+
+    monkeypatch.setattr(outbox, "send_email", send_email)
+    counts = []
+    for size in (5, 50):
+        for i in range(size):
+            outbox.enqueue_image_deletion(session, [f"photo_share/batch{size}-{i}"])
+        outbox.enqueue_confirmation_email(session, f"down{size}@example.com", "down", "http://localhost:3000")
+        session.commit()
+        # claim, lease, delete the delivered messages, reschedule the failed one
+        with assert_max_queries(4) as stats:
+            assert asyncio.run(outbox.drain_batch(session, batch_size=100)) == size + 1
+        counts.append(stats.count)
+        session.query(OutboxMessage).delete()
+        session.commit()
+    assert counts[0] == counts[1]
@@ -0,0 +1,40 @@
+import asyncio
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from src.api.routes.post import get_posts_batch
+from src.constants.messages import POST_NOT_FOUND
+from src.core import query_counter
+from src.core.config import settings
+from src.models.base import Post, Tag
+from src.schemas.posts import PostBatchRequest
+
+
+def test_posts_in_request_order_with_missing_markers(session, make_user):
+    user = make_user("batcher")
+    posts = [Post(title=f"batch {i}", description="batched", image="https://example.com/i.png", user=user,
+                  tags=[Tag(name=f"batch{i}")]) for i in range(3)]
+    session.add_all(posts)
+    session.commit()
+    ids = [post.id for post in posts]
+    missing = max(ids) + 1000
+    session.expunge_all()
+
+    body = PostBatchRequest(ids=[ids[2], missing, ids[0], ids[2]])
+    with query_counter.capture_queries() as stats:
+        response = asyncio.run(get_posts_batch(body, session, comments_preview=0))
+        items = json.loads(response.body)
+    assert stats.count == 1
+    assert [item["id"] for item in items] == [ids[2], missing, ids[0], ids[2]]
+    assert items[0]["post"]["title"] == "batch 2" and items[0]["post"]["tags"][0]["name"] == "batch2"
+    assert items[1] == {"id": missing, "post": None, "detail": POST_NOT_FOUND}
+    assert items[2]["post"]["user"]["username"] == "batcher"
+
+
+def test_batch_size_is_bounded():
+    with pytest.raises(ValidationError):
+        PostBatchRequest(ids=[])
+    with pytest.raises(ValidationError):
+        PostBatchRequest(ids=list(range(settings.POSTS_BATCH_MAX_IDS + 1)))
@@ -0,0 +1,47 @@
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.core.profiler import ProfileRequestMiddleware, ProfilerBusy, SamplingProfiler
+
+
+def busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_sampler_records_busy_function():
+    with SamplingProfiler(interval=0.001) as profiler:
+        busy_loop(0.1)
+
+    profile = profiler.to_speedscope()
+    names = {frame["name"] for frame in profile["shared"]["frames"]}
+    assert "busy_loop" in names
+    assert "busy_loop" in profiler.to_collapsed()
+    assert profile["profiles"][0]["samples"]
+
+
+def test_one_profile_per_worker():
+    with SamplingProfiler():
+        with pytest.raises(ProfilerBusy):
+            SamplingProfiler().start()
+
+
+def test_profile_query_parameter():
+    app = FastAPI()
+    app.add_middleware(ProfileRequestMiddleware)
+
+    @app.get("/slow")
+    def slow():
+        busy_loop(0.05)
+        return {"ok": True}
+
+    client = TestClient(app)
+    assert client.get("/slow").json() == {"ok": True}
+
+    response = client.get("/slow", params={"profile": 1})
+    assert response.headers["x-profiled-status"] == "200"
+    assert "busy_loop" in {frame["name"] for frame in response.json()["shared"]["frames"]}
@@ -0,0 +1,68 @@
+import logging
+
+from fastapi import Depends, FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from src.core.db import get_db
+from src.core.query_counter import QueryCounterMiddleware, capture_queries, fingerprint
+from src.models.user import User
+
+
+def test_fingerprint_ignores_parameters():
+    first = fingerprint("SELECT users.id FROM users WHERE users.id IN (?, ?, ?) AND users.role = 'admin'")
+    second = fingerprint("SELECT users.id\n  FROM users WHERE users.id IN (?) AND users.role = 'user'")
+    assert first == second
+
+
+def test_capture_queries(session):
+    with capture_queries() as stats:
+        session.query(User).all()
+        session.query(User).filter(User.id == 1).first()
+    assert stats.count == 2
+    assert stats.duration > 0
+
+
+def test_assert_max_queries(session, assert_max_queries):
+    with assert_max_queries(1):
+        session.query(User).all()
+
+
+def test_middleware_reports_and_warns_on_repeats(session, caplog):
+    app = FastAPI()
+    app.add_middleware(QueryCounterMiddleware, repeat_threshold=3)
+
+    @app.get("/n-plus-one")
+    def n_plus_one(db: Session = Depends(get_db)):
+        for user_id in range(5):
+            db.query(User).filter(User.id == user_id).first()
+        return {}
+
+    app.dependency_overrides[get_db] = lambda: session
+    with caplog.at_level(logging.WARNING, logger="src.core.query_counter"):
+        response = TestClient(app).get("/n-plus-one")
+
+    assert response.headers["server-timing"].endswith('desc="5 queries"')
+    assert "ran the same statement 5 times" in caplog.text
+
+
+def test_streamed_responses_log_their_queries_instead_of_a_header(session, caplog):
+    app = FastAPI()
+    app.add_middleware(QueryCounterMiddleware)
+
+    @app.get("/stream")
+    def stream(db: Session = Depends(get_db)):
+        def rows():
+            for user_id in range(3):
+                db.query(User).filter(User.id == user_id).first()
+                yield f"{user_id}\n"
+        return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+    app.dependency_overrides[get_db] = lambda: session
+    with caplog.at_level(logging.INFO, logger="src.core.query_counter"):
+        response = TestClient(app).get("/stream")
+
+    assert response.text == "0\n1\n2\n"
+    assert "server-timing" not in response.headers
+    assert "GET /stream streamed its response with 3 queries" in caplog.text
@@ -0,0 +1,64 @@
+import asyncio
+import pickle
+
+import pytest
+
+from src.core import redis as shared_redis
+from src.core.metrics import DEPENDENCY_LATENCY, REDIS_POOL_IN_USE
+from src.core.redis import InstrumentedConnectionPool, InstrumentedRedis, close_redis, open_redis, pipelined, ping_redis
+from src.services.auth import auth_service
+
+fakeredis = pytest.importorskip("fakeredis")
+from fakeredis.aioredis import FakeConnection  # noqa: E402
+
+
+def fake_client(max_connections: int = 2) -> InstrumentedRedis:
+    pool = InstrumentedConnectionPool(connection_class=FakeConnection, server=fakeredis.FakeServer(),
+                                      max_connections=max_connections, timeout=1)
+    return InstrumentedRedis(connection_pool=pool)
+
+
+def samples(operation: str) -> float:
+    return DEPENDENCY_LATENCY.labels("redis", operation)._sum.get()
+
+
+def test_commands_share_the_bounded_pool():
+    async def run():
+        client = await open_redis(fake_client(max_connections=2))
+        try:
+            pipelines = samples("pipeline")
+            async with pipelined() as pipe:
+                pipe.set("a", 1, ex=60)
+                pipe.get("a")
+            assert pipe.results == [True, b"1"]
+            assert samples("pipeline") > pipelines
+
+            assert all(await asyncio.gather(*(ping_redis() for _ in range(20))))
+            assert REDIS_POOL_IN_USE._value.get() == 0
+            assert len(client.connection_pool._available_connections) <= 2
+        finally:
+            await close_redis()
+        assert not await ping_redis()
+
+    asyncio.run(run())
+
+
+def test_redis_client_needs_the_lifespan():
+    with pytest.raises(RuntimeError):
+        shared_redis.redis_client()
+
+
+def test_current_user_is_cached_with_ttl(session, make_user):
+    user = make_user("cached")
+
+    async def run():
+        client = await open_redis(fake_client())
+        try:
+            token = await auth_service.create_access_token({"sub": user.email})
+            assert (await auth_service.get_current_user(token, session)).id == user.id
+            assert 0 < await client.ttl(f"user:{user.email}") <= 900
+            assert pickle.loads(await client.get(f"user:{user.email}")).username == "cached"
+        finally:
+            await close_redis()
+
+    asyncio.run(run())
@@ -0,0 +1,30 @@
+from typing import List
+
+from src.core.responses import ModelJSONResponse, response_adapter
+from src.models.base import Comment, Post, Tag
+from src.schemas.posts import PostCreate, PostModelWithImage
+
+
+def test_matches_validated_response(session, make_user):
+    user = make_user("responses")
+    post = Post(title="title", description="description", image="https://example.com/i.png", user=user,
+                tags=[Tag(name="responses")])
+    session.add_all([user, post])
+    session.commit()
+    post.latest_comments = [Comment(content="first", post_id=post.id, user=user)]
+    session.add(post.latest_comments[0])
+    session.commit()
+
+    model = List[PostModelWithImage]
+    validated = response_adapter(model).dump_json(response_adapter(model).validate_python([post], from_attributes=True))
+    assert ModelJSONResponse([post], model).body == validated
+
+
+def test_builds_dicts_and_fills_defaults(session):
+    post = session.query(Post).first()
+    vars(post).pop("latest_comments", None)
+
+    body = ModelJSONResponse({"post": post}, PostCreate).body
+
+    assert b'"latest_comments":[]' in body
+    assert b'"detail":"Post successfully created"' in body
@@ -1,15 +1,14 @@
-from unittest.mock import MagicMock
+from src.models.outbox import OutboxMessage
 from src.models.user import User
 from src.services.auth import auth_service
 
-def test_create_user(client, user, monkeypatch):
-    mock_send_email = MagicMock()
-    monkeypatch.setattr("src.api.routes.auth.send_email", mock_send_email)
+def test_create_user(client, session, user):
     response = client.post("/api/v1/auth/signup",json=user)
     assert response.status_code == 201, response.text
     data = response.json()
     assert data["user"]["email"] == user.get("email")
     assert "id" in data["user"]
+    assert session.query(OutboxMessage).filter(OutboxMessage.payload["email"].as_string() == user.get("email")).count() == 1
 
 
 def test_repeat_create_user(client, user):
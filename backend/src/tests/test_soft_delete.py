@@ -0,0 +1,145 @@
+import asyncio
+import pickle
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func
+
+from src.core import query_counter
+from src.crud import users as crud_users
+from src.crud.comments import remove_comment
+from src.models.base import Comment, OutboxMessage, Post, User
+from src.services import outbox
+from src.services.purger import purge_deleted_rows
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def user_cache(monkeypatch):
+    cache = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(crud_users, "redis_client", lambda: cache)
+    return cache
+
+
+def add_post(session, user: User, title: str, **fields) -> Post:
+    post = Post(title=title, description="", image="https://example.com/p.png", user_id=user.id, **fields)
+    session.add(post)
+    session.commit()
+    return post
+
+
+def add_comments(session, post: Post, *authors: User) -> list[Comment]:
+    comments = [Comment(content=f"by {author.username}", user_id=author.id, post_id=post.id) for author in authors]
+    session.add_all(comments)
+    session.query(Post).filter(Post.id == post.id).update({Post.comment_count: Post.comment_count + len(authors)})
+    session.commit()
+    return comments
+
+
+def live_comments(session, post_id: int) -> int:
+    return session.query(func.count(Comment.id)).filter(Comment.post_id == post_id).scalar()
+
+
+def test_users_loaded_through_the_soft_delete_filter_can_be_pickled(session, make_user):
+    make_user("pickled")
+    session.expunge_all()
+
+    user = session.query(User).filter(User.email == "pickled@example.com").first()
+
+    assert pickle.loads(pickle.dumps(user)).username == "pickled"
+
+
+def test_deleted_rows_are_hidden_unless_asked_for(session, make_user):
+    author = make_user("hidden")
+    post = add_post(session, author, "hidden post")
+    comment, = add_comments(session, post, author)
+    ids = {User: author.id, Post: post.id, Comment: comment.id}
+    for model, row_id in ids.items():
+        session.query(model).filter(model.id == row_id).update({model.deleted_at: func.now()})
+    session.commit()
+    session.expunge_all()
+
+    for model, row_id in ids.items():
+        assert session.query(model).filter(model.id == row_id).first() is None
+        assert session.get(model, row_id) is None
+        assert session.query(model).filter(model.id == row_id).execution_options(include_deleted=True).one().id == row_id
+
+
+def test_remove_comment_keeps_the_count_of_live_comments(session, make_user):
+    author = make_user("counted")
+    post = add_post(session, author, "counted post")
+    comments = add_comments(session, post, author, author, author)
+    post_id = post.id
+
+    asyncio.run(remove_comment(comments[0].id, session))
+
+    session.expunge_all()
+    assert session.get(Post, post_id).comment_count == live_comments(session, post_id) == 2
+
+
+def test_delete_user_hides_their_content_and_recounts_comments(session, make_user, user_cache):
+    admin = make_user("purging_admin", role="admin")
+    leaving = make_user("leaving")
+    staying = make_user("staying")
+    own_post = add_post(session, leaving, "own post")
+    other_post = add_post(session, staying, "other post")
+    add_comments(session, own_post, staying)
+    add_comments(session, other_post, leaving, staying)
+    ids = {"user": leaving.id, "own": own_post.id, "other": other_post.id, "admin": admin.id}
+
+    asyncio.run(crud_users.delete_user(leaving.id, session, admin))
+
+    session.expunge_all()
+    assert session.get(User, ids["user"]) is None
+    assert session.get(Post, ids["own"]) is None
+    assert session.query(Comment).filter(Comment.user_id == ids["user"]).count() == 0
+    assert session.get(Post, ids["other"]).comment_count == live_comments(session, ids["other"]) == 1
+    assert session.get(User, ids["admin"]) is not None
+
+
+def test_delete_user_only_deletes_the_requested_user(session, make_user, user_cache):
+    admin = make_user("careful_admin", role="admin")
+    admin_id = admin.id
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(crud_users.delete_user(10 ** 6, session, admin))
+
+    assert error.value.status_code == 404
+    session.expunge_all()
+    assert session.get(User, admin_id) is not None
+
+
+def test_purge_removes_expired_rows_in_batches_children_first(session, make_user):
+    session.query(OutboxMessage).delete()
+    session.commit()
+    expired = datetime.now(timezone.utc) - timedelta(days=30)
+    recent = datetime.now(timezone.utc) - timedelta(days=1)
+    gone = make_user("purged_author")
+    kept = make_user("recently_gone")
+    posts = [add_post(session, gone, f"purged {i}", image_public_id=f"photo_share/purged{i}") for i in range(3)]
+    recent_post = add_post(session, kept, "recent", image_public_id="photo_share/recent")
+    comments = add_comments(session, posts[0], gone, gone, kept)
+    ids = {"user": gone.id, "kept": kept.id, "posts": [post.id for post in posts], "recent": recent_post.id}
+    for row in (gone, *posts, *comments):
+        row.deleted_at = expired
+    kept.deleted_at = recent_post.deleted_at = recent
+    session.commit()
+
+    with query_counter.capture_queries() as stats:
+        purged = purge_deleted_rows(session, timedelta(days=7), batch_size=2)
+
+    assert purged == {"comments": 3, "posts": 3, "users": 1}
+    # statements are counted in the order they first ran, one DELETE per batch
+    deletes = [(statement.split()[2], count) for statement, count in stats.statements.items()
+               if statement.startswith("DELETE")]
+    assert deletes == [("comments", 2), ("posts", 2), ("users", 1)]
+    everything = {"include_deleted": True}
+    assert session.query(Post.id).execution_options(**everything).filter(Post.id.in_(ids["posts"])).count() == 0
+    assert session.query(User).execution_options(**everything).filter(User.id == ids["user"]).count() == 0
+    assert session.query(Post).execution_options(**everything).filter(Post.id == ids["recent"]).count() == 1
+    assert session.query(User).execution_options(**everything).filter(User.id == ids["kept"]).count() == 1
+    deleted_images = [public_id for message in session.query(OutboxMessage)
+                      if message.kind == outbox.CLOUDINARY_DELETE for public_id in message.payload["public_ids"]]
+    assert sorted(deleted_images) == ["photo_share/purged0", "photo_share/purged1", "photo_share/purged2"]
@@ -0,0 +1,58 @@
+import asyncio
+import json
+from typing import List
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.exc import InvalidRequestError
+
+from src.core import query_counter
+from src.core.responses import ModelJSONResponse, model_subset, parse_fields
+from src.crud.post import get_all_posts_list, get_post_by_id
+from src.models.base import Post, Tag, User
+from src.schemas.posts import PostModelWithImage
+
+
+def test_parse_fields():
+    assert parse_fields(None, PostModelWithImage) is None
+    assert parse_fields("title, image", PostModelWithImage) == {"id", "title", "image"}
+    with pytest.raises(HTTPException) as error:
+        parse_fields("title,password", PostModelWithImage)
+    assert error.value.status_code == 400
+    assert "password" in error.value.detail
+
+
+def test_loads_and_returns_only_requested_fields(session, make_user):
+    user = make_user("sparse")
+    session.add(Post(title="grid", description="not needed", image="https://example.com/i.png", user=user,
+                     tags=[Tag(name="sparse")]))
+    session.commit()
+    session.expunge_all()
+    user = session.query(User).filter(User.username == "sparse").one()
+
+    fields = parse_fields("title,image", PostModelWithImage)
+    with query_counter.capture_queries() as stats:
+        posts = asyncio.run(get_all_posts_list(user, session, is_own=True, fields=fields))
+    assert stats.count == 1
+    statement = stats.report().lower()
+    assert "description" not in statement and "join" not in statement
+    with pytest.raises(InvalidRequestError):
+        posts[0].user
+
+    body = json.loads(ModelJSONResponse(posts, List[model_subset(PostModelWithImage, fields)]).body)
+    assert body == [{"id": posts[0].id, "image": "https://example.com/i.png", "title": "grid"}]
+
+
+def test_loads_requested_relationships(session):
+    session.expunge_all()
+    post_id = session.query(Post.id).filter(Post.title == "grid").scalar()
+    session.expunge_all()
+
+    fields = parse_fields("user,tags", PostModelWithImage)
+    with query_counter.capture_queries() as stats:
+        post = asyncio.run(get_post_by_id(post_id, session, fields))
+        body = json.loads(ModelJSONResponse(post, model_subset(PostModelWithImage, fields)).body)
+    assert stats.count == 2
+    assert list(body) == ["id", "user", "tags"]
+    assert body["user"]["username"] == "sparse"
+    assert body["tags"] == [{"id": post.tags[0].id, "name": "sparse"}]
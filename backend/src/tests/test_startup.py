@@ -0,0 +1,15 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[1]
+
+
+def test_importing_the_app_skips_rarely_used_modules():
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(SRC_DIR.parent), str(SRC_DIR)]))
+    env.setdefault("EMAILS_FROM_EMAIL", "info@example.com")
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys, main; print(sorted({'qrcode', 'PIL', 'alembic'} & sys.modules.keys()))"],
+        cwd=SRC_DIR, env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
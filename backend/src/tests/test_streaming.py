@@ -0,0 +1,59 @@
+import asyncio
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import inspect
+
+from src.core.responses import ndjson_response
+from src.crud.comments import attach_latest_comments, stream_comments
+from src.crud.post import stream_posts
+from src.models.base import Comment, Post, User
+from src.schemas.comments import CommentResponse
+from src.schemas.posts import PostModelWithImage
+
+
+def test_stream_posts_in_bounded_batches(session, make_user):
+    user = make_user("streamer")
+    posts = [Post(title=f"post {i}", description="streamed", image="https://example.com/i.png", user=user) for i in range(5)]
+    session.add_all(posts)
+    session.flush()
+    session.add_all([Comment(content=f"comment {i}", post_id=posts[0].id, user=user) for i in range(3)])
+    session.commit()
+
+    async def collect():
+        sizes = []
+        async for batch in stream_posts(user, session, is_own=True, batch_size=2):
+            sizes.append(len(batch))
+            # only the current batch and its authors are held by the streaming session
+            assert len(inspect(batch[0]).session.identity_map) <= 3
+        return sizes
+
+    assert asyncio.run(collect()) == [2, 2, 1]
+
+
+def test_ndjson_response(session):
+    user = session.query(User).filter(User.username == "streamer").one()
+    post = session.query(Post).filter(Post.user_id == user.id).order_by(Post.id).first()
+    app = FastAPI()
+
+    @app.get("/posts")
+    async def posts():
+        async def add_preview(batch, db):
+            await attach_latest_comments(batch, 2, db)
+        return ndjson_response(stream_posts(user, session, True, add_preview, batch_size=2), PostModelWithImage)
+
+    @app.get("/comments")
+    async def comments():
+        return ndjson_response(stream_comments(post.id, session, batch_size=2), CommentResponse)
+
+    client = TestClient(app)
+    response = client.get("/posts")
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["title"] for row in rows] == [f"post {i}" for i in range(5)]
+    assert [c["content"] for c in rows[0]["latest_comments"]] == ["comment 2", "comment 1"]
+
+    rows = [json.loads(line) for line in client.get("/comments").text.splitlines()]
+    assert [row["content"] for row in rows] == ["comment 0", "comment 1", "comment 2"]
+    assert rows[0]["user"]["username"] == "streamer"
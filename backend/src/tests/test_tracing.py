@@ -0,0 +1,57 @@
+import json
+import logging
+
+from fastapi import BackgroundTasks, Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from src.core import tracing
+from src.core.db import get_db
+from src.core.metrics import track_dependency
+from src.models.user import User
+
+
+def test_request_trace_is_exported(session, tmp_path, caplog):
+    tracing.install_log_record_factory()
+    tracing.configure(tracing.FileSpanExporter(str(tmp_path / "traces.jsonl")))
+    app = FastAPI()
+    app.add_middleware(tracing.TracingMiddleware)
+
+    @tracing.traced("notify")
+    async def notify():
+        logging.getLogger("test_tracing").warning("notified")
+
+    @app.get("/users/{user_id}")
+    async def read_user(user_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+        with track_dependency("cloudinary", "upload"):
+            db.query(User).filter(User.id == user_id).first()
+        background_tasks.add_task(notify)
+        return {}
+
+    app.dependency_overrides[get_db] = lambda: session
+    parent = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+    try:
+        with caplog.at_level(logging.WARNING, logger="test_tracing"):
+            response = TestClient(app).get("/users/1", headers={"traceparent": parent})
+    finally:
+        tracing.configure()
+
+    trace_id = "0af7651916cd43dd8448eb211c80319c"
+    assert response.headers["x-trace-id"] == trace_id
+    assert response.headers["traceparent"].startswith(f"00-{trace_id}-")
+    assert caplog.records[0].trace_id == trace_id
+
+    [line] = (tmp_path / "traces.jsonl").read_text().splitlines()
+    spans = {span["name"]: span for span in json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]}
+    root = spans["GET /users/{user_id}"]
+    assert root["parentSpanId"] == "b7ad6b7169203331"
+    assert spans["cloudinary upload"]["parentSpanId"] == root["spanId"]
+    assert spans["db.query"]["parentSpanId"] == spans["cloudinary upload"]["spanId"]
+    assert spans["notify"]["parentSpanId"] == root["spanId"]
+    assert {span["traceId"] for span in spans.values()} == {trace_id}
+
+
+def test_no_spans_outside_a_request():
+    with tracing.start_span("orphan") as span:
+        assert span is None
+    assert tracing.current_trace_id() is None
@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 
 
 from sqlalchemy.orm import Session
@@ -41,11 +41,14 @@ class TestContactsRepository(unittest.IsolatedAsyncioTestCase):
         :param self: Represent the instance of the class
         :return: None
         """
-        comments = [Comment(), Comment(), Comment()]
+        comments = [Comment(user_id=1), Comment(user_id=2), Comment(user_id=1)]
 
         self.session.query().filter().limit().offset().all.return_value = comments
-        result = await get_comments(self.image_id, 10, 0, self.session)
+        with patch("src.crud.comments.loaders") as loaders:
+            loaders.return_value.users_by_id.load_many = AsyncMock()
+            result = await get_comments(self.image_id, 10, 0, self.session)
         self.assertEqual(result, comments)
+        loaders.return_value.users_by_id.load_many.assert_awaited_once_with({1, 2})
 
     async def test_get_comment_by_id(self) -> None:
         """
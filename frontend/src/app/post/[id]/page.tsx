@@ -3,7 +3,7 @@
 
 import { useCallback, useEffect, useState } from "react";
 import axios from "@/api/axios";
-import { PostType } from "@/components/pages/Home";
+import { CommentType, PostType } from "@/components/pages/Home";
 import { Avatar, Button, Col, Input, Row } from "antd";
 import { isNull, map } from "lodash";
 import { UserOutlined, ArrowLeftOutlined } from "@ant-design/icons";
@@ -13,6 +13,7 @@ import { toast } from "react-toastify";
 
 export default function Post({ params }: { params: { id: number } }) {
   const [post, setPost] = useState<PostType | null>(null);
+  const [comments, setComments] = useState<CommentType[]>([]);
   const [loading, setLoading] = useState(false);
   const [comment, setComment] = useState("");
   const router = useRouter();
@@ -27,6 +28,11 @@ export default function Post({ params }: { params: { id: number } }) {
       .finally(() => {
         setLoading(false);
       });
+    axios
+      .get(`posts/comments/`, { params: { post_id: params.id, limit: 100 } })
+      .then((res) => {
+        setComments(res.data);
+      });
   }, [params.id]);
 
   const onTransform = useCallback(() => {
@@ -160,7 +166,7 @@ export default function Post({ params }: { params: { id: number } }) {
                 <Col span={24}>
                   <BlockWrapper>
                     <Row gutter={[8, 8]}>
-                      {map(post.comments, (comment) => (
+                      {map(comments, (comment) => (
                         <Col span={24}>
                           <Row gutter={[10, 10]}>
                             <Col span={24}>
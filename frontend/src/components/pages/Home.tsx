@@ -45,7 +45,7 @@ interface TagType {
   name: string;
 }
 
-interface CommentType {
+export interface CommentType {
   id: number;
   content: string;
   post_id: number;
@@ -62,7 +62,8 @@ export interface PostType {
   image: string;
   user: UserType;
   tags: TagType[];
-  comments: CommentType[];
+  comment_count: number;
+  latest_comments: CommentType[];
   transformed_image: string;
   transformed_image_qr: string;
 }